@@ -0,0 +1,135 @@
+"""
+Named, separately sized thread pools for blocking work.
+
+Everything used to go through `asyncio.to_thread`, i.e. the loop's default
+executor (min(32, CPU count + 4) threads), so a burst of slow LLM calls
+could leave no thread for log reads or PTY hand-overs. Each kind of work now
+has its own pool:
+
+    pty   hand-over of huge commands to PTY workers / session shells
+    llm   blocking model SDK calls (minutes, mostly waiting on the network)
+    io    file and log reads/writes, sync tool implementations, system probes
+    cpu   compression / regex scans over log chunks (sized to the CPU count)
+
+Sizes come from FLOWX_EXECUTOR_<NAME>_WORKERS. `stats()` reports per pool
+queue depth, busy workers and how often a submission had to wait.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from config import settings
+
+
+class NamedExecutor:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"flowx-{name}")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.saturated = 0  # submissions that found every worker busy
+        self.max_queue_depth = 0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+
+    def _started(self, submitted_at: float):
+        wait = time.monotonic() - submitted_at
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+            self.total_wait_s += wait
+            self.max_wait_s = max(self.max_wait_s, wait)
+
+    def _finished(self, future: Future, started: list):
+        with self._lock:
+            if not started:  # cancelled before a worker picked it up
+                self.queued -= 1
+                return
+            self.active -= 1
+            self.completed += 1
+            if not future.cancelled() and future.exception() is not None:
+                self.failed += 1
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs `fn(*args, **kwargs)` in this pool (context variables propagated, like asyncio.to_thread)."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Fire-and-forget variant of `run` for sync code (no event loop needed)."""
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, fn, *args, **kwargs)
+        submitted_at = time.monotonic()
+        started: list = []
+
+        def task():
+            started.append(True)
+            self._started(submitted_at)
+            return call()
+
+        with self._lock:
+            self.submitted += 1
+            if self.active + self.queued >= self.workers:
+                self.saturated += 1
+            self.queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queued)
+        future = self.pool.submit(task)
+        future.add_done_callback(lambda f: self._finished(f, started))
+        return future
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            started = self.completed + self.active
+            return {
+                "workers": self.workers,
+                "active": self.active,
+                "queued": self.queued,
+                "utilization": round(self.active / self.workers, 3),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "saturated": self.saturated,
+                "saturation_rate": round(self.saturated / self.submitted, 3) if self.submitted else None,
+                "max_queue_depth": self.max_queue_depth,
+                "avg_wait_ms": round(self.total_wait_s / started * 1000, 2) if started else None,
+                "max_wait_ms": round(self.max_wait_s * 1000, 2),
+            }
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ExecutorRegistry:
+    def __init__(self, sizes: Dict[str, int]):
+        self.pools: Dict[str, NamedExecutor] = {name: NamedExecutor(name, size) for name, size in sizes.items()}
+
+    def get(self, name: str) -> NamedExecutor:
+        return self.pools[name]
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.shutdown()
+
+
+executors = ExecutorRegistry({
+    "pty": settings.EXECUTOR_PTY_WORKERS,
+    "llm": settings.EXECUTOR_LLM_WORKERS,
+    "io": settings.EXECUTOR_IO_WORKERS,
+    "cpu": settings.EXECUTOR_CPU_WORKERS,
+})
+
+
+async def run_in(pool: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """`await run_in("io", fn, ...)`: asyncio.to_thread on a named pool."""
+    return await executors.get(pool).run(fn, *args, **kwargs)
@@ -0,0 +1,127 @@
+"""
+Spawning, teardown and inspection of PTY children.
+
+`spawn_in_pty` starts a command on a fresh PTY (echo off, 24x80) as leader
+of its own session, with the PTY as controlling terminal so tools like sudo
+can prompt on /dev/tty. Teardown sends SIGHUP + SIGTERM to the group
+(interactive bash ignores SIGTERM but exits on hangup), escalates to SIGKILL
+after `PROCESS_KILL_GRACE_S`, and always reaps the leader so no zombies are
+left behind.
+"""
+import asyncio
+import fcntl
+import os
+import pty
+import signal
+import struct
+import subprocess
+import termios
+import time
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import psutil
+
+from config import settings
+
+# Background teardowns started from sync code, awaited on shutdown
+_pending: Set[asyncio.Task] = set()
+
+
+def _set_ctty():
+    """preexec_fn: new session with the PTY slave (stdin) as controlling terminal."""
+    os.setsid()
+    try:
+        fcntl.ioctl(0, termios.TIOCSCTTY, 0)
+    except Exception:
+        pass
+
+
+def spawn_in_pty(argv: List[str], pass_fds: Sequence[int] = ()) -> Tuple[subprocess.Popen, int]:
+    """Starts `argv` on a new PTY. Returns (process, master_fd); the caller owns master_fd."""
+    master_fd, slave_fd = pty.openpty()
+    try:
+        # Same terminal the PTY runner always used (pexpect echo=False): no echo, 24x80
+        attrs = termios.tcgetattr(slave_fd)
+        attrs[3] &= ~termios.ECHO
+        termios.tcsetattr(slave_fd, termios.TCSANOW, attrs)
+        fcntl.ioctl(slave_fd, termios.TIOCSWINSZ, struct.pack("HHHH", 24, 80, 0, 0))
+        process = subprocess.Popen(
+            argv,
+            stdin=slave_fd,
+            stdout=slave_fd,
+            stderr=slave_fd,
+            preexec_fn=_set_ctty,
+            pass_fds=tuple(pass_fds),
+        )
+    except Exception:
+        os.close(master_fd)
+        raise
+    finally:
+        os.close(slave_fd)
+    return process, master_fd
+
+
+def signal_group(pid: int, sig: int) -> bool:
+    try:
+        os.killpg(pid, sig)
+        return True
+    except (ProcessLookupError, PermissionError):
+        return False
+
+
+def _exit_status(process) -> Optional[int]:
+    """Works for both subprocess.Popen and asyncio.subprocess.Process."""
+    poll = getattr(process, "poll", None)
+    return poll() if poll is not None else process.returncode
+
+
+async def terminate_group(process, grace: Optional[float] = None) -> Optional[int]:
+    """SIGHUP/SIGTERM the group, SIGKILL after `grace` seconds, reap. Returns the exit code."""
+    grace = settings.PROCESS_KILL_GRACE_S if grace is None else grace
+    if _exit_status(process) is not None:
+        return process.returncode
+    signal_group(process.pid, signal.SIGHUP)
+    signal_group(process.pid, signal.SIGTERM)
+    deadline = time.monotonic() + grace
+    while _exit_status(process) is None and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    if _exit_status(process) is None:
+        signal_group(process.pid, signal.SIGKILL)
+        while _exit_status(process) is None:
+            await asyncio.sleep(0.01)
+    return process.returncode
+
+
+def terminate_group_soon(process: subprocess.Popen, grace: Optional[float] = None):
+    """Teardown from sync code: runs in the background on the current loop, or blocks when there is none."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        asyncio.run(terminate_group(process, grace))
+        return
+    task = loop.create_task(terminate_group(process, grace))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+async def wait_for_pending(timeout: float = 5.0):
+    """Lets in-flight teardowns finish (server shutdown)."""
+    if _pending:
+        await asyncio.wait(list(_pending), timeout=timeout)
+
+
+def process_tree_stats(pid: int) -> Dict[str, Any]:
+    """Open fds and RSS summed over a process and its descendants."""
+    try:
+        root = psutil.Process(pid)
+        procs = [root] + root.children(recursive=True)
+    except psutil.Error:
+        return {"pid": pid, "alive": False}
+    fds = rss = 0
+    for proc in procs:
+        try:
+            fds += proc.num_fds()
+            rss += proc.memory_info().rss
+        except psutil.Error:
+            continue
+    return {"pid": pid, "alive": True, "processes": len(procs), "fds": fds, "rss_bytes": rss}
@@ -0,0 +1,46 @@
+"""
+Age / size retention for on-disk artifacts (node logs, spilled command output).
+
+`select_expired` picks what to delete, oldest first: everything older than
+`max_age_s`, then more of the oldest until the rest fit in `max_bytes`.
+A limit of 0 disables it. `remove` deletes files and directories alike.
+"""
+import shutil
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+# (path, mtime, size in bytes)
+Entry = Tuple[Path, float, int]
+
+
+def select_expired(entries: Iterable[Entry], max_age_s: float, max_bytes: int, now: Optional[float] = None) -> List[Path]:
+    now = time.time() if now is None else now
+    entries = sorted(entries, key=lambda e: e[1])
+    total = sum(size for _, _, size in entries)
+    expired = []
+    for path, mtime, size in entries:
+        too_old = max_age_s > 0 and now - mtime > max_age_s
+        too_big = max_bytes > 0 and total > max_bytes
+        if not (too_old or too_big):
+            break
+        expired.append(path)
+        total -= size
+    return expired
+
+
+def remove(paths: Iterable[Path]) -> int:
+    """Deletes `paths` (missing ones are skipped). Returns how many were removed."""
+    removed = 0
+    for path in paths:
+        try:
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Retention: cannot remove {path}: {e}")
+    return removed
@@ -4,13 +4,26 @@ import subprocess
 import struct
 import fcntl
 import termios
-import signal
+import asyncio
+from typing import Callable, Optional
+
+from .process import terminate_group_soon
+
+# Adaptive read sizing for event-loop driven reads
+MIN_READ_SIZE = 4096
+MAX_READ_SIZE = 65536
 
 class PtySession:
     def __init__(self, command: str):
         self.command = command
         self.master_fd = None
         self.process = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._on_output: Optional[Callable[[bytes], None]] = None
+        self._on_eof: Optional[Callable[[], None]] = None
+        self._read_size = MIN_READ_SIZE
+        self._write_buffer = bytearray()
+        self.paused = False
 
     def start(self):
         """Spawns the process attached to a new PTY with proper Job Control."""
@@ -39,6 +52,8 @@ class PtySession:
         # after every command. Use /bin/bash directly to ensure hook works.
         env = os.environ.copy()
         env["PROMPT_COMMAND"] = r'printf "\033]1337;DONE:%s\007" "$?"'
+        # PS0 is printed after a command line is read, right before it runs: marks command start
+        env["PS0"] = r'\e]1337;START\a'
 
         self.process = subprocess.Popen(
             ["/bin/bash"],
@@ -54,13 +69,91 @@ class PtySession:
         os.close(slave_fd)
         return self.master_fd
 
+    # --- Event-loop driven I/O (no threads) ---
+
+    def attach(self, loop: asyncio.AbstractEventLoop, on_output: Callable[[bytes], None], on_eof: Callable[[], None]):
+        """
+        Registers the PTY with the event loop: `on_output` is called with each chunk
+        as soon as master_fd is readable, `on_eof` once the shell is gone.
+        """
+        self._loop = loop
+        self._on_output = on_output
+        self._on_eof = on_eof
+        os.set_blocking(self.master_fd, False)
+        loop.add_reader(self.master_fd, self._on_readable)
+
+    def pause_reading(self):
+        """Stops draining master_fd: the kernel PTY buffer fills and the shell blocks on write."""
+        if self._loop and not self.paused and self.master_fd is not None:
+            self._loop.remove_reader(self.master_fd)
+            self.paused = True
+
+    def resume_reading(self):
+        if self._loop and self.paused and self.master_fd is not None:
+            self._loop.add_reader(self.master_fd, self._on_readable)
+        self.paused = False
+
+    def detach(self):
+        """Stops event-loop reads (the session itself stays alive)."""
+        if self._loop and self.master_fd is not None:
+            self._loop.remove_reader(self.master_fd)
+            self._loop.remove_writer(self.master_fd)
+        self._loop = None
+
+    def _on_readable(self):
+        try:
+            data = os.read(self.master_fd, self._read_size)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""  # EIO: the slave side closed (shell exited)
+
+        if not data:
+            on_eof = self._on_eof
+            self.detach()
+            if on_eof:
+                on_eof()
+            return
+
+        # Grow the buffer while reads fill it (bulk output), shrink back when interactive
+        if len(data) == self._read_size and self._read_size < MAX_READ_SIZE:
+            self._read_size *= 2
+        elif len(data) < self._read_size // 4 and self._read_size > MIN_READ_SIZE:
+            self._read_size //= 2
+
+        if self._on_output:
+            self._on_output(data)
+
+    def _flush_writes(self):
+        try:
+            written = os.write(self.master_fd, self._write_buffer)
+            del self._write_buffer[:written]
+        except BlockingIOError:
+            return
+        except OSError:
+            self._write_buffer.clear()
+        if not self._write_buffer and self._loop:
+            self._loop.remove_writer(self.master_fd)
+
     def write(self, data: bytes):
         """Writes user input (keystrokes) to the PTY."""
-        if self.master_fd:
-            try:
-                os.write(self.master_fd, data)
-            except OSError:
-                pass
+        if not self.master_fd:
+            return
+        if self._write_buffer:
+            # Keep ordering behind input that is already waiting
+            self._write_buffer += data
+            return
+        try:
+            written = os.write(self.master_fd, data)
+        except BlockingIOError:
+            written = 0
+        except OSError:
+            return
+        if written < len(data):
+            # PTY input queue is full (large paste): finish when writable
+            self._write_buffer += data[written:]
+            if self._loop:
+                self._loop.add_writer(self.master_fd, self._flush_writes)
 
     def read(self, size=1024) -> bytes:
         """Reads output from the PTY."""
@@ -81,17 +174,15 @@ class PtySession:
                 pass
 
     def terminate(self):
-        """Kills the process group and closes the PTY."""
-        if self.process:
-            try:
-                # Kill the whole process group (handles sudo children)
-                os.killpg(os.getpgid(self.process.pid), signal.SIGTERM)
-            except (ProcessLookupError, AttributeError):
-                pass
+        """Closes the PTY and tears down the process group (SIGTERM, SIGKILL after a grace period, reaped)."""
+        self.detach()
         if self.master_fd:
             try:
                 os.close(self.master_fd)
             except OSError:
                 pass
+        if self.process:
+            # Whole process group (handles sudo children); runs in the background on the event loop
+            terminate_group_soon(self.process)
         self.master_fd = None
         self.process = None
\ No newline at end of file
@@ -0,0 +1,182 @@
+"""
+Pre-warmed shell processes.
+
+Two small pools, refilled in the background after every hand-out:
+
+- Terminal shells: started `PtySession`s (interactive bash, rc files already
+  sourced) handed to new `/ws/terminal` sessions, so the first prompt is
+  already waiting in the PTY buffer.
+- Exec workers: a PTY (24x80, echo off, controlling terminal set up) with a
+  non-interactive bash blocked on a pipe. `run()` writes the command and the
+  worker does `exec /bin/bash -c "$cmd"`, the same process image the PTY
+  runner would have spawned, minus openpty/fork/session setup on the hot path.
+
+A worker is single use. Pools are sized with FLOWX_SHELL_POOL_TERMINALS and
+FLOWX_SHELL_POOL_EXEC_WORKERS (0 disables), and callers fall back to spawning
+directly on a miss. Pooled processes inherit the server environment from the
+time they were spawned.
+"""
+import asyncio
+import os
+import signal
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from config import settings
+from .process import spawn_in_pty
+from .session_manager import PtySession
+
+# Reads one NUL-terminated command from the pipe fd, then becomes `bash -c <command>`
+_EXEC_WORKER_SCRIPT = 'IFS= read -r -d "" cmd <&{fd}; exec {fd}<&-; exec /bin/bash -c "$cmd"'
+
+
+class ExecWorker:
+    def __init__(self):
+        cmd_read, self._cmd_write = os.pipe()
+        try:
+            self.process, self.master_fd = spawn_in_pty(
+                ["/bin/bash", "-c", _EXEC_WORKER_SCRIPT.format(fd=cmd_read)],
+                pass_fds=(cmd_read,),
+            )
+        except Exception:
+            os.close(self._cmd_write)
+            raise
+        finally:
+            os.close(cmd_read)
+        self.spawned_at = time.monotonic()
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def run(self, command: str):
+        """Hands the command to the worker (blocking write: call off the event loop for huge commands)."""
+        data = command.encode("utf-8", errors="surrogateescape") + b"\0"
+        try:
+            view = memoryview(data)
+            while view:
+                written = os.write(self._cmd_write, view)
+                view = view[written:]
+        finally:
+            os.close(self._cmd_write)
+            self._cmd_write = None
+
+    def discard(self):
+        """Kills an unused worker."""
+        if self._cmd_write is not None:
+            os.close(self._cmd_write)
+            self._cmd_write = None
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        try:
+            os.close(self.master_fd)
+        except OSError:
+            pass
+        self.process.wait()
+
+
+class ShellPool:
+    def __init__(self, terminals: int, exec_workers: int):
+        self.target = {"terminal": terminals, "exec": exec_workers}
+        self._idle: Dict[str, Deque[Any]] = {"terminal": deque(), "exec": deque()}
+        self._stats = {kind: {"hits": 0, "misses": 0, "spawned": 0, "discarded": 0} for kind in self.target}
+        self._refill_task: Optional[asyncio.Task] = None
+        self._closed = True  # until start(): nothing is spawned outside the server lifespan
+
+    # --- Hand-out ---
+
+    def acquire_terminal(self) -> Optional[PtySession]:
+        """A started interactive bash, or None (caller spawns its own)."""
+        return self._acquire("terminal", lambda s: s.process is not None and s.process.poll() is None)
+
+    def acquire_exec_worker(self) -> Optional[ExecWorker]:
+        """An idle single-use exec worker, or None (caller spawns its own)."""
+        return self._acquire("exec", lambda w: w.alive())
+
+    def _acquire(self, kind: str, healthy):
+        idle = self._idle[kind]
+        while idle:
+            item = idle.popleft()
+            if healthy(item):
+                self._stats[kind]["hits"] += 1
+                self._schedule_refill()
+                return item
+            self._discard(kind, item)
+        if self.target[kind] > 0:
+            self._stats[kind]["misses"] += 1
+            self._schedule_refill()
+        return None
+
+    # --- Replenishment ---
+
+    def _spawn(self, kind: str):
+        if kind == "terminal":
+            session = PtySession(command="bash")
+            session.start()
+            return session
+        return ExecWorker()
+
+    def _discard(self, kind: str, item):
+        self._stats[kind]["discarded"] += 1
+        if kind == "terminal":
+            item.terminate()
+        else:
+            item.discard()
+
+    def _schedule_refill(self):
+        if self._closed:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = loop.create_task(self._refill())
+
+    async def _refill(self):
+        for kind, target in self.target.items():
+            while len(self._idle[kind]) < target and not self._closed:
+                try:
+                    self._idle[kind].append(self._spawn(kind))
+                    self._stats[kind]["spawned"] += 1
+                except Exception as e:
+                    print(f"Shell pool: failed to spawn {kind} shell: {e}")
+                    break
+                # One fork per loop iteration: never stall other tasks for a whole refill
+                await asyncio.sleep(0)
+
+    def start(self):
+        self._closed = False
+        self._schedule_refill()
+
+    def shutdown(self):
+        self._closed = True
+        if self._refill_task:
+            self._refill_task.cancel()
+        for kind, idle in self._idle.items():
+            while idle:
+                self._discard(kind, idle.popleft())
+
+    def stats(self) -> Dict[str, Any]:
+        report = {}
+        for kind, counters in self._stats.items():
+            requests = counters["hits"] + counters["misses"]
+            report[kind] = {
+                "target": self.target[kind],
+                "idle": len(self._idle[kind]),
+                **counters,
+                "hit_rate": round(counters["hits"] / requests, 3) if requests else None,
+            }
+        return report
+
+
+shell_pool = ShellPool(
+    terminals=settings.SHELL_POOL_TERMINALS,
+    exec_workers=settings.SHELL_POOL_EXEC_WORKERS,
+)
@@ -0,0 +1,153 @@
+"""
+Wire protocol for /ws/terminal.
+
+Output: PTY bytes go out as binary frames. Clients connecting with
+`?binary=false` get text frames instead, decoded with an incremental UTF-8
+decoder so a character split across two PTY reads is never mangled.
+
+Input: binary frames start with a one-byte opcode:
+    0x00 <bytes>                  keystrokes / paste, written to the PTY as-is
+    0x01 <u16 cols> <u16 rows>    resize (big-endian)
+Text frames keep the JSON protocol ({"type": "input" | "resize", ...}).
+
+Shell integration: the PTY shell prints `ESC ] 1337;START BEL` before running
+a command (PS0) and `ESC ] 1337;DONE:<exit> BEL` at every prompt
+(PROMPT_COMMAND). `MarkerParser` strips both from the byte stream and turns
+them into events; binary clients receive them as JSON text control frames.
+"""
+import asyncio
+import codecs
+import re
+import struct
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+OP_INPUT = 0x00
+OP_RESIZE = 0x01
+RESIZE_PAYLOAD = struct.Struct("!HH")
+
+# Reads at least this big mean output is streaming: worth waiting a window to batch more
+BURST_BYTES = 1024
+
+
+def parse_binary_input(frame: bytes) -> Tuple[Optional[int], Any]:
+    """(opcode, payload): input bytes, or (cols, rows) for resize. Unknown frames give (None, None)."""
+    if not frame:
+        return None, None
+    opcode = frame[0]
+    if opcode == OP_INPUT:
+        return OP_INPUT, frame[1:]
+    if opcode == OP_RESIZE and len(frame) >= 1 + RESIZE_PAYLOAD.size:
+        return OP_RESIZE, RESIZE_PAYLOAD.unpack_from(frame, 1)
+    return None, None
+
+
+MARKER_PREFIX = b"\x1b]1337;"
+_MARKER = re.compile(rb"\x1b\]1337;(START|DONE:(-?\d+))\x07")
+# Longest marker we wait for; anything longer after the prefix is passed through untouched
+_MAX_MARKER = 32
+
+
+class MarkerParser:
+    """Streaming OSC 1337 START/DONE parser. Markers split across reads are reassembled."""
+
+    def __init__(self):
+        self._held = b""
+
+    def feed(self, data: bytes) -> List[Union[bytes, Tuple[str, Optional[int]]]]:
+        """Stream-ordered segments: output bytes (markers removed), ("start", None) or ("done", exit_code)."""
+        data = self._held + data
+        self._held = b""
+        if MARKER_PREFIX[:1] not in data:
+            return [data] if data else []
+
+        segments: List[Union[bytes, Tuple[str, Optional[int]]]] = []
+        out = bytearray()
+        pos = 0
+        while True:
+            start = data.find(MARKER_PREFIX, pos)
+            if start < 0:
+                tail = data[pos:]
+                # Hold back a trailing partial prefix ("\x1b]13") until the next read
+                for size in range(min(len(MARKER_PREFIX) - 1, len(tail)), 0, -1):
+                    if MARKER_PREFIX.startswith(tail[-size:]):
+                        self._held = tail[-size:]
+                        tail = tail[:-size]
+                        break
+                out += tail
+                break
+            out += data[pos:start]
+            match = _MARKER.match(data, start)
+            if match:
+                if out:
+                    segments.append(bytes(out))
+                    out = bytearray()
+                segments.append(("start", None) if match.group(1) == b"START" else ("done", int(match.group(2))))
+                pos = match.end()
+                continue
+            end = data.find(b"\x07", start)
+            if end < 0 and len(data) - start < _MAX_MARKER:
+                self._held = data[start:]  # incomplete marker: wait for the rest
+                break
+            # Some other OSC 1337 sequence: leave it in the stream
+            out += data[start:start + len(MARKER_PREFIX)]
+            pos = start + len(MARKER_PREFIX)
+        if out:
+            segments.append(bytes(out))
+        return segments
+
+
+def make_text_decoder():
+    return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+
+class OutputBatcher:
+    """
+    Coalesces PTY chunks from `queue` (None = EOF) into WebSocket frames.
+
+    A lone small chunk (keystroke echo) is sent immediately. When output is
+    streaming, the batcher waits `window` seconds once so the frame carries
+    everything the PTY produced meanwhile, up to about `max_bytes`.
+    Control events (dicts) in the queue are never merged: they end the
+    current frame and are returned on their own, in order.
+    """
+
+    def __init__(self, queue: asyncio.Queue, window: float, max_bytes: int):
+        self.queue = queue
+        self.window = window
+        self.max_bytes = max_bytes
+        self.eof = False
+        self._pending: Optional[Dict[str, Any]] = None
+
+    def _drain(self, buf: bytearray):
+        while len(buf) < self.max_bytes and not self.eof and self._pending is None:
+            try:
+                chunk = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if chunk is None:
+                self.eof = True
+            elif isinstance(chunk, dict):
+                self._pending = chunk
+            else:
+                buf += chunk
+
+    async def next(self) -> Union[bytes, Dict[str, Any], None]:
+        """The next frame's bytes or control event, or None once the PTY is closed and everything was sent."""
+        if self._pending is not None:
+            control, self._pending = self._pending, None
+            return control
+        if self.eof:
+            return None
+        chunk = await self.queue.get()
+        if chunk is None:
+            self.eof = True
+            return None
+        if isinstance(chunk, dict):
+            return chunk
+        buf = bytearray(chunk)
+        self._drain(buf)
+        if (len(buf) >= BURST_BYTES and len(buf) < self.max_bytes and not self.eof
+                and self._pending is None and self.window > 0):
+            await asyncio.sleep(self.window)
+            self._drain(buf)
+        return bytes(buf)
@@ -0,0 +1,339 @@
+"""
+Detachable terminal sessions.
+
+A `TerminalSession` owns one `PtySession` and outlives the websockets that
+show it: any number of viewers can attach, and when the last one leaves the
+shell keeps running for `TERMINAL_DETACH_GRACE_S` before it is reaped.
+Output is kept in a bounded scrollback ring addressed by absolute byte
+offsets, so a viewer that reconnects with the offset it has already seen
+receives exactly the missing bytes (or the whole ring if it fell behind).
+
+Flow control: every viewer counts the bytes queued for it but not yet sent.
+When one passes `TERMINAL_HIGH_WATER_BYTES` the session stops reading the
+PTY, so the kernel buffer fills and the producing process blocks; reading
+resumes once every viewer is back under `TERMINAL_LOW_WATER_BYTES`.
+
+Limits: `TERMINAL_MAX_SESSIONS` live sessions overall and
+`TERMINAL_MAX_SESSIONS_PER_CLIENT` per client host; sessions with no I/O for
+`TERMINAL_IDLE_TIMEOUT_S` and no command running are closed by the reaper.
+
+Shell-integration markers are stripped before output reaches the scrollback
+and turned into `command_started` / `command_finished` control events (exit
+code, duration) queued to viewers in stream order.
+"""
+import asyncio
+import secrets
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Set, Tuple
+
+from config import settings
+from .process import process_tree_stats
+from .session_manager import PtySession
+from .shell_pool import shell_pool
+from .terminal_protocol import OutputBatcher, MarkerParser
+
+# Finished commands kept per session for the terminals endpoint
+RECENT_COMMANDS = 20
+
+
+class ScrollbackBuffer:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._chunks: Deque[Tuple[int, bytes]] = deque()  # (start offset, bytes)
+        self.size = 0
+        self.end_offset = 0  # total bytes ever produced
+
+    @property
+    def start_offset(self) -> int:
+        return self._chunks[0][0] if self._chunks else self.end_offset
+
+    def append(self, data: bytes):
+        self._chunks.append((self.end_offset, data))
+        self.end_offset += len(data)
+        self.size += len(data)
+        while self.size > self.capacity and len(self._chunks) > 1:
+            _, dropped = self._chunks.popleft()
+            self.size -= len(dropped)
+
+    def since(self, offset: int) -> Tuple[int, bytes]:
+        """(offset the returned bytes start at, bytes) for everything after `offset` still retained."""
+        start = max(offset, self.start_offset)
+        parts = []
+        for chunk_start, data in self._chunks:
+            chunk_end = chunk_start + len(data)
+            if chunk_end <= start:
+                continue
+            parts.append(data[max(0, start - chunk_start):])
+        return start, b"".join(parts)
+
+
+class TerminalViewer:
+    """One attached websocket: its own output queue (None = session ended)."""
+
+    def __init__(self, session: "TerminalSession"):
+        self.session = session
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.batcher = OutputBatcher(self.queue, settings.TERMINAL_COALESCE_MS / 1000, settings.TERMINAL_MAX_FRAME_BYTES)
+        self.buffered = 0  # bytes queued for this viewer and not yet sent
+
+    def push(self, data):
+        """Queues output bytes or a control event (dict)."""
+        if isinstance(data, bytes):
+            self.buffered += len(data)
+        self.queue.put_nowait(data)
+
+    def sent(self, size: int):
+        """Called once a frame has been handed to the websocket."""
+        self.buffered -= size
+        self.session.check_flow()
+
+
+class TerminalLimitError(Exception):
+    pass
+
+
+class TerminalSession:
+    def __init__(self, session_id: str, sudo: bool, pty: Optional[PtySession] = None, owner: str = ""):
+        self.id = session_id
+        self.sudo = sudo
+        self.owner = owner
+        # A pre-warmed shell from the pool is already started
+        self.pty = pty or PtySession(command="sudo -i" if sudo else "bash")
+        self.scrollback = ScrollbackBuffer(settings.TERMINAL_SCROLLBACK_BYTES)
+        self.viewers: Set[TerminalViewer] = set()
+        self.created_at = time.time()
+        self.last_activity = time.monotonic()
+        self.detached_since: Optional[float] = time.monotonic()
+        self.closed = False
+        self.pauses = 0
+        self._on_closed = None
+        # Command lifecycle (from the PS0 / PROMPT_COMMAND markers)
+        self.markers = MarkerParser()
+        self.commands = 0
+        self.command_seconds = 0.0
+        self.running_since: Optional[float] = None
+        self.recent_commands: Deque[Dict[str, object]] = deque(maxlen=RECENT_COMMANDS)
+
+    def start(self, loop: asyncio.AbstractEventLoop, on_closed):
+        self._on_closed = on_closed
+        if self.pty.process is None:
+            self.pty.start()
+        self.pty.attach(loop, self._on_output, self._on_eof)
+
+    def _on_output(self, data: bytes):
+        self.last_activity = time.monotonic()
+        for segment in self.markers.feed(data):
+            if isinstance(segment, bytes):
+                self._publish(segment)
+            else:
+                self._on_marker(*segment)
+        self.check_flow()
+
+    def _publish(self, data: bytes):
+        self.scrollback.append(data)
+        for viewer in self.viewers:
+            viewer.push(data)
+
+    def _on_marker(self, kind: str, exit_code: Optional[int]):
+        now = time.monotonic()
+        if kind == "start":
+            self.running_since = now
+            event = {"type": "command_started", "command": self.commands + 1, "ts": time.time()}
+        elif self.running_since is not None:
+            duration = now - self.running_since
+            self.running_since = None
+            self.commands += 1
+            self.command_seconds += duration
+            event = {
+                "type": "command_finished",
+                "command": self.commands,
+                "exit_code": exit_code,
+                "duration_ms": round(duration * 1000, 1),
+                "ts": time.time(),
+            }
+            self.recent_commands.append(event)
+        else:
+            return  # prompt without a command (shell start, Ctrl-C on an empty line)
+        for viewer in self.viewers:
+            viewer.push(event)
+
+    @property
+    def buffered_bytes(self) -> int:
+        return max((v.buffered for v in self.viewers), default=0)
+
+    def check_flow(self):
+        if self.closed:
+            return
+        buffered = self.buffered_bytes
+        if not self.pty.paused and buffered > settings.TERMINAL_HIGH_WATER_BYTES:
+            self.pty.pause_reading()
+            self.pauses += 1
+        elif self.pty.paused and buffered <= settings.TERMINAL_LOW_WATER_BYTES:
+            self.pty.resume_reading()
+
+    def _on_eof(self):
+        self.close()
+
+    def add_viewer(self, since: Optional[int] = None) -> Tuple[TerminalViewer, int]:
+        """Attaches a viewer; queues the scrollback after `since` (default: all). Returns (viewer, replay offset)."""
+        viewer = TerminalViewer(self)
+        offset, backlog = self.scrollback.since(since or 0)
+        if backlog:
+            viewer.push(backlog)
+        if self.closed:
+            viewer.queue.put_nowait(None)
+        self.viewers.add(viewer)
+        self.detached_since = None
+        return viewer, offset
+
+    def remove_viewer(self, viewer: TerminalViewer):
+        self.viewers.discard(viewer)
+        if not self.viewers:
+            self.detached_since = time.monotonic()
+        # A slow viewer leaving must not keep the PTY paused for the others
+        self.check_flow()
+
+    def write(self, data: bytes):
+        self.last_activity = time.monotonic()
+        self.pty.write(data)
+
+    def resize(self, rows: int, cols: int):
+        self.pty.resize(rows, cols)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.pty.terminate()
+        for viewer in self.viewers:
+            viewer.queue.put_nowait(None)
+        if self._on_closed:
+            self._on_closed(self)
+
+    def idle_for(self, now: float) -> Optional[float]:
+        """Seconds without I/O, or None while a command is running."""
+        return None if self.running_since is not None else now - self.last_activity
+
+    def info(self) -> Dict[str, object]:
+        return {
+            "session_id": self.id,
+            "owner": self.owner,
+            "sudo": self.sudo,
+            "viewers": len(self.viewers),
+            "created_at": self.created_at,
+            "idle_seconds": round(time.monotonic() - self.last_activity, 1),
+            "detached_seconds": round(time.monotonic() - self.detached_since, 1) if self.detached_since else None,
+            "scrollback_bytes": self.scrollback.size,
+            "output_offset": self.scrollback.end_offset,
+            "buffered_bytes": self.buffered_bytes,
+            "viewer_buffered_bytes": sorted((v.buffered for v in self.viewers), reverse=True),
+            "paused": self.pty.paused,
+            "pauses": self.pauses,
+            "commands": self.commands,
+            "command_seconds": round(self.command_seconds, 3),
+            "running_for": round(time.monotonic() - self.running_since, 1) if self.running_since else None,
+            "recent_commands": list(self.recent_commands),
+        }
+
+
+class TerminalSessionRegistry:
+    def __init__(self, grace_seconds: float, reap_interval: float, idle_timeout: float = 0,
+                 max_sessions: int = 0, max_per_client: int = 0):
+        self.grace_seconds = grace_seconds
+        self.reap_interval = reap_interval
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.max_per_client = max_per_client
+        self._sessions: Dict[str, TerminalSession] = {}
+        self._reaper: Optional[asyncio.Task] = None
+        self.rejected = 0
+        self.reaped = {"detached": 0, "idle": 0}
+
+    def get(self, session_id: str) -> Optional[TerminalSession]:
+        return self._sessions.get(session_id)
+
+    def open(self, session_id: Optional[str], sudo: bool, owner: str = "") -> Tuple[TerminalSession, bool]:
+        """
+        Existing live session for `session_id`, or a new shell. Returns (session, resumed).
+        Raises TerminalLimitError when a new shell would exceed the session caps.
+        """
+        session = self._sessions.get(session_id) if session_id else None
+        if session and not session.closed and session.sudo == sudo:
+            return session, True
+        self._check_limits(owner)
+        pooled = None if sudo else shell_pool.acquire_terminal()
+        session = TerminalSession(secrets.token_urlsafe(12), sudo, pty=pooled, owner=owner)
+        session.start(asyncio.get_running_loop(), self._forget)
+        self._sessions[session.id] = session
+        self._ensure_reaper()
+        return session, False
+
+    def _check_limits(self, owner: str):
+        if self.max_sessions and len(self._sessions) >= self.max_sessions:
+            self.rejected += 1
+            raise TerminalLimitError(f"Terminal limit reached ({self.max_sessions} sessions)")
+        if self.max_per_client and sum(1 for s in self._sessions.values() if s.owner == owner) >= self.max_per_client:
+            self.rejected += 1
+            raise TerminalLimitError(f"Terminal limit reached for {owner or 'this client'} ({self.max_per_client} sessions)")
+
+    def _forget(self, session: TerminalSession):
+        if self._sessions.get(session.id) is session:
+            del self._sessions[session.id]
+
+    def _ensure_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.get_running_loop().create_task(self._reap_loop())
+
+    def reap(self) -> int:
+        """Closes sessions nobody has watched for longer than the grace period, and idle ones."""
+        now = time.monotonic()
+        closed = 0
+        for session in list(self._sessions.values()):
+            if session.detached_since is not None and now - session.detached_since > self.grace_seconds:
+                reason = "detached"
+            elif self.idle_timeout and (session.idle_for(now) or 0) > self.idle_timeout:
+                reason = "idle"
+            else:
+                continue
+            session.close()
+            self.reaped[reason] += 1
+            closed += 1
+        return closed
+
+    async def _reap_loop(self):
+        while self._sessions:
+            await asyncio.sleep(self.reap_interval)
+            self.reap()
+
+    def list(self):
+        """Live sessions with their process tree's open fds and RSS."""
+        sessions = []
+        for session in self._sessions.values():
+            process = session.pty.process
+            sessions.append({**session.info(), **(process_tree_stats(process.pid) if process else {})})
+        return sessions
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "max_per_client": self.max_per_client,
+            "rejected": self.rejected,
+            "reaped": dict(self.reaped),
+        }
+
+    def shutdown(self):
+        for session in list(self._sessions.values()):
+            session.close()
+        if self._reaper:
+            self._reaper.cancel()
+
+
+terminal_sessions = TerminalSessionRegistry(
+    grace_seconds=settings.TERMINAL_DETACH_GRACE_S,
+    reap_interval=settings.TERMINAL_REAP_INTERVAL_S,
+    idle_timeout=settings.TERMINAL_IDLE_TIMEOUT_S,
+    max_sessions=settings.TERMINAL_MAX_SESSIONS,
+    max_per_client=settings.TERMINAL_MAX_SESSIONS_PER_CLIENT,
+)
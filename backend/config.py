@@ -16,4 +16,81 @@ class Settings:
     GROQ_API_KEY: str = os.getenv("GROQ_API_KEY", "")
     FLOWX_MODE: str = os.getenv("FLOWX_MODE", "dev")
 
+    # Event streaming: per-run replay ring buffer size and how many finished-run snapshots to keep
+    EVENT_BUFFER_SIZE: int = int(os.getenv("FLOWX_EVENT_BUFFER_SIZE", 2000))
+    EVENT_BUFFER_FINISHED_RUNS: int = int(os.getenv("FLOWX_EVENT_BUFFER_FINISHED_RUNS", 64))
+    # Max queued events per event-bus consumer before log events are dropped
+    EVENT_BUS_MAX_QUEUE: int = int(os.getenv("FLOWX_EVENT_BUS_MAX_QUEUE", 10000))
+    # Max unsent frames per /ws/workflow client: log frames are dropped past it, a client lagging on control frames is disconnected
+    WS_CLIENT_OUTBOX_MAX: int = int(os.getenv("FLOWX_WS_CLIENT_OUTBOX_MAX", 2000))
+    # Max queued events per SSE stream before log events are dropped for that client
+    EVENT_STREAM_MAX_QUEUE: int = int(os.getenv("FLOWX_EVENT_STREAM_MAX_QUEUE", 5000))
+
+    # Durable node logs: chunked zlib segment files per run/node
+    LOG_DIR: str = os.getenv("FLOWX_LOG_DIR", str(Path(__file__).resolve().parent / "logs"))
+    LOG_CHUNK_BYTES: int = int(os.getenv("FLOWX_LOG_CHUNK_BYTES", 256 * 1024))
+    LOG_COMPRESSION_LEVEL: int = int(os.getenv("FLOWX_LOG_COMPRESSION_LEVEL", 6))
+    LOG_MAX_READ_BYTES: int = int(os.getenv("FLOWX_LOG_MAX_READ_BYTES", 1024 * 1024))
+    # Log retention: run directories older than this or past the size cap are deleted, oldest first (0 = no limit)
+    LOG_RETENTION_S: float = float(os.getenv("FLOWX_LOG_RETENTION_S", 14 * 24 * 3600))
+    LOG_DIR_MAX_BYTES: int = int(os.getenv("FLOWX_LOG_DIR_MAX_BYTES", 10 * 1024 * 1024 * 1024))
+
+    # CommandNode runs commands without sudoLock / interactive flag on plain pipes instead of a PTY
+    COMMAND_PIPE_FAST_PATH: bool = os.getenv("FLOWX_COMMAND_PIPE_FAST_PATH", "true").lower() in ("1", "true", "yes")
+
+    # Command output capture: bytes kept in memory from the start / end of the stream, gzip spill of the full stream
+    CAPTURE_HEAD_BYTES: int = int(os.getenv("FLOWX_CAPTURE_HEAD_BYTES", 64 * 1024))
+    CAPTURE_TAIL_BYTES: int = int(os.getenv("FLOWX_CAPTURE_TAIL_BYTES", 256 * 1024))
+    CAPTURE_SPILL: bool = os.getenv("FLOWX_CAPTURE_SPILL", "true").lower() in ("1", "true", "yes")
+    CAPTURE_DIR: str = os.getenv("FLOWX_CAPTURE_DIR", str(Path(LOG_DIR) / "captures"))
+    CAPTURE_SPILL_MAX_BYTES: int = int(os.getenv("FLOWX_CAPTURE_SPILL_MAX_BYTES", 1024 * 1024 * 1024))
+    # Spill retention: files older than this or past the directory size cap are deleted, oldest first (0 = no limit)
+    CAPTURE_RETENTION_S: float = float(os.getenv("FLOWX_CAPTURE_RETENTION_S", 7 * 24 * 3600))
+    CAPTURE_DIR_MAX_BYTES: int = int(os.getenv("FLOWX_CAPTURE_DIR_MAX_BYTES", 5 * 1024 * 1024 * 1024))
+
+    # Terminal output batching: coalescing window for streaming output and max frame size
+    TERMINAL_COALESCE_MS: float = float(os.getenv("FLOWX_TERMINAL_COALESCE_MS", 4))
+    TERMINAL_MAX_FRAME_BYTES: int = int(os.getenv("FLOWX_TERMINAL_MAX_FRAME_BYTES", 64 * 1024))
+    # Detachable terminals: scrollback kept per session, how long a session survives with no viewer
+    TERMINAL_SCROLLBACK_BYTES: int = int(os.getenv("FLOWX_TERMINAL_SCROLLBACK_BYTES", 512 * 1024))
+    TERMINAL_DETACH_GRACE_S: float = float(os.getenv("FLOWX_TERMINAL_DETACH_GRACE_S", 300))
+    TERMINAL_REAP_INTERVAL_S: float = float(os.getenv("FLOWX_TERMINAL_REAP_INTERVAL_S", 15))
+    # Terminal backpressure: stop reading the PTY above high water (per viewer unsent bytes), resume below low
+    TERMINAL_HIGH_WATER_BYTES: int = int(os.getenv("FLOWX_TERMINAL_HIGH_WATER_BYTES", 1024 * 1024))
+    TERMINAL_LOW_WATER_BYTES: int = int(os.getenv("FLOWX_TERMINAL_LOW_WATER_BYTES", 256 * 1024))
+
+    # Terminal limits: concurrent sessions (global / per client host), close sessions idle this long (no command running)
+    TERMINAL_MAX_SESSIONS: int = int(os.getenv("FLOWX_TERMINAL_MAX_SESSIONS", 32))
+    TERMINAL_MAX_SESSIONS_PER_CLIENT: int = int(os.getenv("FLOWX_TERMINAL_MAX_SESSIONS_PER_CLIENT", 8))
+    TERMINAL_IDLE_TIMEOUT_S: float = float(os.getenv("FLOWX_TERMINAL_IDLE_TIMEOUT_S", 3600))
+    # Seconds between SIGTERM and SIGKILL when tearing down a process group
+    PROCESS_KILL_GRACE_S: float = float(os.getenv("FLOWX_PROCESS_KILL_GRACE_S", 3))
+    # How long the cancel endpoint waits for a run to unwind (processes killed, fds closed) before answering
+    CANCEL_TIMEOUT_S: float = float(os.getenv("FLOWX_CANCEL_TIMEOUT_S", 5))
+
+    # Pre-warmed shells: idle interactive bash sessions for terminals, exec workers for CommandNode (0 disables)
+    SHELL_POOL_TERMINALS: int = int(os.getenv("FLOWX_SHELL_POOL_TERMINALS", 2))
+    SHELL_POOL_EXEC_WORKERS: int = int(os.getenv("FLOWX_SHELL_POOL_EXEC_WORKERS", 4))
+
+    # Validation: per-node results cached by config hash, incremental validation sessions kept for /workflow/validate/diff
+    VALIDATION_CACHE_MAX_ENTRIES: int = int(os.getenv("FLOWX_VALIDATION_CACHE_MAX_ENTRIES", 10000))
+    VALIDATION_SESSIONS_MAX: int = int(os.getenv("FLOWX_VALIDATION_SESSIONS_MAX", 64))
+    # Async plugin validators: how many run at once, and how long one may take before it fails the node
+    VALIDATION_CONCURRENCY: int = int(os.getenv("FLOWX_VALIDATION_CONCURRENCY", 16))
+    VALIDATION_NODE_TIMEOUT_S: float = float(os.getenv("FLOWX_VALIDATION_NODE_TIMEOUT_S", 10))
+    # Validated, compiled plans shared by /workflow/validate, /execute, restarts and /resume (keyed by graph hash)
+    PLAN_CACHE_MAX_ENTRIES: int = int(os.getenv("FLOWX_PLAN_CACHE_MAX_ENTRIES", 256))
+    # Runtime estimates: per-node durations averaged over a workflow's last N runs (type averages over the last N runs of any workflow)
+    ESTIMATE_HISTORY_RUNS: int = int(os.getenv("FLOWX_ESTIMATE_HISTORY_RUNS", 20))
+    ESTIMATE_TYPE_HISTORY_RUNS: int = int(os.getenv("FLOWX_ESTIMATE_TYPE_HISTORY_RUNS", 200))
+    ESTIMATE_HISTORY_TTL_S: float = float(os.getenv("FLOWX_ESTIMATE_HISTORY_TTL_S", 60))
+    # Longest /workflow/validate waits on run history for its estimate (then `estimate` is null, the load goes on)
+    ESTIMATE_TIMEOUT_S: float = float(os.getenv("FLOWX_ESTIMATE_TIMEOUT_S", 0.2))
+
+    # Threads per executor for blocking work (see app/core/executors.py): PTY hand-overs, LLM SDK calls, file I/O, CPU-bound scans
+    EXECUTOR_PTY_WORKERS: int = int(os.getenv("FLOWX_EXECUTOR_PTY_WORKERS", 4))
+    EXECUTOR_LLM_WORKERS: int = int(os.getenv("FLOWX_EXECUTOR_LLM_WORKERS", 16))
+    EXECUTOR_IO_WORKERS: int = int(os.getenv("FLOWX_EXECUTOR_IO_WORKERS", 8))
+    EXECUTOR_CPU_WORKERS: int = int(os.getenv("FLOWX_EXECUTOR_CPU_WORKERS", os.cpu_count() or 2))
+
 settings = Settings()
@@ -1,28 +1,29 @@
 import asyncio
+import time
 from typing import Dict, Any, List, Set, Optional
 from datetime import datetime
 from database.connection import db
+from .compiler import CompiledGraph, compile_graph
 from .registry import NodeRegistry
+from .rusage import run_usage
 
 # Sentinel object for skipped branches
 SKIP_BRANCH = object()
 
-CONFIG_HANDLES = {'api-handle', 'tool-handle'}
-CONFIG_NODE_TYPES = {'apiConfig', 'toolCircle', 'vaultNode'}
-
 class AsyncGraphExecutor:
-    def __init__(self, workflow_data: dict, emit_event=None, thread_id: str = None, global_context: dict = None, initial_state: dict = None):
+    def __init__(self, workflow_data: dict, emit_event=None, thread_id: str = None, global_context: dict = None,
+                 initial_state: dict = None, compiled: Optional[CompiledGraph] = None):
         self.workflow_id = workflow_data.get("id")
         self.emit_event = emit_event
         self.thread_id = thread_id
         self.global_context = global_context or {}
         
-        all_nodes = workflow_data.get("nodes", [])
-        all_edges = workflow_data.get("edges", [])
-        
-        self.edges = [e for e in all_edges if e.get("sourceHandle") not in CONFIG_HANDLES]
-        self.nodes = [n for n in all_nodes if n.get("type") not in CONFIG_NODE_TYPES]
-        self.node_map = {n["id"]: n for n in self.nodes}
+        # Indices (adjacency, fan-in, edge behaviors, wait strategies) come from the compile step.
+        # A compiled graph is read-only, so restarts and resumes can hand the same one in.
+        self.graph = compiled or compile_graph(workflow_data.get("nodes", []), workflow_data.get("edges", []))
+        self.edges = self.graph.edges
+        self.nodes = self.graph.nodes
+        self.node_map = self.graph.node_map
         
         self.results = initial_state or {} 
         self.errors = []
@@ -34,27 +35,11 @@ class AsyncGraphExecutor:
         self.node_inboxes: Dict[str, Dict[str, Any]] = {n["id"]: {} for n in self.nodes}
 
     def _get_outgoing_edges(self, node_id: str) -> List[dict]:
-        return [e for e in self.edges if e["source"] == node_id]
-
-    def _get_incoming_edges(self, node_id: str) -> List[dict]:
-        return [e for e in self.edges if e["target"] == node_id]
+        return self.graph.outgoing.get(node_id, [])
 
     def _get_edge_behavior(self, source_id: str, target_id: str) -> str:
-        """Robustly extracts the routing behavior from an edge."""
-        edge = next((e for e in self.edges if e["source"] == source_id and e["target"] == target_id), None)
-        if not edge: return "conditional"
-        
-        # 1. Check explicit data
-        behavior = edge.get("data", {}).get("behavior")
-        if behavior == "force": return "always"
-        if behavior in ["conditional", "failure", "always"]: return behavior
-            
-        # 2. Check source handle ID
-        handle = str(edge.get("sourceHandle", "")).lower()
-        if "fail" in handle or "error" in handle: return "failure"
-        if "always" in handle or "force" in handle or "fallback" in handle: return "always"
-        
-        return "conditional"
+        """Routing behavior of the (first) edge between two nodes."""
+        return self.graph.behaviors.get((source_id, target_id), "conditional")
 
     def _sanitize_for_db(self, obj: Any) -> Any:
         """Recursively converts non-serializable objects (like functions) to strings."""
@@ -66,12 +51,24 @@ class AsyncGraphExecutor:
             return f"<function {getattr(obj, '__name__', str(obj))}>"
         return obj
 
-    async def _update_db_status(self, node_id: str, status: str, result: Any = None):
-        """Fire-and-forget DB update"""
+    async def _update_db_status(self, node_id: str, status: str, result: Any = None, usage: Optional[dict] = None,
+                                duration_ms: Optional[float] = None):
+        """
+        Fire-and-forget DB update. `usage`: per-run resource totals, snapshotted by the caller.
+        `duration_ms` (with the node type and the run's workflow_id) feeds the runtime estimates.
+        """
         if not self.thread_id: return
         try:
             database = db.get_db()
             update_data = {f"results.{node_id}": {"status": status, "timestamp": datetime.utcnow().isoformat()}}
+            if duration_ms is not None:
+                update_data[f"results.{node_id}"]["duration_ms"] = duration_ms
+                update_data[f"results.{node_id}"]["type"] = self.node_map.get(node_id, {}).get("type")
+            if self.workflow_id:
+                update_data["workflow_id"] = self.workflow_id
+            # Per-run command resource totals (CPU, RSS, I/O), kept current with every node
+            if usage:
+                update_data["resource_usage"] = usage
             if result:
                  # Sanitize result to safely store functions/objects
                  safe_result = self._sanitize_for_db(result)
@@ -86,13 +83,8 @@ class AsyncGraphExecutor:
 
     async def execute(self):
         """Forward-Traversal Execution Loop."""
-        ALLOWED_TRIGGERS = {"startNode", "webhookNode", "cronNode", "shellTool", "stopTool", "restartTool", "readFileTool", "writeFileTool"}
-        
-        # 1. Identify Start Nodes (No incoming edges + Allowed Type)
-        start_nodes = [
-            n for n in self.nodes 
-            if n.get("type") in ALLOWED_TRIGGERS and not self._get_incoming_edges(n["id"])
-        ]
+        # 1. Identify Start Nodes (No incoming edges + Allowed Type), resolved at compile time
+        start_nodes = [self.node_map[node_id] for node_id in self.graph.entry_ids]
 
         if not start_nodes:
             return {"results": self.results, "errors": [{"error": "No valid start node found."}], "status": "FAILED"}
@@ -107,7 +99,14 @@ class AsyncGraphExecutor:
 
         # 3. The Event Loop
         while active_tasks:
-            done, pending = await asyncio.wait(active_tasks, return_when=asyncio.FIRST_COMPLETED)
+            try:
+                done, pending = await asyncio.wait(active_tasks, return_when=asyncio.FIRST_COMPLETED)
+            except asyncio.CancelledError:
+                # Run cancelled: cancel the running nodes too and wait until they have torn down
+                for task in active_tasks:
+                    task.cancel()
+                await asyncio.gather(*active_tasks, return_exceptions=True)
+                raise
             active_tasks = pending
 
             for task in done:
@@ -162,7 +161,8 @@ class AsyncGraphExecutor:
                         active_tasks.add(new_task)
 
         status = "FAILED" if self.errors else "COMPLETED"
-        return {"results": self.results, "errors": self.errors, "status": status}
+        return {"results": self.results, "errors": self.errors, "status": status,
+                "resource_usage": run_usage.get(self.thread_id)}
 
     def _check_if_ready(self, node: dict) -> bool:
         """Determines if a node should run based on its Inbox and Wait Strategy."""
@@ -170,13 +170,11 @@ class AsyncGraphExecutor:
         if self.node_status[node_id] != "pending":
             return False 
 
-        incoming_edges = self._get_incoming_edges(node_id)
+        fan_in = self.graph.fan_in[node_id]
         inbox = self.node_inboxes[node_id]
 
-        # Read Wait Strategy from Plugin Class
-        node_class = NodeRegistry.get_node(node["type"])
-        instance = node_class(node.get("data", {}))
-        strategy = instance.get_wait_strategy()
+        # Wait Strategy of the plugin, read once at compile time
+        strategy = self.graph.wait_strategies[node_id]
 
         if strategy == "ANY":
             # OR MERGE: Run if ANY parent sent a valid payload
@@ -184,23 +182,20 @@ class AsyncGraphExecutor:
                 if payload is not SKIP_BRANCH:
                     return True
             # If ALL parents skipped, we must run (to skip ourselves)
-            if len(inbox) == len(incoming_edges):
+            if len(inbox) == fan_in:
                 return True
             return False
 
         else: 
             # AND JOIN (Standard): Wait for ALL parents
-            return len(inbox) == len(incoming_edges)
+            return len(inbox) == fan_in
 
     async def _execute_plugin(self, node: dict, inputs: dict):
         """Executes the plugin with the filtered inputs."""
         node_id = node["id"]
         node_data = node.get("data", {})
         # 1. SKIP LOGIC
-        # Read Wait Strategy from Plugin Class
-        node_class = NodeRegistry.get_node(node["type"])
-        instance = node_class(node_data.copy())
-        strategy = instance.get_wait_strategy()
+        strategy = self.graph.wait_strategies[node_id]
         
         # Check for skips
         should_skip = False
@@ -239,7 +234,9 @@ class AsyncGraphExecutor:
             execution_payload["inputs"] = clean_inputs # <--- The Inbox is passed here!
 
             # Run Plugin
+            started = time.monotonic()
             result = await instance.execute(context, execution_payload)
+            duration_ms = round((time.monotonic() - started) * 1000, 1)
 
             # 3. Handle Result
             self.results[node_id] = result
@@ -256,10 +253,17 @@ class AsyncGraphExecutor:
             
             if self.emit_event:
                 await self.emit_event("node_status", {"nodeId": node_id, "status": status_str})
-            asyncio.create_task(self._update_db_status(node_id, status_str, result))
+            asyncio.create_task(self._update_db_status(node_id, status_str, result, run_usage.get(self.thread_id), duration_ms))
 
             return (node_id, result, False)
 
+        except asyncio.CancelledError:
+            print(f"[BACKEND] [{node_id}] Cancelled", flush=True)
+            self.node_status[node_id] = "cancelled"
+            if self.emit_event:
+                await self.emit_event("node_status", {"nodeId": node_id, "status": "cancelled"})
+            raise
+
         except Exception as e:
             # Error Handling
             print(f"[BACKEND] [{node_id}] EXECUTION ERROR: {e}", flush=True)
@@ -270,6 +274,6 @@ class AsyncGraphExecutor:
             if self.emit_event:
                 await self.emit_event("node_status", {"nodeId": node_id, "status": "failed"})
                 await self.emit_event("node_log", {"nodeId": node_id, "log": str(e), "type": "stderr"})
-            asyncio.create_task(self._update_db_status(node_id, "failed", str(e)))
+            asyncio.create_task(self._update_db_status(node_id, "failed", str(e), run_usage.get(self.thread_id)))
             
             return (node_id, {"status": "failed", "error": str(e)}, False)
@@ -0,0 +1,210 @@
+"""
+Graph compile step.
+
+Turns the canvas graph into the indices the push engine runs on, in one
+O(V+E) pass, instead of the executor scanning the edge list for every
+lookup:
+
+    outgoing / parents / fan_in    adjacency and AND-join counts per node
+    behaviors                      routing behavior per (source, target)
+    wait_strategies                the plugin's ALL / ANY per node
+    entry_ids                      trigger nodes without incoming edges
+    order / levels                 topological order and depth (Kahn)
+    critical path                  longest chain of nodes (or of node weights)
+
+Nodes that never leave Kahn's queue sit on or behind a cycle. The engine never
+re-runs a node, so a cycle can only stall: `find_cycle()` returns the exact
+path (`a -> b -> c -> a`) and the validator rejects it.
+"""
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .registry import NodeRegistry
+
+# Config-only edges and nodes never take part in execution
+CONFIG_HANDLES = {'api-handle', 'tool-handle'}
+CONFIG_NODE_TYPES = {'apiConfig', 'toolCircle', 'vaultNode'}
+
+# Node types that may start a run when nothing points at them
+ALLOWED_TRIGGERS = {"startNode", "webhookNode", "cronNode", "shellTool", "stopTool", "restartTool", "readFileTool", "writeFileTool"}
+
+
+def edge_behavior(edge: Dict[str, Any]) -> str:
+    """Robustly extracts the routing behavior from an edge."""
+    # 1. Check explicit data
+    behavior = (edge.get("data") or {}).get("behavior")
+    if behavior == "force": return "always"
+    if behavior in ["conditional", "failure", "always"]: return behavior
+
+    # 2. Check source handle ID
+    handle = str(edge.get("sourceHandle", "")).lower()
+    if "fail" in handle or "error" in handle: return "failure"
+    if "always" in handle or "force" in handle or "fallback" in handle: return "always"
+
+    return "conditional"
+
+
+def wait_strategy(node: Dict[str, Any]) -> str:
+    try:
+        node_class = NodeRegistry.get_node(node.get("type"))
+    except ValueError:
+        # Unknown types fail validation; default AND-join for the rest of the plan
+        return "ALL"
+    return node_class(node.get("data", {})).get_wait_strategy()
+
+
+class CompiledGraph:
+    def __init__(self, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]):
+        self.nodes = nodes
+        self.edges = edges
+        self.node_map: Dict[str, Dict[str, Any]] = {n["id"]: n for n in nodes}
+        self.outgoing: Dict[str, List[Dict[str, Any]]] = {node_id: [] for node_id in self.node_map}
+        # Distinct parents: the inbox is keyed by parent, so parallel edges count once
+        self.parents: Dict[str, List[str]] = {node_id: [] for node_id in self.node_map}
+        self.child_ids: Dict[str, List[str]] = {node_id: [] for node_id in self.node_map}
+        self.behaviors: Dict[Tuple[str, str], str] = {}
+
+        for edge in edges:
+            src, trg = edge.get("source"), edge.get("target")
+            if src not in self.node_map or trg not in self.node_map:
+                continue
+            self.outgoing[src].append(edge)
+            if (src, trg) not in self.behaviors:
+                # First edge between a pair decides the behavior (as the executor always did)
+                self.behaviors[(src, trg)] = edge_behavior(edge)
+                self.parents[trg].append(src)
+                self.child_ids[src].append(trg)
+
+        self.fan_in: Dict[str, int] = {node_id: len(parents) for node_id, parents in self.parents.items()}
+        self.wait_strategies: Dict[str, str] = {node_id: wait_strategy(node) for node_id, node in self.node_map.items()}
+        self.entry_ids: List[str] = [n["id"] for n in nodes if n.get("type") in ALLOWED_TRIGGERS and not self.fan_in[n["id"]]]
+
+        # --- Kahn: topological order + levels ---
+        remaining = dict(self.fan_in)
+        self.levels: Dict[str, int] = {}
+        self.order: List[str] = []
+        queue = deque(node_id for node_id, count in remaining.items() if count == 0)
+        for node_id in queue:
+            self.levels[node_id] = 0
+        while queue:
+            node_id = queue.popleft()
+            self.order.append(node_id)
+            for child in self.children(node_id):
+                self.levels[child] = max(self.levels.get(child, 0), self.levels[node_id] + 1)
+                remaining[child] -= 1
+                if remaining[child] == 0:
+                    queue.append(child)
+        # On a cycle or downstream of one: never scheduled
+        self.blocked: Set[str] = {node_id for node_id, count in remaining.items() if count > 0}
+        for node_id in self.blocked:
+            self.levels.pop(node_id, None)
+
+    def children(self, node_id: str) -> List[str]:
+        return self.child_ids[node_id]
+
+    def find_cycle(self, within: Optional[Iterable[str]] = None) -> Optional[List[str]]:
+        """A cycle among the blocked nodes (restricted to `within`) as [a, b, ..., a]; None when there is none."""
+        candidates = self.blocked if within is None else self.blocked.intersection(within)
+        return find_cycle(self.child_ids, candidates)
+
+    def critical_path(self, weights: Optional[Dict[str, float]] = None) -> Tuple[float, List[str]]:
+        """
+        Longest path through the DAG part of the graph: by node count, or by
+        the sum of `weights` (e.g. expected node durations). Returns (length, path).
+        """
+        best: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        for node_id in self.order:
+            weight = 1 if weights is None else weights.get(node_id, 0)
+            parent = max((p for p in self.parents[node_id] if p in best), key=lambda p: best[p], default=None)
+            best[node_id] = weight + (best[parent] if parent is not None else 0)
+            previous[node_id] = parent
+        if not best:
+            return 0, []
+        node_id = max(best, key=lambda n: best[n])
+        length = best[node_id]
+        path = []
+        while node_id is not None:
+            path.append(node_id)
+            node_id = previous[node_id]
+        return length, path[::-1]
+
+    def summary(self) -> Dict[str, Any]:
+        widths: Dict[int, int] = {}
+        for level in self.levels.values():
+            widths[level] = widths.get(level, 0) + 1
+        length, path = self.critical_path()
+        return {
+            "nodes": len(self.node_map),
+            "edges": sum(len(out) for out in self.outgoing.values()),
+            "depth": max(widths) + 1 if widths else 0,
+            "max_level_width": max(widths.values(), default=0),
+            "max_fan_in": max(self.fan_in.values(), default=0),
+            "critical_path_length": length,
+            "critical_path": path,
+            "blocked": sorted(self.blocked),
+        }
+
+
+def find_cycle(adj, candidates: Set[str]) -> Optional[List[str]]:
+    """
+    Iterative DFS over `candidates` (adj: node -> iterable of children). Returns
+    the first cycle as a closed path [a, b, ..., a], or None.
+    """
+    state: Dict[str, int] = {}  # 1 = on the DFS stack, 2 = done
+    for root in candidates:
+        if root in state:
+            continue
+        stack = [(root, iter(adj.get(root, ())))]
+        path = [root]
+        state[root] = 1
+        while stack:
+            node_id, children = stack[-1]
+            for child in children:
+                if child not in candidates:
+                    continue
+                if state.get(child) == 1:
+                    return path[path.index(child):] + [child]
+                if child not in state:
+                    state[child] = 1
+                    stack.append((child, iter(adj.get(child, ()))))
+                    path.append(child)
+                    break
+            else:
+                state[node_id] = 2
+                stack.pop()
+                path.pop()
+    return None
+
+
+def find_path(adj, src: str, dst: str, within=None) -> Optional[List[str]]:
+    """Shortest path src -> dst (BFS, optionally only through `within`); None when dst is unreachable."""
+    previous: Dict[str, Optional[str]] = {src: None}
+    queue = deque([src])
+    while queue:
+        node_id = queue.popleft()
+        if node_id == dst:
+            path = []
+            while node_id is not None:
+                path.append(node_id)
+                node_id = previous[node_id]
+            return path[::-1]
+        for child in adj.get(node_id, ()):
+            if child not in previous and (within is None or child in within):
+                previous[child] = node_id
+                queue.append(child)
+    return None
+
+
+def compile_graph(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> CompiledGraph:
+    """Compiles the executable part of a canvas graph (config nodes and config-only edges dropped)."""
+    return CompiledGraph(
+        [n for n in nodes if n.get("type") not in CONFIG_NODE_TYPES],
+        [e for e in edges if e.get("sourceHandle") not in CONFIG_HANDLES],
+    )
+
+
+def cycle_errors(cycle: List[str]) -> List[Dict[str, Any]]:
+    """One CRITICAL error per node on the cycle, each naming the full path."""
+    message = "Cycle: " + " -> ".join(cycle) + " (nodes on a cycle wait for each other and never run)"
+    return [{"nodeId": node_id, "message": message, "level": "CRITICAL", "path": cycle} for node_id in cycle[:-1]]
@@ -0,0 +1,196 @@
+"""
+Static runtime estimates for the validation response.
+
+The executor records each node's `duration_ms` (and type) in the `runs`
+collection. Here those durations are averaged over a workflow's recent runs
+and replayed on the compiled DAG the way the push engine schedules it:
+
+    start(node)   all parents finished (ALL) / first passing parent (ANY)
+    happy path    nodes run when their parents succeed; failure-only branches
+                  are treated as skipped (they take no time)
+
+giving the predicted run time (finish of the last node), the critical path
+that decides it, and the peak number of nodes running at once.
+
+Nodes without history of their own use the average of their type (same
+workflow first, then recent runs of any workflow); the rest count as 0 ms and
+are listed under `unknown`. History is cached for FLOWX_ESTIMATE_HISTORY_TTL_S.
+
+The estimate never holds up validation: history not loaded within
+FLOWX_ESTIMATE_TIMEOUT_S keeps loading in the background (the next validate
+uses it) and the estimate is `None`, as it is when the database fails.
+"""
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+from database.connection import db
+from .compiler import CompiledGraph
+
+
+def _pipeline(match: Dict[str, Any], runs: int, key: str) -> List[Dict[str, Any]]:
+    """Average duration per `key` ('k' = node id, 'v.type' = node type) over the last `runs` runs."""
+    return [
+        {"$match": match},
+        {"$sort": {"_id": -1}},
+        {"$limit": runs},
+        {"$project": {"results": {"$objectToArray": "$results"}}},
+        {"$unwind": "$results"},
+        {"$match": {"results.v.duration_ms": {"$type": "number"}}},
+        {"$group": {"_id": f"$results.{key}", "type": {"$last": "$results.v.type"},
+                    "avg_ms": {"$avg": "$results.v.duration_ms"}, "samples": {"$sum": 1}}},
+    ]
+
+
+class DurationHistory:
+    """Average node durations from the `runs` collection, cached per workflow (and globally per type)."""
+
+    def __init__(self, ttl_s: float):
+        self.ttl_s = ttl_s
+        # workflow_id -> (loaded at, history or None when it could not be loaded)
+        self.entries: Dict[Optional[str], Tuple[float, Optional[Dict[str, Any]]]] = {}
+        # Loads in flight, shared by concurrent callers and outliving a caller's timeout
+        self.loading: Dict[Optional[str], asyncio.Task] = {}
+        self.queries = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    async def _aggregate(self, match: Dict[str, Any], runs: int, key: str) -> List[Dict[str, Any]]:
+        self.queries += 1
+        cursor = db.get_db().runs.aggregate(_pipeline(match, runs, key))
+        return await cursor.to_list(length=None)
+
+    async def _load(self, workflow_id: Optional[str]) -> Dict[str, Any]:
+        if workflow_id is None:
+            rows = await self._aggregate({"results": {"$exists": True}}, settings.ESTIMATE_TYPE_HISTORY_RUNS, "v.type")
+            return {"by_type": {row["_id"]: row["avg_ms"] for row in rows if row["_id"]}}
+
+        rows = await self._aggregate({"workflow_id": workflow_id}, settings.ESTIMATE_HISTORY_RUNS, "k")
+        by_type: Dict[str, List[float]] = {}
+        for row in rows:
+            if row.get("type"):
+                by_type.setdefault(row["type"], []).append(row["avg_ms"])
+        return {
+            "by_node": {row["_id"]: row["avg_ms"] for row in rows},
+            "by_type": {node_type: sum(values) / len(values) for node_type, values in by_type.items()},
+        }
+
+    async def _fetch(self, workflow_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        try:
+            history = await self._load(workflow_id)
+        except Exception as e:
+            # No database: cached as unavailable for the TTL too, so validates do not keep retrying
+            self.failures += 1
+            print(f"Duration history unavailable: {e}")
+            history = None
+        finally:
+            self.loading.pop(workflow_id, None)
+        self.entries[workflow_id] = (time.monotonic(), history)
+        return history
+
+    async def get(self, workflow_id: Optional[str], timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        {"by_node": {id: ms}, "by_type": {type: ms}} for a workflow; workflow_id
+        None = recent runs of all workflows (by type only). None when the
+        history is unavailable or not loaded within `timeout`.
+        """
+        cached = self.entries.get(workflow_id)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl_s:
+            return cached[1]
+        task = self.loading.get(workflow_id)
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = self.loading[workflow_id] = asyncio.create_task(self._fetch(workflow_id))
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return None
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workflows": len(self.entries), "queries": self.queries, "failures": self.failures, "timeouts": self.timeouts}
+
+
+duration_history = DurationHistory(settings.ESTIMATE_HISTORY_TTL_S)
+
+
+def schedule(compiled: CompiledGraph, durations: Dict[str, float]) -> Dict[str, Tuple[float, float, bool, Optional[str]]]:
+    """
+    Replays the push engine on the DAG part of `compiled`: node -> (start,
+    finish, runs, parent that released it). Cycle nodes are left out.
+    """
+    plan: Dict[str, Tuple[float, float, bool, Optional[str]]] = {}
+    entries = set(compiled.entry_ids)
+    for node_id in compiled.order:
+        parents = [p for p in compiled.parents[node_id] if p in plan]
+        if not parents:
+            # Only trigger nodes start a run; other parentless nodes never fire
+            runs = node_id in entries
+            start, released_by = 0.0, None
+        else:
+            passing = [p for p in parents if plan[p][2] and compiled.behaviors[(p, node_id)] != "failure"]
+            if compiled.wait_strategies[node_id] == "ANY" and passing:
+                released_by = min(passing, key=lambda p: plan[p][1])
+                runs = True
+            else:
+                released_by = max(parents, key=lambda p: plan[p][1])
+                runs = compiled.wait_strategies[node_id] != "ANY" and len(passing) == len(parents)
+            start = plan[released_by][1]
+        finish = start + (durations.get(node_id, 0.0) if runs else 0.0)
+        plan[node_id] = (start, finish, runs, released_by)
+    return plan
+
+
+def peak_parallelism(plan: Dict[str, Tuple[float, float, bool, Optional[str]]]) -> int:
+    """Most nodes running at the same time (a node ending frees its slot before one starting then takes it)."""
+    events = []
+    for start, finish, runs, _ in plan.values():
+        if runs and finish > start:
+            events.append((start, 1))
+            events.append((finish, -1))
+    running = peak = 0
+    for _, delta in sorted(events):
+        running += delta
+        peak = max(peak, running)
+    return peak
+
+
+async def estimate_runtime(compiled: CompiledGraph, workflow_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Predicted run time, critical path and peak parallelism of a compiled graph; None without history."""
+    timeout = settings.ESTIMATE_TIMEOUT_S
+    lookups = [duration_history.get(None, timeout)]
+    if workflow_id:
+        lookups.append(duration_history.get(workflow_id, timeout))
+    results = await asyncio.gather(*lookups)
+    if any(result is None for result in results):
+        return None
+    global_types = results[0].get("by_type", {})
+    history = results[1] if workflow_id else {}
+    by_node, by_type = history.get("by_node", {}), history.get("by_type", {})
+
+    durations: Dict[str, float] = {}
+    unknown = []
+    for node_id in compiled.order:
+        node_type = compiled.node_map[node_id].get("type")
+        estimate = by_node.get(node_id, by_type.get(node_type, global_types.get(node_type)))
+        if estimate is None:
+            unknown.append(node_id)
+        durations[node_id] = float(estimate or 0.0)
+
+    plan = schedule(compiled, durations)
+    # The last node to finish (on ties a running one, then the furthest downstream) and the chain of parents that released it
+    last = max(reversed(list(plan)), key=lambda n: (plan[n][1], plan[n][2]), default=None)
+    path = []
+    while last is not None:
+        path.append(last)
+        last = plan[last][3]
+    return {
+        "predicted_runtime_ms": round(plan[path[0]][1], 1) if path else 0.0,
+        "critical_path": path[::-1],
+        "peak_parallelism": peak_parallelism(plan),
+        "node_estimates_ms": {node_id: round(ms, 1) for node_id, ms in durations.items() if plan[node_id][2]},
+        "unknown": [node_id for node_id in unknown if plan[node_id][2]],
+    }
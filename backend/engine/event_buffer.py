@@ -0,0 +1,120 @@
+"""
+Per-run event ring buffers with sequence numbers.
+
+Every event emitted for a run gets a monotonically increasing `seq`. The last
+N events are kept in memory so a late or reconnecting client can ask for
+"everything after seq N" and then continue with live events, without reading
+the `runs` collection.
+
+When a run finishes its buffer is compacted to a snapshot: the latest
+`node_status` per node plus the final `run_finished` event. Log lines are
+dropped at that point (durable logs live in the log store).
+"""
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from config import settings
+
+# (seq, event, data)
+BufferedEvent = Tuple[int, str, Dict[str, Any]]
+
+
+class RunEventBuffer:
+    def __init__(self, thread_id: str, capacity: int):
+        self.thread_id = thread_id
+        self.events: Deque[BufferedEvent] = deque(maxlen=capacity)
+        self.last_seq = 0
+        self.finished = False
+        # Latest status event per node, survives ring eviction and compaction
+        self.node_status: Dict[str, BufferedEvent] = {}
+        self.final_event: Optional[BufferedEvent] = None
+
+    def reopen(self):
+        # Resume reuses the thread_id: keep numbering, forget the previous end
+        self.finished = False
+        self.final_event = None
+
+    def append(self, event: str, data: Dict[str, Any]) -> int:
+        self.last_seq += 1
+        entry = (self.last_seq, event, data)
+        if self.finished:
+            self.reopen()
+        self.events.append(entry)
+        if event == "node_status" and "nodeId" in data:
+            self.node_status[data["nodeId"]] = entry
+        elif event == "run_finished":
+            self.final_event = entry
+        return self.last_seq
+
+    def since(self, seq: int) -> List[BufferedEvent]:
+        """Events with a sequence number greater than `seq`, oldest first."""
+        first_retained = self.events[0][0] if self.events else self.last_seq + 1
+        backlog: List[BufferedEvent] = []
+        if seq + 1 < first_retained:
+            # Gap: evicted (or compacted) events are summarised by the status snapshot
+            backlog.extend(sorted(
+                (e for e in self.node_status.values() if seq < e[0] < first_retained),
+                key=lambda e: e[0],
+            ))
+            if self.final_event and seq < self.final_event[0] < first_retained:
+                backlog.append(self.final_event)
+        backlog.extend(e for e in self.events if e[0] > seq)
+        return backlog
+
+    def compact(self):
+        self.finished = True
+        self.events.clear()
+
+
+class RunEventBufferRegistry:
+    """thread_id -> RunEventBuffer. Finished runs are kept as snapshots, LRU-capped."""
+
+    def __init__(self, capacity: int, max_finished: int):
+        self.capacity = capacity
+        self.max_finished = max_finished
+        self._buffers: Dict[str, RunEventBuffer] = {}
+        self._finished: "OrderedDict[str, RunEventBuffer]" = OrderedDict()
+
+    def get(self, thread_id: str) -> Optional[RunEventBuffer]:
+        return self._buffers.get(thread_id) or self._finished.get(thread_id)
+
+    def open(self, thread_id: str) -> RunEventBuffer:
+        """
+        The live buffer of a run, created (or reopened, for a resume) when the
+        run is registered, so streams can attach before its first event.
+        """
+        buffer = self._buffers.get(thread_id)
+        if buffer is None:
+            buffer = self._finished.pop(thread_id, None) or RunEventBuffer(thread_id, self.capacity)
+            buffer.reopen()
+            self._buffers[thread_id] = buffer
+        return buffer
+
+    def append(self, thread_id: str, event: str, data: Dict[str, Any]) -> int:
+        return self.open(thread_id).append(event, data)
+
+    def replay(self, thread_id: str, since: int = 0) -> List[BufferedEvent]:
+        buffer = self.get(thread_id)
+        return buffer.since(since) if buffer else []
+
+    def finish(self, thread_id: str):
+        buffer = self._buffers.pop(thread_id, None)
+        if buffer is None:
+            return
+        buffer.compact()
+        self._finished[thread_id] = buffer
+        while len(self._finished) > self.max_finished:
+            self._finished.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active_runs": len(self._buffers),
+            "finished_snapshots": len(self._finished),
+            "buffered_events": sum(len(b.events) for b in self._buffers.values()),
+        }
+
+
+run_events = RunEventBufferRegistry(
+    capacity=settings.EVENT_BUFFER_SIZE,
+    max_finished=settings.EVENT_BUFFER_FINISHED_RUNS,
+)
@@ -0,0 +1,185 @@
+"""
+In-process event bus for run events.
+
+`publish()` never awaits: it stamps the event with its run `seq` (replay buffer)
+and enqueues it for every consumer. Each consumer (websocket delivery, log
+persistence, ...) drains its own bounded queue in its own task, so a slow
+consumer or many watching clients do not add latency to node execution.
+
+Overflow policy: when a lossy consumer (UI delivery) is full, `node_log` events
+are dropped for that consumer and counted. Events a full consumer cannot drop
+(every event for durable `lossy=False` consumers such as log persistence,
+control events for the others) apply backpressure instead: the engine's
+emitter awaits `wait_for_room()` before publishing, so queues never exceed
+`max_depth` and a stalled disk slows the run rather than growing memory.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from config import settings
+from .event_buffer import run_events
+
+Handler = Callable[[str, str, Dict[str, Any]], Awaitable[None]]
+LOSSY_EVENTS = {"node_log"}
+
+
+class _Consumer:
+    def __init__(self, name: str, handler: Handler, max_depth: int, lossy: bool = True):
+        self.name = name
+        self.handler = handler
+        self.max_depth = max_depth
+        self.lossy = lossy
+        self.queue: Deque[Tuple[str, str, Dict[str, Any]]] = deque()
+        self.ready: Optional[asyncio.Event] = None
+        self.room: Optional[asyncio.Event] = None  # set when the queue drops below max_depth
+        self.task: Optional[asyncio.Task] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.busy = False
+        # Metrics
+        self.enqueued = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.overflowed = 0  # events queued past max_depth by a publisher that did not wait for room
+        self.backpressure_waits = 0
+        self.backpressure_seconds = 0.0
+        self.errors = 0
+        self.high_watermark = 0
+        self.handler_seconds = 0.0
+
+    def must_wait(self, event: str) -> bool:
+        """Full, and `event` is not one this consumer may drop."""
+        return len(self.queue) >= self.max_depth and not (self.lossy and event in LOSSY_EVENTS)
+
+    def offer(self, item: Tuple[str, str, Dict[str, Any]]):
+        if len(self.queue) >= self.max_depth:
+            if self.lossy and item[1] in LOSSY_EVENTS:
+                self.dropped += 1
+                return
+            self.overflowed += 1
+        self.queue.append(item)
+        self.enqueued += 1
+        self.high_watermark = max(self.high_watermark, len(self.queue))
+        if self.ready:
+            self.ready.set()
+
+    async def run(self):
+        while True:
+            if not self.queue:
+                self.ready.clear()
+                await self.ready.wait()
+                continue
+            thread_id, event, data = self.queue.popleft()
+            if len(self.queue) < self.max_depth:
+                self.room.set()
+            started = time.perf_counter()
+            self.busy = True
+            try:
+                await self.handler(thread_id, event, data)
+                self.delivered += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"Event consumer '{self.name}' failed on {event}: {e}")
+            finally:
+                self.busy = False
+            self.handler_seconds += time.perf_counter() - started
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "depth": len(self.queue),
+            "max_depth": self.max_depth,
+            "lossy": self.lossy,
+            "high_watermark": self.high_watermark,
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "overflowed": self.overflowed,
+            "backpressure_waits": self.backpressure_waits,
+            "backpressure_ms": round(self.backpressure_seconds * 1000, 3),
+            "errors": self.errors,
+            "avg_handler_ms": round(self.handler_seconds * 1000 / self.delivered, 3) if self.delivered else 0.0,
+        }
+
+
+class EventBus:
+    def __init__(self, max_depth: int):
+        self.max_depth = max_depth
+        self._consumers: Dict[str, _Consumer] = {}
+        self.published = 0
+
+    def subscribe(self, name: str, handler: Handler, max_depth: Optional[int] = None, lossy: bool = True):
+        """`lossy=False` for consumers that must see every event (persistence): when full they hold up the emitter."""
+        self._consumers[name] = _Consumer(name, handler, max_depth or self.max_depth, lossy)
+
+    def _ensure_running(self, consumer: _Consumer):
+        loop = asyncio.get_running_loop()
+        if consumer.task is None or consumer.task.done() or consumer.loop is not loop:
+            consumer.loop = loop
+            consumer.ready = asyncio.Event()
+            consumer.room = asyncio.Event()
+            consumer.task = loop.create_task(consumer.run())
+
+    async def wait_for_room(self, event: str):
+        """Returns once every consumer that cannot drop `event` has room for it (publish right after, without awaiting)."""
+        while True:
+            blocked = None
+            for consumer in self._consumers.values():
+                self._ensure_running(consumer)
+                if consumer.must_wait(event):
+                    blocked = consumer
+                    break
+            if blocked is None:
+                return
+            blocked.backpressure_waits += 1
+            started = time.perf_counter()
+            blocked.room.clear()
+            await blocked.room.wait()
+            blocked.backpressure_seconds += time.perf_counter() - started
+
+    def publish(self, thread_id: str, event: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Non-blocking: sequence, buffer and enqueue. Returns the event as delivered.
+        Callers other than the emitter skip the backpressure (see `overflowed`).
+        """
+        # Inject thread_id so frontend knows which run this belongs to immediately
+        data_with_context = {**data, "thread_id": thread_id}
+        data_with_context["seq"] = run_events.append(thread_id, event, data_with_context)
+        if event == "run_finished":
+            run_events.finish(thread_id)
+        self.published += 1
+        for consumer in self._consumers.values():
+            self._ensure_running(consumer)
+            consumer.offer((thread_id, event, data_with_context))
+        return data_with_context
+
+    def emitter(self, thread_id: str) -> Callable[[str, Dict[str, Any]], Awaitable[None]]:
+        """The `emit_event(event, data)` callable handed to the engine and plugins."""
+        async def emit(event: str, data: Dict[str, Any]):
+            try:
+                await self.wait_for_room(event)
+                self.publish(thread_id, event, data)
+            except Exception as e:
+                print(f"Emit error: {e}")
+        return emit
+
+    async def drain(self, timeout: float = 5.0):
+        """Waits (bounded) until every consumer queue is empty, e.g. before shutdown."""
+        deadline = time.monotonic() + timeout
+        while any(c.queue or c.busy for c in self._consumers.values()) and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+
+    async def stop(self):
+        await self.drain()
+        for consumer in self._consumers.values():
+            if consumer.task:
+                consumer.task.cancel()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "published": self.published,
+            "consumers": {name: c.metrics() for name, c in self._consumers.items()},
+        }
+
+
+event_bus = EventBus(max_depth=settings.EVENT_BUS_MAX_QUEUE)
@@ -0,0 +1,146 @@
+"""
+Wire encodings for engine events on /ws/workflow.
+
+JSON (default) keeps the legacy `{"type": ..., "data": {...}}` text frames.
+The compact encodings (msgpack / CBOR) send binary frames with short keys,
+integer event/status codes and interned thread/node IDs: the first time an
+ID is seen on a connection it travels once inside the `x` table, afterwards
+only its integer reference is sent.
+
+Compact frame layout:
+    e  event code (int, or the raw event name if it has no code)
+    q  event sequence number within the run
+    t  thread ref          n  node ref
+    s  status code         k  log stream code       l  log text
+    d  any remaining event fields
+    x  new symbol definitions {ref: value}
+"""
+import json
+from typing import Any, Dict, Optional
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+# Frame code 0 is the hello frame carrying the code tables below
+HELLO_CODE = 0
+
+EVENT_CODES: Dict[str, int] = {
+    "node_status": 1,
+    "node_log": 2,
+    "interrupt": 3,
+    "run_finished": 4,
+}
+
+STATUS_CODES: Dict[str, int] = {
+    "pending": 0,
+    "running": 1,
+    "completed": 2,
+    "failed": 3,
+    "skipped": 4,
+    "restarting": 5,
+    "stopped": 6,
+    "cancelled": 7,
+    "resuming": 8,
+}
+
+STREAM_CODES: Dict[str, int] = {
+    "stdout": 0,
+    "stderr": 1,
+}
+
+
+class JsonEventCodec:
+    """Legacy text encoding. Stateless, so one frame can be shared by all JSON clients."""
+    name = "json"
+    binary = False
+
+    def hello(self) -> Optional[str]:
+        return json.dumps({"type": "hello", "data": {"encoding": self.name}})
+
+    def encode(self, event: str, data: Dict[str, Any]) -> str:
+        return json.dumps({"type": event, "data": data})
+
+
+class CompactEventCodec:
+    """
+    Binary encoding with per-connection symbol interning.
+    One instance per websocket: the symbol table is connection state.
+    """
+    binary = True
+
+    def __init__(self, name: str, dumps):
+        self.name = name
+        self._dumps = dumps
+        self._symbols: Dict[str, int] = {}
+
+    def _intern(self, value: str, definitions: Dict[int, str]) -> int:
+        ref = self._symbols.get(value)
+        if ref is None:
+            ref = len(self._symbols) + 1
+            self._symbols[value] = ref
+            definitions[ref] = value
+        return ref
+
+    def hello(self) -> bytes:
+        return self._dumps({
+            "e": HELLO_CODE,
+            "encoding": self.name,
+            "events": EVENT_CODES,
+            "statuses": STATUS_CODES,
+            "streams": STREAM_CODES,
+        })
+
+    def encode(self, event: str, data: Dict[str, Any]) -> bytes:
+        rest = dict(data)
+        definitions: Dict[int, str] = {}
+        frame: Dict[str, Any] = {"e": EVENT_CODES.get(event, event)}
+
+        thread_id = rest.pop("thread_id", None)
+        if thread_id is not None:
+            frame["t"] = self._intern(str(thread_id), definitions)
+
+        if "seq" in rest:
+            frame["q"] = rest.pop("seq")
+
+        node_id = rest.pop("nodeId", None)
+        if node_id is not None:
+            frame["n"] = self._intern(str(node_id), definitions)
+
+        if "status" in rest and rest["status"] in STATUS_CODES:
+            frame["s"] = STATUS_CODES[rest.pop("status")]
+
+        if event == "node_log":
+            if "log" in rest:
+                frame["l"] = rest.pop("log")
+            if rest.get("type") in STREAM_CODES:
+                frame["k"] = STREAM_CODES[rest.pop("type")]
+
+        if rest:
+            frame["d"] = rest
+        if definitions:
+            frame["x"] = definitions
+        return self._dumps(frame)
+
+
+def available_encodings() -> Dict[str, bool]:
+    return {"json": True, "msgpack": msgpack is not None, "cbor": cbor2 is not None}
+
+
+def get_event_codec(encoding: Optional[str]):
+    """
+    Returns a fresh codec for the requested encoding.
+    Unknown or unavailable encodings fall back to JSON.
+    """
+    encoding = (encoding or "json").lower()
+    if encoding == "msgpack" and msgpack is not None:
+        return CompactEventCodec("msgpack", lambda obj: msgpack.packb(obj, use_bin_type=True))
+    if encoding == "cbor" and cbor2 is not None:
+        return CompactEventCodec("cbor", cbor2.dumps)
+    return JsonEventCodec()
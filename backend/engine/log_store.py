@@ -0,0 +1,293 @@
+"""
+Durable, chunked node log storage.
+
+Every `node_log` line of a run is appended to per-node segment files:
+
+    <LOG_DIR>/<run>/<node>.seg    concatenated zlib-compressed chunks
+    <LOG_DIR>/<run>/<node>.idx    one fixed-size record per chunk
+    <LOG_DIR>/<run>/<node>.node   the node id itself
+
+`<run>` / `<node>` are `_file_name(id)`: a sanitized prefix of the ID plus a
+hash of the exact ID, so "a/b" and "a_b" never share files.
+
+Index record: raw_offset (u64), raw_len (u32), file_offset (u64), comp_len (u32).
+Offsets are byte offsets into the uncompressed log, so a range read only
+decompresses the chunks it overlaps. Bytes that have not filled a chunk yet
+stay in memory and are visible to readers (live tail).
+
+Retention: when a run finishes (at most every `_PRUNE_INTERVAL_S`), run
+directories older than FLOWX_LOG_RETENTION_S, then the oldest ones past
+FLOWX_LOG_DIR_MAX_BYTES, are deleted on the io pool.
+"""
+import asyncio
+import hashlib
+import re
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from config import settings
+from app.core.executors import executors, run_in
+from app.core.retention import remove, select_expired
+
+INDEX_RECORD = struct.Struct("<QIQI")
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def _safe_name(value: str) -> str:
+    """Maps an ID onto a single safe path component (no traversal)."""
+    name = _SAFE_NAME.sub("_", str(value))
+    return name if name.strip(".") else "_"
+
+
+def _file_name(value: str) -> str:
+    """Safe and collision-free path component for an ID: readable prefix + hash of the exact ID."""
+    text = str(value)
+    digest = hashlib.blake2b(text.encode("utf-8", errors="surrogatepass"), digest_size=8).hexdigest()
+    return f"{_safe_name(text)[:64]}-{digest}"
+
+
+# Seconds between two retention passes
+_PRUNE_INTERVAL_S = 300
+
+
+# (raw_offset, raw_len, file_offset, comp_len)
+ChunkIndex = Tuple[int, int, int, int]
+
+
+def _load_index(idx_path: Path) -> List[ChunkIndex]:
+    if not idx_path.exists():
+        return []
+    data = idx_path.read_bytes()
+    usable = len(data) - len(data) % INDEX_RECORD.size
+    return [INDEX_RECORD.unpack_from(data, pos) for pos in range(0, usable, INDEX_RECORD.size)]
+
+
+def _read_chunk(seg_file, entry: ChunkIndex) -> bytes:
+    seg_file.seek(entry[2])
+    return zlib.decompress(seg_file.read(entry[3]))
+
+
+class NodeLogWriter:
+    def __init__(self, run_dir: Path, node_id: str):
+        base = _file_name(node_id)
+        self.seg_path = run_dir / f"{base}.seg"
+        self.idx_path = run_dir / f"{base}.idx"
+        name_path = run_dir / f"{base}.node"
+        if not name_path.exists():
+            name_path.write_text(str(node_id), encoding="utf-8", errors="surrogateescape")
+        self.index: List[ChunkIndex] = _load_index(self.idx_path)
+        self.flushed_bytes = self.index[-1][0] + self.index[-1][1] if self.index else 0
+        self.file_size = self.seg_path.stat().st_size if self.seg_path.exists() else 0
+        self.pending = bytearray()
+        self.lock = asyncio.Lock()
+
+    @property
+    def total_bytes(self) -> int:
+        return self.flushed_bytes + len(self.pending)
+
+    def _write_chunk(self, raw: bytes) -> ChunkIndex:
+        compressed = zlib.compress(raw, settings.LOG_COMPRESSION_LEVEL)
+        entry = (self.flushed_bytes, len(raw), self.file_size, len(compressed))
+        with open(self.seg_path, "ab") as seg:
+            seg.write(compressed)
+        with open(self.idx_path, "ab") as idx:
+            idx.write(INDEX_RECORD.pack(*entry))
+        return entry
+
+    async def flush(self, force: bool = False):
+        async with self.lock:
+            while self.pending and (force or len(self.pending) >= settings.LOG_CHUNK_BYTES):
+                size = min(len(self.pending), settings.LOG_CHUNK_BYTES)
+                raw = bytes(self.pending[:size])
+                entry = await run_in("cpu", self._write_chunk, raw)
+                # Only drop from memory once the chunk is durable (readers never see a hole)
+                del self.pending[:size]
+                self.index.append(entry)
+                self.flushed_bytes += entry[1]
+                self.file_size += entry[3]
+
+
+class LogStore:
+    def __init__(self, root: Path):
+        self.root = root
+        # (thread_id, node_id) -> writer, only for runs still producing output
+        self._writers: Dict[Tuple[str, str], NodeLogWriter] = {}
+        self._last_prune = 0.0
+
+    def _run_dir(self, thread_id: str) -> Path:
+        return self.root / _file_name(thread_id)
+
+    # --- Write path ---
+
+    async def append(self, thread_id: str, node_id: str, text: str):
+        key = (thread_id, node_id)
+        writer = self._writers.get(key)
+        if writer is None:
+            run_dir = self._run_dir(thread_id)
+            run_dir.mkdir(parents=True, exist_ok=True)
+            writer = self._writers[key] = NodeLogWriter(run_dir, node_id)
+        writer.pending += text.encode("utf-8", errors="replace")
+        if len(writer.pending) >= settings.LOG_CHUNK_BYTES:
+            await writer.flush()
+
+    async def close_run(self, thread_id: str):
+        """Flushes the tail chunks of a finished run and releases its writers."""
+        for key in [k for k in self._writers if k[0] == thread_id]:
+            try:
+                await self._writers[key].flush(force=True)
+            except Exception as e:
+                print(f"Log flush failed for {key}: {e}")
+            self._writers.pop(key, None)
+        if time.monotonic() - self._last_prune >= _PRUNE_INTERVAL_S:
+            self._last_prune = time.monotonic()
+            executors.get("io").submit(self.prune, self._active_dirs())
+
+    # --- Retention ---
+
+    def _active_dirs(self) -> Set[Path]:
+        return {self._run_dir(thread_id) for thread_id, _ in self._writers}
+
+    def prune(self, active: Optional[Set[Path]] = None) -> int:
+        """Deletes expired run directories (never those of runs still writing). Returns how many."""
+        if not self.root.exists():
+            return 0
+        active = self._active_dirs() if active is None else active
+        captures = Path(settings.CAPTURE_DIR).resolve()
+        entries = []
+        for run_dir in self.root.iterdir():
+            if not run_dir.is_dir() or run_dir in active or run_dir.resolve() == captures:
+                continue
+            try:
+                files = [f.stat() for f in run_dir.iterdir() if f.is_file()]
+            except FileNotFoundError:
+                continue
+            newest = max((st.st_mtime for st in files), default=run_dir.stat().st_mtime)
+            entries.append((run_dir, newest, sum(st.st_size for st in files)))
+        return remove(select_expired(entries, settings.LOG_RETENTION_S, settings.LOG_DIR_MAX_BYTES, time.time()))
+
+    # --- Read path ---
+
+    def _snapshot(self, thread_id: str, node_id: str) -> Tuple[Path, List[ChunkIndex], bytes, int]:
+        """(segment path, chunk index, unflushed bytes, flushed byte count) at this instant."""
+        writer = self._writers.get((thread_id, node_id))
+        if writer is not None:
+            return writer.seg_path, list(writer.index), bytes(writer.pending), writer.flushed_bytes
+        run_dir = self._run_dir(thread_id)
+        base = _file_name(node_id)
+        index = _load_index(run_dir / f"{base}.idx")
+        flushed = index[-1][0] + index[-1][1] if index else 0
+        return run_dir / f"{base}.seg", index, b"", flushed
+
+    def list_nodes(self, thread_id: str) -> Dict[str, int]:
+        sizes: Dict[str, int] = {}
+        run_dir = self._run_dir(thread_id)
+        if run_dir.exists():
+            for name_path in run_dir.glob("*.node"):
+                index = _load_index(name_path.with_suffix(".idx"))
+                node_id = name_path.read_text(encoding="utf-8", errors="surrogateescape")
+                sizes[node_id] = index[-1][0] + index[-1][1] if index else 0
+        for (tid, node_id), writer in self._writers.items():
+            if tid == thread_id:
+                sizes[node_id] = writer.total_bytes
+        return sizes
+
+    @staticmethod
+    def _read_range(snapshot, offset: int, length: int) -> Dict[str, Any]:
+        seg_path, index, pending, flushed = snapshot
+        total = flushed + len(pending)
+        offset = max(0, min(offset, total))
+        end = min(total, offset + max(0, length))
+        parts: List[bytes] = []
+        if offset < flushed and index:
+            with open(seg_path, "rb") as seg:
+                for entry in index:
+                    chunk_start, chunk_end = entry[0], entry[0] + entry[1]
+                    if chunk_end <= offset or chunk_start >= end:
+                        continue
+                    raw = _read_chunk(seg, entry)
+                    parts.append(raw[max(0, offset - chunk_start):min(entry[1], end - chunk_start)])
+        if end > flushed:
+            parts.append(pending[max(0, offset - flushed):end - flushed])
+        data = b"".join(parts)
+        return {
+            "offset": offset,
+            "next_offset": offset + len(data),
+            "total_bytes": total,
+            "data": data.decode("utf-8", errors="replace"),
+        }
+
+    @staticmethod
+    def _grep(snapshot, pattern: "re.Pattern", limit: int, offset: int) -> Dict[str, Any]:
+        seg_path, index, pending, flushed = snapshot
+        matches: List[Dict[str, Any]] = []
+        carry = b""
+        carry_offset = offset
+
+        def scan(block: bytes, block_offset: int) -> bool:
+            nonlocal carry, carry_offset
+            data = carry + block
+            start = carry_offset if carry else block_offset
+            lines = data.split(b"\n")
+            carry = lines.pop()
+            position = start
+            for line in lines:
+                text = line.decode("utf-8", errors="replace")
+                if pattern.search(text):
+                    matches.append({"offset": position, "line": text})
+                    if len(matches) >= limit:
+                        return False
+                position += len(line) + 1
+            carry_offset = position
+            return True
+
+        keep_going = True
+        if index:
+            with open(seg_path, "rb") as seg:
+                for entry in index:
+                    if entry[0] + entry[1] <= offset:
+                        continue
+                    raw = _read_chunk(seg, entry)
+                    skip = max(0, offset - entry[0])
+                    if not scan(raw[skip:], entry[0] + skip):
+                        keep_going = False
+                        break
+        if keep_going and pending:
+            skip = max(0, offset - flushed)
+            keep_going = scan(pending[skip:], flushed + skip)
+        if keep_going and carry:
+            scan(b"\n", carry_offset + len(carry))
+        return {
+            "matches": matches,
+            "truncated": len(matches) >= limit,
+            "total_bytes": flushed + len(pending),
+        }
+
+    def _require_snapshot(self, thread_id: str, node_id: str):
+        # Taken on the event loop so it can't race a concurrent flush
+        snapshot = self._snapshot(thread_id, node_id)
+        if not snapshot[1] and not snapshot[2]:
+            raise FileNotFoundError(node_id)
+        return snapshot
+
+    async def read(self, thread_id: str, node_id: str, offset: int = 0, length: int = 65536) -> Dict[str, Any]:
+        snapshot = self._require_snapshot(thread_id, node_id)
+        length = min(length, settings.LOG_MAX_READ_BYTES)
+        return await run_in("io", self._read_range, snapshot, offset, length)
+
+    async def tail(self, thread_id: str, node_id: str, size: int = 65536) -> Dict[str, Any]:
+        snapshot = self._require_snapshot(thread_id, node_id)
+        size = min(size, settings.LOG_MAX_READ_BYTES)
+        total = snapshot[3] + len(snapshot[2])
+        return await run_in("io", self._read_range, snapshot, max(0, total - size), size)
+
+    async def grep(self, thread_id: str, node_id: str, pattern: str, limit: int = 100,
+                   offset: int = 0, ignore_case: bool = False) -> Dict[str, Any]:
+        compiled = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+        snapshot = self._require_snapshot(thread_id, node_id)
+        return await run_in("cpu", self._grep, snapshot, compiled, limit, offset)
+
+
+log_store = LogStore(Path(settings.LOG_DIR))
@@ -0,0 +1,235 @@
+"""
+Bounded command output capture.
+
+A command may print gigabytes; only the first `head_bytes` and the last
+`tail_bytes` are kept in memory, so a capture costs O(head + tail) whatever
+the output size. Totals (bytes, lines) are counted over the whole stream.
+
+Once output no longer fits (the first byte is about to be dropped), the
+complete stream is spilled to `<CAPTURE_DIR>/<name>-<uuid>.out.gz`: what is held in
+memory at that point is exactly everything seen so far, so the file starts
+with it and then receives every later chunk. Spilling stops after
+`CAPTURE_SPILL_MAX_BYTES` of raw output (`spill_truncated`).
+
+Compression and disk writes run on the `cpu` pool: `feed` (called on the event
+loop) only queues the chunk and never waits. If the writer falls
+`_SPILL_MAX_BACKLOG` behind, spilling stops there (`spill_truncated`, the rest
+is counted in `spill_dropped_bytes`). `close` returns at once;
+`wait_spilled()` blocks until the file is complete.
+Spill files are pruned by age and total size (FLOWX_CAPTURE_RETENTION_S,
+FLOWX_CAPTURE_DIR_MAX_BYTES) whenever a new one is opened.
+"""
+import gzip
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Optional, Set
+
+from config import settings
+from app.core.executors import executors
+from app.core.retention import remove, select_expired
+from .log_store import _file_name
+
+# Spill runs on a pool worker next to the command: favour speed over ratio
+_SPILL_COMPRESSION_LEVEL = 1
+# Queued-but-unwritten spill bytes before spilling gives up (the loop never waits for the writer)
+_SPILL_MAX_BACKLOG = 64 * 1024 * 1024
+
+# Spill files still being written (never pruned)
+_open_spills: Set[Path] = set()
+
+
+def prune_spills(directory: Path):
+    """Deletes spill files past the capture retention limits (oldest first)."""
+    if not directory.exists():
+        return
+    entries = []
+    for path in directory.glob("*.out.gz"):
+        if path in _open_spills:
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((path, stat.st_mtime, stat.st_size))
+    remove(select_expired(entries, settings.CAPTURE_RETENTION_S, settings.CAPTURE_DIR_MAX_BYTES, time.time()))
+
+
+class OutputCapture:
+    def __init__(
+        self,
+        head_bytes: Optional[int] = None,
+        tail_bytes: Optional[int] = None,
+        spill_name: Optional[str] = None,
+        spill: Optional[bool] = None,
+    ):
+        self.head_bytes = settings.CAPTURE_HEAD_BYTES if head_bytes is None else head_bytes
+        self.tail_bytes = settings.CAPTURE_TAIL_BYTES if tail_bytes is None else tail_bytes
+        self.spill_enabled = settings.CAPTURE_SPILL if spill is None else spill
+        self.spill_name = spill_name
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total_bytes = 0
+        self._newlines = 0
+        self._last_byte = b"\n"
+        self.spill_path: Optional[Path] = None
+        self.spilled_bytes = 0
+        self.spill_truncated = False
+        self._spill_file = None
+        # Spill writer state, shared with the pool worker under `_spill_cond`
+        self._spill_cond = threading.Condition()
+        self._spill_chunks: Deque[bytes] = deque()
+        self._spill_backlog = 0
+        self._spill_closing = False
+        self._spill_writer = None  # Future of the running writer, if any
+
+    @property
+    def total_lines(self) -> int:
+        """Lines seen, counting an unterminated last line."""
+        return self._newlines + (0 if self._last_byte == b"\n" else 1)
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_bytes > self.head_bytes + self.tail_bytes
+
+    @property
+    def omitted_bytes(self) -> int:
+        return self.total_bytes - len(self.head) - len(self.tail)
+
+    def feed(self, data: bytes):
+        if not data:
+            return
+        self.total_bytes += len(data)
+        self._newlines += data.count(b"\n")
+        self._last_byte = data[-1:]
+
+        if self._spill_file is not None:
+            self._spill(data)
+        elif self.truncated and self.spill_enabled and self.spill_path is None:
+            # First overflow: memory still holds the whole stream, start the file with it
+            self._open_spill()
+            self._spill(bytes(self.head) + bytes(self.tail) + data)
+
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data and self.tail_bytes > 0:
+            self.tail += data
+            if len(self.tail) > self.tail_bytes:
+                del self.tail[:len(self.tail) - self.tail_bytes]
+
+    def _open_spill(self):
+        directory = Path(settings.CAPTURE_DIR)
+        # Collision-free prefix for the caller's name, unique suffix so reruns never overwrite a referenced spill
+        name = f"{_file_name(self.spill_name)}-{uuid.uuid4().hex[:12]}" if self.spill_name else uuid.uuid4().hex
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            self.spill_path = directory / f"{name}.out.gz"
+            self._spill_file = gzip.open(self.spill_path, "wb", compresslevel=_SPILL_COMPRESSION_LEVEL)
+        except OSError as e:
+            print(f"Output capture: cannot spill to {directory}: {e}")
+            self.spill_path = None
+            self.spill_enabled = False
+            return
+        _open_spills.add(self.spill_path)
+        executors.get("io").submit(prune_spills, directory)
+
+    def _spill(self, data: bytes):
+        room = settings.CAPTURE_SPILL_MAX_BYTES - self.spilled_bytes
+        if len(data) > room:
+            data = data[:max(room, 0)]
+            self.spill_truncated = True
+        if data and not self._spill_closing:
+            with self._spill_cond:
+                if self._spill_backlog + len(data) > _SPILL_MAX_BACKLOG:
+                    # The disk can't keep up: a file with a hole would be worse than a short one
+                    print(f"Output capture: spill to {self.spill_path} fell {self._spill_backlog} bytes behind, stopping it")
+                    self.spill_truncated = True
+                else:
+                    self.spilled_bytes += len(data)
+                    self._spill_chunks.append(data)
+                    self._spill_backlog += len(data)
+                    self._start_writer()
+        if self.spill_truncated:
+            self._close_spill()
+
+    def _start_writer(self):
+        # Caller holds _spill_cond. One writer at a time keeps chunks in order.
+        if self._spill_writer is None and self._spill_file is not None:
+            self._spill_writer = executors.get("cpu").submit(self._write_spill)
+
+    def _write_spill(self):
+        """Pool worker: compresses queued chunks until none are left, closes the file once closing."""
+        while True:
+            with self._spill_cond:
+                if not self._spill_chunks:
+                    if self._spill_closing:
+                        self._finish_spill()
+                    self._spill_writer = None
+                    self._spill_cond.notify_all()
+                    return
+                data = self._spill_chunks.popleft()
+            try:
+                self._spill_file.write(data)
+            except (OSError, ValueError) as e:
+                print(f"Output capture: spill to {self.spill_path} failed: {e}")
+                self.spill_truncated = True
+                with self._spill_cond:
+                    self._spill_backlog -= sum(len(chunk) for chunk in self._spill_chunks)
+                    self._spill_chunks.clear()
+                    self._spill_closing = True
+            with self._spill_cond:
+                self._spill_backlog -= len(data)
+                self._spill_cond.notify_all()
+
+    def _finish_spill(self):
+        # Caller holds _spill_cond
+        if self._spill_file is not None:
+            try:
+                self._spill_file.close()
+            except OSError:
+                pass
+            self._spill_file = None
+            _open_spills.discard(self.spill_path)
+
+    def _close_spill(self):
+        with self._spill_cond:
+            if self._spill_file is None or self._spill_closing:
+                return
+            self._spill_closing = True
+            self._start_writer()
+
+    def close(self):
+        """Finishes the spill file in the background. The in-memory head/tail stay readable."""
+        self._close_spill()
+
+    def wait_spilled(self, timeout: Optional[float] = None) -> bool:
+        """After `close()`: blocks until the spill file is complete. False on timeout."""
+        with self._spill_cond:
+            return self._spill_cond.wait_for(lambda: self._spill_writer is None, timeout)
+
+    def text(self) -> str:
+        """Head + tail as text, with a note where output was dropped."""
+        if not self.truncated:
+            return (bytes(self.head) + bytes(self.tail)).decode("utf-8", errors="replace")
+        where = f"; full output in {self.spill_path}" if self.spill_path else ""
+        note = f"\n... [{self.omitted_bytes} bytes omitted{where}] ...\n"
+        return (
+            self.head.decode("utf-8", errors="replace")
+            + note
+            + self.tail.decode("utf-8", errors="replace")
+        )
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "total_bytes": self.total_bytes,
+            "total_lines": self.total_lines,
+            "truncated": self.truncated,
+            "omitted_bytes": self.omitted_bytes,
+            "spill_path": str(self.spill_path) if self.spill_path else None,
+            "spill_truncated": self.spill_truncated,
+            "spill_dropped_bytes": self.total_bytes - self.spilled_bytes if self.spill_path else 0,
+        }
@@ -0,0 +1,225 @@
+"""
+Non-PTY command runner: plain pipes, stdin closed, stdout and stderr kept apart.
+
+Driven by the event loop like the PTY runner: `add_reader` on both pipes and a
+pidfd for the exit, then `wait4` for the exit status and rusage (asyncio's
+subprocess transport reaps through its child watcher, which loses the rusage).
+"""
+import asyncio
+import codecs
+import os
+import signal
+import subprocess
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+from app.core.process import signal_group
+from config import settings
+from .output_capture import OutputCapture
+from .rusage import reap
+
+READ_SIZE = 65536
+# After the command exits, how long background children may keep its pipes open before we stop reading
+_DRAIN_AFTER_EXIT_S = 0.1
+
+
+class _PipeCommand:
+    def __init__(self, argv: Sequence[str], env: Optional[Dict[str, str]] = None, cwd: Optional[str] = None):
+        self.process = subprocess.Popen(
+            list(argv),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=env,
+            cwd=cwd,
+            start_new_session=True,  # own process group, like the PTY runner
+        )
+        self.loop = asyncio.get_running_loop()
+        self.chunks: asyncio.Queue = asyncio.Queue()  # (stream, bytes); (stream, None) = stream closed
+        self.exited = asyncio.Event()
+        self.rusage: Optional[Dict[str, Any]] = None
+        self._open: Dict[int, str] = {}
+        self._pidfd: Optional[int] = None
+        self._drain_timer = None
+
+        for name, pipe in (("stdout", self.process.stdout), ("stderr", self.process.stderr)):
+            fd = pipe.fileno()
+            os.set_blocking(fd, False)
+            self._open[fd] = name
+            self.loop.add_reader(fd, self._on_readable, fd)
+        try:
+            self._pidfd = os.pidfd_open(self.process.pid)
+            self.loop.add_reader(self._pidfd, self._on_exit)
+        except (AttributeError, OSError):
+            # No pidfd (non-Linux / old kernel): fall back to a slow poll for the exit status
+            self.loop.create_task(self._poll_exit())
+
+    def _read_available(self, fd: int) -> bool:
+        """Reads what the pipe has right now. False once it reported EOF."""
+        while True:
+            try:
+                data = os.read(fd, READ_SIZE)
+            except BlockingIOError:
+                return True
+            except OSError:
+                data = b""
+            if not data:
+                return False
+            self.chunks.put_nowait((self._open[fd], data))
+
+    def _close_stream(self, fd: int):
+        name = self._open.pop(fd, None)
+        if name is not None:
+            self.loop.remove_reader(fd)
+            self.chunks.put_nowait((name, None))
+
+    def _on_readable(self, fd: int):
+        if not self._read_available(fd):
+            self._close_stream(fd)
+
+    def _on_exit(self):
+        self.loop.remove_reader(self._pidfd)
+        self._mark_exited()
+
+    async def _poll_exit(self):
+        while True:
+            self.rusage = reap(self.process)
+            if self.process.returncode is not None:
+                break
+            await asyncio.sleep(0.05)
+        self._mark_exited()
+
+    def _mark_exited(self):
+        # Already exited: wait4 reaps without blocking and returns the tree's rusage
+        if self.process.returncode is None:
+            self.rusage = reap(self.process)
+        if self.process.returncode is None:
+            self.process.wait()
+        self.exited.set()
+        if self._open:
+            self._drain_timer = self.loop.call_later(_DRAIN_AFTER_EXIT_S, self._stop_reading)
+
+    def _stop_reading(self):
+        """Background children keep the pipes open: take what is buffered and stop there."""
+        for fd in list(self._open):
+            self._read_available(fd)
+            self._close_stream(fd)
+
+    @property
+    def streams_open(self) -> bool:
+        return bool(self._open) or not self.chunks.empty()
+
+    async def next_chunk(self) -> Tuple[str, Optional[bytes]]:
+        return await self.chunks.get()
+
+    async def close(self, grace: Optional[float] = None):
+        """Stops the command if it is still running (HUP/TERM the group, KILL after `grace`), reaps it, closes the pipes."""
+        if not self.exited.is_set():
+            grace = settings.PROCESS_KILL_GRACE_S if grace is None else grace
+            pid = self.process.pid
+            try:
+                signal_group(pid, signal.SIGHUP)
+                signal_group(pid, signal.SIGTERM)
+                try:
+                    await asyncio.wait_for(self.exited.wait(), grace)
+                except asyncio.TimeoutError:
+                    signal_group(pid, signal.SIGKILL)
+                    await self.exited.wait()
+            except asyncio.CancelledError:
+                # Cancelled again while stopping: no more grace
+                signal_group(pid, signal.SIGKILL)
+                self.process.wait()
+                self._release()
+                raise
+            # Leader is gone: take down whatever it left running in its group
+            signal_group(pid, signal.SIGKILL)
+        self._release()
+
+    def _release(self):
+        if self._drain_timer is not None:
+            self._drain_timer.cancel()
+        for fd in list(self._open):
+            self.loop.remove_reader(fd)
+        self._open.clear()
+        if self._pidfd is not None:
+            self.loop.remove_reader(self._pidfd)
+            os.close(self._pidfd)
+            self._pidfd = None
+        self.process.stdout.close()
+        self.process.stderr.close()
+
+
+async def run_argv(
+    argv: Sequence[str],
+    on_output: Callable[[str, str], Awaitable[None]] = None,
+    stdout_capture: Optional[OutputCapture] = None,
+    stderr_capture: Optional[OutputCapture] = None,
+    usage: Optional[Dict[str, Any]] = None,
+    env: Optional[Dict[str, str]] = None,
+    cwd: Optional[str] = None,
+) -> Tuple[int, str, str]:
+    """
+    Runs `argv` (no shell) on pipes. Returns (exit_code, stdout, stderr), each
+    bounded by its capture; `usage`, if given, receives the wait4 rusage.
+    Launch errors are raised. A cancelled run tears its process group down first.
+    """
+    stdout_capture = stdout_capture if stdout_capture is not None else OutputCapture()
+    stderr_capture = stderr_capture if stderr_capture is not None else OutputCapture()
+    captures = {"stdout": stdout_capture, "stderr": stderr_capture}
+    decoders = {name: codecs.getincrementaldecoder("utf-8")(errors="replace") for name in captures}
+    run: Optional[_PipeCommand] = None
+    try:
+        run = _PipeCommand(argv, env=env, cwd=cwd)
+        while run.streams_open:
+            name, data = await run.next_chunk()
+            if data is None:
+                tail = decoders[name].decode(b"", final=True)
+                if tail and on_output:
+                    await on_output(tail, name)
+                continue
+            captures[name].feed(data)
+            chunk = decoders[name].decode(data)
+            if chunk and on_output:
+                await on_output(chunk, name)
+
+        await run.exited.wait()
+        if usage is not None and run.rusage:
+            usage.update(run.rusage)
+        returncode = run.process.returncode
+        # Killed by a signal -> no exit status, reported as a failure
+        return (returncode if returncode >= 0 else 1), stdout_capture.text(), stderr_capture.text()
+    finally:
+        # Also runs on cancellation: never leave the command running or the pipes open
+        stdout_capture.close()
+        stderr_capture.close()
+        if run is not None:
+            await run.close()
+
+
+async def execute_in_pipe(
+    command: str,
+    on_output: Callable[[str, str], Awaitable[None]] = None,
+    stdout_capture: Optional[OutputCapture] = None,
+    stderr_capture: Optional[OutputCapture] = None,
+    usage: Optional[Dict[str, Any]] = None,
+) -> Tuple[int, str, str]:
+    """
+    Fast path for commands that need neither a TTY nor sudo: `bash -c` on plain
+    pipes, stdin closed. stdout and stderr stay separate and are streamed as
+    they arrive. Same contract as execute_in_pty: (exit_code, stdout, stderr),
+    output bounded by the captures, process group torn down on cancellation.
+    """
+    stdout_capture = stdout_capture if stdout_capture is not None else OutputCapture()
+    stderr_capture = stderr_capture if stderr_capture is not None else OutputCapture()
+    try:
+        return await run_argv(
+            ["/bin/bash", "-c", command],
+            on_output=on_output,
+            stdout_capture=stdout_capture,
+            stderr_capture=stderr_capture,
+            usage=usage,
+        )
+    except Exception as e:
+        error_msg = str(e)
+        if on_output:
+            await on_output(error_msg, "stderr")
+        return 1, stdout_capture.text(), error_msg
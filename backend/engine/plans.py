@@ -0,0 +1,180 @@
+"""
+Validated, compiled execution plans shared between /workflow/validate and /execute.
+
+A plan is keyed by a content hash of the executable projection of the graph:
+nodes without canvas fields and run-state data (see `node_projection`),
+edges without their rendering fields. Moving a node, selecting an edge or
+showing a run's logs keeps the hash, so
+
+    /workflow/validate   stores the plan when the graph has no critical errors
+    /execute             reuses it (validation skipped) or builds and stores it
+    restarts             keep running the same compiled graph
+    /resume              reuses the plan of the stored workflow when cached
+
+Saved workflows also store their executable projection and its hash
+(`executable_document`), so `/execute` by `{workflow_id, version}` finds the
+plan without the client uploading the graph.
+
+Validators that look outside the node config (`validation_cacheable = False`)
+are the only ones that run again on a hit.
+"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from config import settings
+from .compiler import CompiledGraph, compile_graph
+from .registry import NodeRegistry
+from .validator import avalidate_graph, avalidate_nodes, node_projection
+
+# Edge fields that only change how the canvas draws an edge
+EDGE_UI_KEYS = {'selected', 'animated', 'style', 'markerEnd', 'markerStart', 'className', 'zIndex', 'interactionWidth'}
+
+
+def edge_projection(edge: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in edge.items() if k not in EDGE_UI_KEYS}
+
+
+def executable_projection(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    return [node_projection(n) for n in nodes], [edge_projection(e) for e in edges]
+
+
+def graph_hash(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> str:
+    """Hash of an (already projected) graph. Order is kept: the first edge between two nodes decides routing."""
+    encoded = json.dumps({"nodes": nodes, "edges": edges}, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(encoded.encode(), digest_size=16).hexdigest()
+
+
+def executable_document(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """What a saved workflow stores for execution by reference: the projected graph and its hash."""
+    nodes, edges = executable_projection(nodes, edges)
+    return {"nodes": nodes, "edges": edges, "hash": graph_hash(nodes, edges)}
+
+
+def apply_overrides(nodes: List[Dict[str, Any]], overrides: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Copies of `nodes` with `overrides` ({node_id: {field: value}}) merged into their data."""
+    unknown = set(overrides) - {n['id'] for n in nodes}
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Overrides for unknown nodes: {', '.join(sorted(unknown))}")
+    return [{**n, 'data': {**(n.get('data') or {}), **overrides[n['id']]}} if n['id'] in overrides else n for n in nodes]
+
+
+def critical(errors: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [e for e in errors if e.get('level') == 'CRITICAL']
+
+
+class ExecutionPlan:
+    def __init__(self, plan_hash: str, compiled: CompiledGraph, validation_map: Dict[str, str], errors: List[Dict[str, Any]]):
+        self.plan_hash = plan_hash
+        self.compiled = compiled
+        self.validation_map = validation_map
+        # Non-critical findings (warnings) of the validation the plan passed
+        self.errors = errors
+        self.created_at = time.time()
+        # Reachable nodes whose validators are re-run on every hit
+        self.volatile_ids = [node_id for node_id in validation_map if not self._cacheable(compiled.node_map.get(node_id))]
+
+    @staticmethod
+    def _cacheable(node: Optional[Dict[str, Any]]) -> bool:
+        if node is None:
+            return True
+        try:
+            return getattr(NodeRegistry.get_node(node.get('type')), 'validation_cacheable', True)
+        except ValueError:
+            return True
+
+
+class PlanCache:
+    """LRU of validated execution plans keyed by graph hash."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.plans: "OrderedDict[str, ExecutionPlan]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.rechecked = 0  # volatile validators re-run on hits
+
+    def get(self, plan_hash: str) -> Optional[ExecutionPlan]:
+        plan = self.plans.get(plan_hash)
+        if plan is None:
+            self.misses += 1
+            return None
+        self.plans.move_to_end(plan_hash)
+        self.hits += 1
+        return plan
+
+    def put(self, plan: ExecutionPlan) -> ExecutionPlan:
+        self.plans[plan.plan_hash] = plan
+        self.plans.move_to_end(plan.plan_hash)
+        while len(self.plans) > self.max_entries:
+            self.plans.popitem(last=False)
+        return plan
+
+    def clear(self):
+        self.plans.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.plans),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "rechecked": self.rechecked,
+        }
+
+
+plan_cache = PlanCache(settings.PLAN_CACHE_MAX_ENTRIES)
+
+
+def remember_plan(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]], compiled: CompiledGraph,
+                  validation_map: Dict[str, str], errors: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Stores the plan of an already validated, projected graph (e.g. by
+    /workflow/validate). Returns its hash, or None when the graph cannot run.
+    """
+    if critical(errors):
+        return None
+    return plan_cache.put(ExecutionPlan(graph_hash(nodes, edges), compiled, validation_map, errors)).plan_hash
+
+
+async def reuse_plan(plan_hash: str) -> Optional[ExecutionPlan]:
+    """
+    The cached plan for `plan_hash`, with its volatile validators re-run;
+    None on a miss. Raises HTTPException(400) when one of them fails now.
+    """
+    plan = plan_cache.get(plan_hash)
+    if plan is not None and plan.volatile_ids:
+        plan_cache.rechecked += len(plan.volatile_ids)
+        outcomes = await avalidate_nodes(plan.compiled.node_map[node_id] for node_id in plan.volatile_ids)
+        errors = critical([e for _, node_errors, _ in outcomes.values() for e in node_errors])
+        if errors:
+            raise HTTPException(status_code=400, detail=errors)
+    return plan
+
+
+async def prepare_plan(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> ExecutionPlan:
+    """
+    Validated plan for a canvas graph: from the cache when the executable
+    projection was validated before, else validated, compiled and stored.
+    Raises HTTPException(400) with the critical errors like avalidate_workflow.
+    """
+    nodes, edges = executable_projection(nodes, edges)
+    plan_hash = graph_hash(nodes, edges)
+    plan = await reuse_plan(plan_hash)
+    if plan is not None:
+        return plan
+
+    validation_map, errors, _, compiled = await avalidate_graph(nodes, edges)
+    if critical(errors):
+        raise HTTPException(status_code=400, detail=critical(errors))
+    return plan_cache.put(ExecutionPlan(plan_hash, compiled, validation_map, errors))
+
+
+def cached_plan(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> Optional[ExecutionPlan]:
+    """The stored plan for a graph, if any (no validation on a miss)."""
+    return plan_cache.get(graph_hash(*executable_projection(nodes, edges)))
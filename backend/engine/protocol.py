@@ -18,6 +18,10 @@ class FlowXNode(ABC):
     Enforces the strategy pattern for validation and execution.
     """
     
+    # validate() results are cached by node config hash (engine/validator.py).
+    # Set to False when validate() depends on state outside the node config (filesystem, network).
+    validation_cacheable: bool = True
+
     def __init__(self, data: Dict[str, Any]):
         self.data = data
 
@@ -29,6 +33,14 @@ class FlowXNode(ABC):
         """
         pass
     
+    async def avalidate(self, data: Dict[str, Any]) -> ValidationResult:
+        """
+        Async validation used by the preflight, run concurrently across nodes.
+        Defaults to validate(); override for checks that need I/O (paths,
+        binaries, sandbox probes). Non-critical findings use level "WARNING".
+        """
+        return self.validate(data)
+
     @abstractmethod
     async def execute(self, context: RuntimeContext, payload: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -1,103 +1,255 @@
 import asyncio
-import pexpect
-from typing import Callable, Tuple
+import codecs
+import os
+import signal
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.executors import run_in
+from app.core.process import spawn_in_pty, signal_group
+from app.core.shell_pool import shell_pool
+from config import settings
+from .output_capture import OutputCapture
+from .rusage import reap
+
+READ_SIZE = 65536
+# Commands longer than a pipe buffer are handed to a pooled worker off the event loop
+_INLINE_COMMAND_BYTES = 60000
+
+
+class _PtyCommand:
+    """
+    One command on a PTY, driven by event-loop callbacks only: output via add_reader
+    on master_fd, exit via a pidfd. No thread and no polling per command.
+    """
+
+    def __init__(self, process, master_fd: int):
+        self.process = process
+        self.master_fd = master_fd
+        self.loop = asyncio.get_running_loop()
+        self.chunks: asyncio.Queue = asyncio.Queue()  # bytes, None = no more output
+        self.exited = asyncio.Event()
+        self._pidfd: Optional[int] = None
+        self._reading = True
+        self.rusage: Optional[Dict[str, Any]] = None
+
+        os.set_blocking(master_fd, False)
+        self.loop.add_reader(master_fd, self._on_readable)
+        try:
+            self._pidfd = os.pidfd_open(process.pid)
+            self.loop.add_reader(self._pidfd, self._on_exit)
+        except (AttributeError, OSError):
+            # No pidfd (non-Linux / old kernel): fall back to a slow poll for the exit status
+            self.loop.create_task(self._poll_exit())
+
+    def _read_available(self) -> bool:
+        """Reads what the PTY has right now. False once it reported EOF (EIO)."""
+        while True:
+            try:
+                data = os.read(self.master_fd, READ_SIZE)
+            except BlockingIOError:
+                return True
+            except OSError:
+                data = b""
+            if not data:
+                return False
+            self.chunks.put_nowait(data)
+
+    def _stop_reading(self):
+        if self._reading:
+            self._reading = False
+            self.loop.remove_reader(self.master_fd)
+            self.chunks.put_nowait(None)
+
+    def _on_readable(self):
+        if not self._read_available():
+            self._stop_reading()
+
+    def _on_exit(self):
+        self.loop.remove_reader(self._pidfd)
+        self._mark_exited()
+
+    async def _poll_exit(self):
+        while True:
+            self.rusage = reap(self.process)
+            if self.process.returncode is not None:
+                break
+            await asyncio.sleep(0.05)
+        self._mark_exited()
+
+    def _mark_exited(self):
+        # Already exited: wait4 reaps without blocking and returns the tree's rusage
+        if self.process.returncode is None:
+            self.rusage = reap(self.process)
+        if self.process.returncode is None:
+            self.process.wait()
+        # Background children may keep the PTY open: take what is buffered and stop here
+        if self._reading:
+            self._read_available()
+            self._stop_reading()
+        self.exited.set()
+
+    async def next_chunk(self) -> Optional[bytes]:
+        return await self.chunks.get()
+
+    def write(self, data: bytes):
+        try:
+            os.write(self.master_fd, data)
+        except OSError:
+            pass
+
+    async def wait(self) -> int:
+        await self.exited.wait()
+        return self.process.returncode
+
+    def _release(self):
+        if self._reading:
+            self._reading = False
+            self.loop.remove_reader(self.master_fd)
+        if self._pidfd is not None:
+            self.loop.remove_reader(self._pidfd)
+        for fd in (self.master_fd, self._pidfd):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._pidfd = None
+
+    async def close(self, grace: Optional[float] = None):
+        """
+        Stops the command if it is still running (cancelled run): SIGHUP/SIGTERM to
+        its process group, SIGKILL after `grace` seconds. Then reaps it and releases the fds.
+        """
+        if not self.exited.is_set():
+            grace = settings.PROCESS_KILL_GRACE_S if grace is None else grace
+            pid = self.process.pid
+            try:
+                signal_group(pid, signal.SIGHUP)
+                signal_group(pid, signal.SIGTERM)
+                try:
+                    await asyncio.wait_for(self.exited.wait(), grace)
+                except asyncio.TimeoutError:
+                    signal_group(pid, signal.SIGKILL)
+                    await self.exited.wait()
+            except asyncio.CancelledError:
+                # Cancelled again while stopping: no more grace
+                signal_group(pid, signal.SIGKILL)
+                self.process.wait()
+                self._release()
+                raise
+            # Leader is gone: take down whatever it left running in its group
+            signal_group(pid, signal.SIGKILL)
+        self._release()
+
+
+async def _start(command: str) -> _PtyCommand:
+    # Pre-warmed PTY + bash from the shell pool when one is idle
+    worker = shell_pool.acquire_exec_worker()
+    if worker is None:
+        return _PtyCommand(*spawn_in_pty(['/bin/bash', '-c', command]))
+    run = _PtyCommand(worker.process, worker.master_fd)
+    try:
+        if len(command) > _INLINE_COMMAND_BYTES:
+            await run_in("pty", worker.run, command)
+        else:
+            worker.run(command)
+    except BaseException:
+        # Failed or cancelled hand-over: killing the worker also unblocks a pending pipe write
+        await run.close(grace=0)
+        raise
+    return run
+
 
 async def execute_in_pty(
-    command: str, 
-    sudo_password: str = None, 
-    on_output: Callable[[str, str], None] = None
+    command: str,
+    sudo_password: str = None,
+    on_output: Callable[[str, str], Awaitable[None]] = None,
+    capture: Optional[OutputCapture] = None,
+    usage: Optional[Dict[str, Any]] = None,
 ) -> Tuple[int, str, str]:
     """
     Executes a command in an isolated PTY.
     Uses pure stream-reading and dynamic auto-injection to handle sudo securely.
+    Runs on the event loop (add_reader + pidfd), so concurrent commands cost no threads.
+    The returned stdout is bounded by `capture` (head + tail, see output_capture.py);
+    pass one in to read its totals and spill file afterwards. `usage`, if given,
+    receives the command's wait4 rusage (see rusage.py).
     """
-    loop = asyncio.get_running_loop()
-    result = {"exit_code": 1, "stdout": "", "stderr": ""}
+    capture = capture if capture is not None else OutputCapture()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    run: Optional[_PtyCommand] = None
+    print(f"[PTY DEBUG] Entry: command='{command}'")
 
-    def pexpect_thread_worker():
-        output_buffer = []
-        print(f"[PTY DEBUG] Entry: command='{command}'")
-        
-        try:
-            # 1. Spawn the raw command natively. No wrappers.
-            child = pexpect.spawn(
-                '/bin/bash', ['-c', command],
-                encoding='utf-8',
-                timeout=None, 
-                echo=False 
-            )
-
-            rolling_window = ""
-            print(f"[PTY DEBUG] Entering Pure Streaming Loop.")
-            
-            # 2. The Line-by-Line Streaming Engine
-            while True:
-                try:
-                    chunk = child.read_nonblocking(size=4096, timeout=0.1)
-                    if not chunk:
-                        if not child.isalive():
-                            break
-                        continue
-                    
-                    # 3. Dynamic Sudo Auto-Responder (ALWAYS LISTENING)
-                    rolling_window += chunk
-                    if len(rolling_window) > 256:
-                        rolling_window = rolling_window[-256:]
-                    
-                    window_lower = rolling_window.lower()
-                    
-                    # A. Detect any standard sudo prompt
-                    if "[sudo] password" in window_lower or "password for" in window_lower:
-                        if sudo_password:
-                            print(f"[PTY DEBUG] Auto-Answer Triggered!")
-                            child.sendline(sudo_password)
-                            rolling_window = "" # Clear window
-                        else:
-                            # THE FIX: Fail-Fast if prompt appears but no password is provided
-                            print(f"[PTY DEBUG] Sudo prompt detected, but Node is Unlocked! Aborting.")
-                            msg = "\n[FlowX Error] Sudo password required but Sudo Lock is OFF or Vault is empty.\n"
-                            if on_output:
-                                asyncio.run_coroutine_threadsafe(on_output(msg, "stderr"), loop)
-                            child.close()
-                            result["exit_code"] = 1
-                            return
-                             
-                    # B. Detect an incorrect password rejection
-                    elif "sorry, try again" in window_lower:
-                        print(f"[PTY DEBUG] Incorrect Password Detected. Aborting.")
-                        msg = "\n[FlowX Error] Incorrect sudo password.\n"
-                        if on_output:
-                            asyncio.run_coroutine_threadsafe(on_output(msg, "stderr"), loop)
-                        child.close()
-                        result["exit_code"] = 1
-                        return
-
-                    # 4. Stream to UI
-                    output_buffer.append(chunk)
+    try:
+        # 1. Spawn the raw command natively. No wrappers.
+        run = await _start(command)
+        rolling_window = ""
+
+        # 2. The Streaming Engine: one chunk per PTY read, until EOF or the command exits
+        while True:
+            data = await run.next_chunk()
+            if data is None:
+                break
+            capture.feed(data)
+            chunk = decoder.decode(data)
+            if not chunk:
+                continue
+
+            # 3. Dynamic Sudo Auto-Responder (ALWAYS LISTENING)
+            rolling_window += chunk
+            if len(rolling_window) > 256:
+                rolling_window = rolling_window[-256:]
+
+            window_lower = rolling_window.lower()
+
+            # A. Detect any standard sudo prompt
+            if "[sudo] password" in window_lower or "password for" in window_lower:
+                if sudo_password:
+                    print(f"[PTY DEBUG] Auto-Answer Triggered!")
+                    run.write(f"{sudo_password}\n".encode())
+                    rolling_window = "" # Clear window
+                else:
+                    # Fail-Fast if prompt appears but no password is provided
+                    print(f"[PTY DEBUG] Sudo prompt detected, but Node is Unlocked! Aborting.")
+                    msg = "\n[FlowX Error] Sudo password required but Sudo Lock is OFF or Vault is empty.\n"
                     if on_output:
-                        asyncio.run_coroutine_threadsafe(on_output(chunk, "stdout"), loop)
-                
-                except pexpect.TIMEOUT:
-                    if not child.isalive():
-                        print(f"[PTY DEBUG] Process finished (Timeout caught).")
-                        break
-                    continue
-                except pexpect.EOF:
-                    print(f"[PTY DEBUG] Process finished (EOF caught).")
-                    break
-
-            child.close()
-            result["exit_code"] = child.exitstatus if child.exitstatus is not None else 1
-            result["stdout"] = "".join(output_buffer)
-            print(f"[PTY DEBUG] Exit Code: {result['exit_code']}")
-
-        except Exception as e:
-            result["exit_code"] = 1
-            error_msg = str(e)
-            result["stderr"] = error_msg
+                        await on_output(msg, "stderr")
+                    return 1, "", ""
+
+            # B. Detect an incorrect password rejection
+            elif "sorry, try again" in window_lower:
+                print(f"[PTY DEBUG] Incorrect Password Detected. Aborting.")
+                msg = "\n[FlowX Error] Incorrect sudo password.\n"
+                if on_output:
+                    await on_output(msg, "stderr")
+                return 1, "", ""
+
+            # 4. Stream to UI
             if on_output:
-                asyncio.run_coroutine_threadsafe(on_output(error_msg, "stderr"), loop)
-            print(f"[PTY DEBUG] Exception: {e}")
+                await on_output(chunk, "stdout")
+
+        tail = decoder.decode(b"", final=True)
+        if tail and on_output:
+            await on_output(tail, "stdout")
+
+        returncode = await run.wait()
+        if usage is not None and run.rusage:
+            usage.update(run.rusage)
+        # Killed by a signal -> no exit status, reported as a failure
+        exit_code = returncode if returncode >= 0 else 1
+        print(f"[PTY DEBUG] Exit Code: {exit_code}")
+        capture.close()
+        return exit_code, capture.text(), ""
+
+    except Exception as e:
+        error_msg = str(e)
+        if on_output:
+            await on_output(error_msg, "stderr")
+        print(f"[PTY DEBUG] Exception: {e}")
+        return 1, "", error_msg
 
-    await loop.run_in_executor(None, pexpect_thread_worker)
-    return result["exit_code"], result["stdout"], result["stderr"]
+    finally:
+        # Also runs on cancellation: never leave the command running or the fds open
+        capture.close()
+        if run is not None:
+            await run.close()
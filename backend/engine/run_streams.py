@@ -0,0 +1,83 @@
+"""
+Per-run event streams for headless consumers (SSE).
+
+A stream is opened with a starting `seq` and an optional event-type filter.
+The buffered backlog is queued synchronously at open time, and live events
+arrive through the `streams` event-bus consumer; duplicates between the two
+are dropped by sequence number. `run_finished` always passes the filter so
+a stream knows when to end.
+"""
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Optional, Set
+
+from config import settings
+from .event_buffer import run_events, BufferedEvent
+from .event_bus import LOSSY_EVENTS
+
+
+class RunStream:
+    def __init__(self, thread_id: str, since: int, types: Optional[Set[str]], max_depth: int):
+        self.thread_id = thread_id
+        self.types = types
+        self.max_depth = max_depth
+        self.last_seq = since
+        self.dropped = 0
+        self._queue: Deque[BufferedEvent] = deque()
+        self._ready = asyncio.Event()
+
+    def offer(self, seq: int, event: str, data: Dict[str, Any]):
+        if seq <= self.last_seq:
+            return
+        self.last_seq = seq
+        if self.types and event not in self.types and event != "run_finished":
+            return
+        if len(self._queue) >= self.max_depth and event in LOSSY_EVENTS:
+            self.dropped += 1
+            return
+        self._queue.append((seq, event, data))
+        self._ready.set()
+
+    async def next(self, timeout: float) -> Optional[BufferedEvent]:
+        """Next event, or None if nothing arrived within `timeout` (caller sends a keep-alive)."""
+        if not self._queue:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self._queue.popleft()
+
+
+class RunStreamHub:
+    def __init__(self, max_depth: int):
+        self.max_depth = max_depth
+        self._streams: Dict[str, Set[RunStream]] = {}
+
+    def open(self, thread_id: str, since: int = 0, types: Optional[Iterable[str]] = None) -> RunStream:
+        stream = RunStream(thread_id, since, set(types) if types else None, self.max_depth)
+        for seq, event, data in run_events.replay(thread_id, since):
+            stream.offer(seq, event, data)
+        self._streams.setdefault(thread_id, set()).add(stream)
+        return stream
+
+    def close(self, stream: RunStream):
+        streams = self._streams.get(stream.thread_id)
+        if streams:
+            streams.discard(stream)
+            if not streams:
+                del self._streams[stream.thread_id]
+
+    async def dispatch(self, thread_id: str, event: str, data: Dict[str, Any]):
+        """Event-bus consumer handler."""
+        for stream in list(self._streams.get(thread_id, ())):
+            stream.offer(data.get("seq", 0), event, data)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "open_streams": sum(len(s) for s in self._streams.values()),
+            "dropped": sum(st.dropped for s in self._streams.values() for st in s),
+        }
+
+
+run_streams = RunStreamHub(max_depth=settings.EVENT_STREAM_MAX_QUEUE)
@@ -0,0 +1,75 @@
+"""
+Resource usage of executed commands.
+
+Runners reap their child with `wait4`, which returns the rusage of the child
+and every descendant it waited for (the command's process tree): CPU time,
+max RSS, block I/O and context switches. `run_usage` sums them per run so a
+workflow reports where its time went (CPU-bound vs waiting).
+"""
+import os
+from typing import Any, Dict, Optional
+
+# Counters summed per run; max_rss_kb keeps the maximum instead
+_SUMMED = ("user_cpu_s", "sys_cpu_s", "block_in", "block_out", "voluntary_ctx_switches", "involuntary_ctx_switches")
+
+
+def usage_from_rusage(ru) -> Dict[str, Any]:
+    return {
+        "user_cpu_s": round(ru.ru_utime, 4),
+        "sys_cpu_s": round(ru.ru_stime, 4),
+        "max_rss_kb": ru.ru_maxrss,
+        "block_in": ru.ru_inblock,
+        "block_out": ru.ru_oublock,
+        "voluntary_ctx_switches": ru.ru_nvcsw,
+        "involuntary_ctx_switches": ru.ru_nivcsw,
+    }
+
+
+def reap(process) -> Optional[Dict[str, Any]]:
+    """
+    wait4 on a child that has exited: sets `process.returncode` and returns its
+    rusage. None while it is still running or when someone else reaped it.
+    """
+    try:
+        pid, status, ru = os.wait4(process.pid, os.WNOHANG)
+    except ChildProcessError:
+        process.poll()
+        return None
+    if pid == 0:
+        return None
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return usage_from_rusage(ru)
+
+
+def with_cpu_ratio(usage: Dict[str, Any], duration_ms: int) -> Dict[str, Any]:
+    """Adds cpu_ratio = CPU seconds / wall seconds (~1 = CPU-bound, ~0 = waiting)."""
+    cpu = usage["user_cpu_s"] + usage["sys_cpu_s"]
+    usage["cpu_ratio"] = round(cpu / (duration_ms / 1000), 3) if duration_ms > 0 else None
+    return usage
+
+
+class RunUsageRegistry:
+    """Per-run totals of command resource usage, keyed by thread_id."""
+
+    def __init__(self):
+        self.runs: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, run_id: str, usage: Dict[str, Any], duration_ms: int = 0):
+        totals = self.runs.get(run_id)
+        if totals is None:
+            totals = self.runs[run_id] = {"commands": 0, "wall_ms": 0, "max_rss_kb": 0, **{key: 0 for key in _SUMMED}}
+        totals["commands"] += 1
+        totals["wall_ms"] += duration_ms
+        totals["max_rss_kb"] = max(totals["max_rss_kb"], usage.get("max_rss_kb", 0))
+        for key in _SUMMED:
+            totals[key] = round(totals[key] + usage.get(key, 0), 4)
+
+    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        totals = self.runs.get(run_id)
+        return dict(totals) if totals else None
+
+    def pop(self, run_id: str) -> Optional[Dict[str, Any]]:
+        return self.runs.pop(run_id, None)
+
+
+run_usage = RunUsageRegistry()
@@ -0,0 +1,204 @@
+"""
+Per-run session shells.
+
+CommandNodes with `sessionShell` enabled share one long-lived bash per run,
+so `cd`, exported variables and `source venv/bin/activate` carry over from
+one node to the next and builtins cost no fork.
+
+The shell sits on a PTY (like the PTY runner: echo off, controlling tty) and
+reads NUL-terminated commands from a pipe. Each command is `eval`ed in the
+shell itself and framed by the same OSC 1337 START/DONE markers the terminal
+uses, parsed with `MarkerParser`, so the exit code arrives in-band right
+after the command's output. Commands of one run execute one at a time, with
+stdin from /dev/null (nothing can answer a prompt). Output read past a DONE
+marker (e.g. from a background job) is kept for the next command.
+A command that exits the shell ends the session; the next one gets a fresh shell.
+Sudo-locked nodes keep using the PTY runner (password handling lives there).
+"""
+import asyncio
+import codecs
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple, Union
+
+from app.core.executors import run_in
+from app.core.process import spawn_in_pty, terminate_group, terminate_group_soon
+from app.core.terminal_protocol import MarkerParser
+from .output_capture import OutputCapture
+
+READ_SIZE = 65536
+# Commands longer than a pipe buffer are written off the event loop
+_INLINE_COMMAND_BYTES = 60000
+
+_SESSION_SCRIPT = (
+    'while IFS= read -r -d "" __flowx_cmd <&{fd}; do '
+    "printf '\\033]1337;START\\007'; "
+    'eval "$__flowx_cmd" {fd}<&- </dev/null; '
+    "printf '\\033]1337;DONE:%d\\007' \"$?\"; "
+    "done"
+)
+
+
+class SessionShell:
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        cmd_read, self._cmd_write = os.pipe()
+        try:
+            self.process, self.master_fd = spawn_in_pty(
+                ["/bin/bash", "--noprofile", "--norc", "-c", _SESSION_SCRIPT.format(fd=cmd_read)],
+                pass_fds=(cmd_read,),
+            )
+        except Exception:
+            os.close(self._cmd_write)
+            raise
+        finally:
+            os.close(cmd_read)
+        self.loop = asyncio.get_running_loop()
+        self.chunks: asyncio.Queue = asyncio.Queue()  # bytes, None = shell gone
+        self.lock = asyncio.Lock()
+        self.parser = MarkerParser()
+        # Parsed segments not consumed yet (what followed the last DONE marker in its read)
+        self.pending: Deque[Union[bytes, Tuple[str, Optional[int]]]] = deque()
+        self.commands = 0
+        self.created_at = time.time()
+        self.closed = False
+        os.set_blocking(self.master_fd, False)
+        self.loop.add_reader(self.master_fd, self._on_readable)
+
+    def _on_readable(self):
+        while True:
+            try:
+                data = os.read(self.master_fd, READ_SIZE)
+            except BlockingIOError:
+                return
+            except OSError:
+                data = b""
+            if not data:
+                self.loop.remove_reader(self.master_fd)
+                self.chunks.put_nowait(None)
+                return
+            self.chunks.put_nowait(data)
+
+    def alive(self) -> bool:
+        return not self.closed and self.process.poll() is None
+
+    async def _send(self, command: str):
+        data = command.encode("utf-8", errors="surrogateescape") + b"\0"
+        if len(data) > _INLINE_COMMAND_BYTES:
+            await run_in("pty", os.write, self._cmd_write, data)
+        else:
+            os.write(self._cmd_write, data)
+
+    async def run(
+        self,
+        command: str,
+        on_output: Optional[Callable[[str, str], Awaitable[None]]],
+        capture: OutputCapture,
+    ) -> int:
+        """Runs one command in the shell. Returns its exit code."""
+        async with self.lock:
+            self.commands += 1
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            try:
+                await self._send(command)
+                while True:
+                    if not self.pending:
+                        data = await self.chunks.get()
+                        if data is None:
+                            # The command ended the shell (exit / exec): its status is the shell's
+                            await self.close()
+                            returncode = self.process.returncode
+                            return returncode if returncode >= 0 else 1
+                        self.pending.extend(self.parser.feed(data))
+                        continue
+                    segment = self.pending.popleft()
+                    if isinstance(segment, tuple):
+                        if segment[0] == "done":
+                            tail = decoder.decode(b"", final=True)
+                            if tail and on_output:
+                                await on_output(tail, "stdout")
+                            return segment[1]
+                        continue
+                    capture.feed(segment)
+                    chunk = decoder.decode(segment)
+                    if chunk and on_output:
+                        await on_output(chunk, "stdout")
+            except asyncio.CancelledError:
+                # The command runs inside the shared shell: stopping it means ending the session
+                await self.close()
+                raise
+
+    def _release(self) -> bool:
+        """Closes the command pipe and the PTY (hangup for the shell). False if already done."""
+        self.closed = True
+        if self._cmd_write is None:
+            return False
+        os.close(self._cmd_write)
+        self._cmd_write = None
+        self.loop.remove_reader(self.master_fd)
+        try:
+            os.close(self.master_fd)
+        except OSError:
+            pass
+        return True
+
+    async def close(self):
+        if self._release():
+            await terminate_group(self.process)
+
+    def close_soon(self):
+        """Teardown from sync code."""
+        if self._release():
+            terminate_group_soon(self.process)
+
+
+class SessionShellRegistry:
+    """One session shell per run (thread_id), created on first use, closed when the run ends."""
+
+    def __init__(self):
+        self.shells: Dict[str, SessionShell] = {}
+        self.started = 0
+
+    async def execute(
+        self,
+        run_id: str,
+        command: str,
+        on_output: Callable[[str, str], Awaitable[None]] = None,
+        capture: Optional[OutputCapture] = None,
+    ) -> Tuple[int, str, str]:
+        """Same contract as execute_in_pty: (exit_code, stdout, stderr)."""
+        capture = capture if capture is not None else OutputCapture()
+        try:
+            shell = self.shells.get(run_id)
+            if shell is None or not shell.alive():
+                shell = self.shells[run_id] = SessionShell(run_id)
+                self.started += 1
+            exit_code = await shell.run(command, on_output, capture)
+            return exit_code, capture.text(), ""
+        except Exception as e:
+            error_msg = str(e)
+            if on_output:
+                await on_output(error_msg, "stderr")
+            return 1, "", error_msg
+        finally:
+            capture.close()
+
+    def close(self, run_id: str):
+        shell = self.shells.pop(run_id, None)
+        if shell is not None:
+            shell.close_soon()
+
+    def shutdown(self):
+        for run_id in list(self.shells):
+            self.close(run_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": len(self.shells),
+            "started": self.started,
+            "commands": sum(shell.commands for shell in self.shells.values()),
+        }
+
+
+session_shells = SessionShellRegistry()
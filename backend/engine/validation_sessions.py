@@ -0,0 +1,328 @@
+"""
+Incremental validation for the editor.
+
+`/workflow/validate` opens a session holding the graph it validated; the
+editor then sends only what changed to `/workflow/validate/diff`. A session
+keeps the adjacency, the reachable set and each reachable node's result, so
+a diff costs O(change):
+
+- added edges extend reachability with a BFS from the newly reached targets only
+- removed edges/nodes recompute reachability (graph-only BFS, no validate())
+  when they touched a reachable node
+- validators run (through the shared per-node cache, concurrently) for changed
+  or newly reachable nodes only, and the diff response carries just those nodes plus
+  the ids that stopped being reachable
+
+Cycles are checked the same way: a full compile on load (the response also
+carries the compiled graph's summary: depth, widths, fan-in, critical path),
+then only the added edges and newly reachable nodes on diffs. A full validate
+of a runnable graph, and a diff that changes its shape, also store its
+execution plan (engine/plans.py), so the following /execute skips validation;
+after config-only diffs /execute builds the plan from cached validator results. Full validates, and diffs that add or
+remove nodes or edges, carry a runtime `estimate` (engine/estimates.py).
+
+Sessions are versioned: a diff names the version it applies to, and a stale
+or evicted session answers 409 so the client falls back to a full validate.
+"""
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+
+from config import settings
+from .compiler import compile_graph, cycle_errors, find_cycle, find_path
+from .estimates import estimate_runtime
+from .plans import executable_projection, remember_plan
+from .validator import CONFIG_HANDLES, avalidate_nodes, edge_key, find_start_node, reachable_from
+
+
+class ValidationSession:
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.version = 0
+        # Whose run history the runtime estimates use (None: node type averages only)
+        self.workflow_id: Optional[str] = None
+        self._reset()
+
+    def _reset(self):
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self.edges: Dict[str, Dict[str, Any]] = {}
+        self.edges_by_node: Dict[str, Set[str]] = {}
+        # Multi-edges (different handles) between the same pair count separately
+        self.adj: Dict[str, Dict[str, int]] = {}
+        self.reachable: Set[str] = set()
+        self.results: Dict[str, Tuple[str, List[Dict[str, Any]]]] = {}
+        # A reachable cycle as [a, ..., a]; its nodes are reported VALIDATION_FAILED
+        self.cycle: Optional[List[str]] = None
+
+    # --- Graph bookkeeping ---
+
+    def _put_node(self, node: Dict[str, Any]):
+        node_id = node['id']
+        self.nodes[node_id] = node
+        self.adj.setdefault(node_id, {})
+        self.edges_by_node.setdefault(node_id, set())
+
+    def _drop_node(self, node_id: str):
+        for key in list(self.edges_by_node.get(node_id, ())):
+            self._drop_edge(key)
+        self.nodes.pop(node_id, None)
+        self.adj.pop(node_id, None)
+        self.edges_by_node.pop(node_id, None)
+        self.results.pop(node_id, None)
+
+    def _put_edge(self, edge: Dict[str, Any]):
+        key = edge_key(edge)
+        if key in self.edges:
+            self._drop_edge(key)
+        self.edges[key] = edge
+        src, trg = edge.get('source'), edge.get('target')
+        for node_id in (src, trg):
+            self.edges_by_node.setdefault(node_id, set()).add(key)
+        # Skip config-only edges (api-handle, tool-handle)
+        if edge.get('sourceHandle') not in CONFIG_HANDLES:
+            targets = self.adj.setdefault(src, {})
+            targets[trg] = targets.get(trg, 0) + 1
+
+    def _drop_edge(self, key: str) -> Optional[Dict[str, Any]]:
+        edge = self.edges.pop(key, None)
+        if edge is None:
+            return None
+        src, trg = edge.get('source'), edge.get('target')
+        for node_id in (src, trg):
+            self.edges_by_node.get(node_id, set()).discard(key)
+        if edge.get('sourceHandle') not in CONFIG_HANDLES:
+            targets = self.adj.get(src, {})
+            if targets.get(trg, 0) > 1:
+                targets[trg] -= 1
+            else:
+                targets.pop(trg, None)
+        return edge
+
+    def _compute_reachable(self):
+        # Edges may name nodes that do not exist (yet); they never make anything reachable
+        start_id = find_start_node(list(self.nodes.values()))['id']
+        self.reachable = reachable_from([start_id], self.adj, known=self.nodes)
+
+    def _extends_reachability(self, edge: Dict[str, Any]) -> bool:
+        return edge.get('source') in self.reachable and edge.get('sourceHandle') not in CONFIG_HANDLES
+
+    # --- Validation ---
+
+    async def _revalidate(self, node_ids) -> Tuple[List[str], Dict[str, float]]:
+        """Runs the (async, concurrent) validators; returns the ids and the timings of validators that ran."""
+        timings: Dict[str, float] = {}
+        outcomes = await avalidate_nodes(self.nodes[node_id] for node_id in node_ids)
+        for node_id, (status, errors, duration_ms) in outcomes.items():
+            self.results[node_id] = (status, errors)
+            if duration_ms is not None:
+                timings[node_id] = duration_ms
+        return list(outcomes), timings
+
+    async def load(self, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]], workflow_id: Optional[str] = None) -> Dict[str, Any]:
+        """Full graph: returns the complete validation map."""
+        self._reset()
+        self.workflow_id = workflow_id
+        for node in nodes:
+            self._put_node(node)
+        for edge in edges:
+            self._put_edge(edge)
+        self.version = 1
+        self._compute_reachable()
+        revalidated, timings = await self._revalidate(self.reachable)
+        nodes, edges = executable_projection(nodes, edges)
+        compiled = compile_graph(nodes, edges)
+        self.cycle = compiled.find_cycle(self.reachable)
+        validation_map, errors = self._entries(self.results)
+        response = self._response(validation_map, errors, revalidated, [], timings)
+        response["graph"] = compiled.summary()
+        response["estimate"] = await estimate_runtime(compiled, self.workflow_id)
+        # A runnable graph's plan is kept for /execute (None when it has critical errors)
+        response["plan_hash"] = remember_plan(nodes, edges, compiled, validation_map, errors)
+        return response
+
+    async def apply(
+        self,
+        upserted_nodes: List[Dict[str, Any]],
+        removed_nodes: List[str],
+        added_edges: List[Dict[str, Any]],
+        removed_edges: List[str],
+    ) -> Dict[str, Any]:
+        """Edit: returns only the revalidated nodes and the ids that are no longer reachable."""
+        self.version += 1
+        shrinks = False
+        start_changed = False
+        dropped = []
+
+        for node_id in removed_nodes:
+            if node_id in self.nodes:
+                shrinks = shrinks or node_id in self.reachable
+                start_changed = start_changed or self.nodes[node_id].get('type') == 'startNode'
+                if node_id in self.results:
+                    dropped.append(node_id)
+                self._drop_node(node_id)
+                self.reachable.discard(node_id)
+        for key in removed_edges:
+            edge = self._drop_edge(key)
+            if edge is not None and self._extends_reachability(edge):
+                shrinks = True
+
+        changed = set()
+        frontier = []
+        # Nodes or edges added/removed (or a node's type changed): the runtime estimate is redone
+        restructured = bool(removed_nodes or added_edges or removed_edges)
+        for node in upserted_nodes:
+            previous = self.nodes.get(node['id'])
+            restructured = restructured or previous is None or previous.get('type') != node.get('type')
+            if 'startNode' in (node.get('type'), (previous or {}).get('type')):
+                start_changed = start_changed or previous is None or previous.get('type') != node.get('type')
+            self._put_node(node)
+            changed.add(node['id'])
+            if previous is None:
+                # Edges may have arrived before the node they point to
+                frontier.extend(node['id'] for key in self.edges_by_node[node['id']]
+                                if self.edges[key].get('target') == node['id'] and self._extends_reachability(self.edges[key]))
+        for edge in added_edges:
+            replaced = self.edges.get(edge_key(edge))
+            if replaced is not None and self._extends_reachability(replaced):
+                shrinks = True
+            self._put_edge(edge)
+            if self._extends_reachability(edge):
+                frontier.append(edge.get('target'))
+
+        if shrinks or start_changed or not self.reachable:
+            self._compute_reachable()
+            newly_reachable = self.reachable - set(self.results)
+            for node_id in [n for n in self.results if n not in self.reachable]:
+                del self.results[node_id]
+                dropped.append(node_id)
+        else:
+            # Extends the reachable set in place; the BFS stops at nodes reached before
+            newly_reachable = reachable_from(frontier, self.adj, self.reachable, known=self.nodes)
+
+        revalidated, timings = await self._revalidate((changed & self.reachable) | newly_reachable)
+
+        previous_cycle = self.cycle
+        if previous_cycle or start_changed:
+            self.cycle = compile_graph(list(self.nodes.values()), list(self.edges.values())).find_cycle(self.reachable)
+        else:
+            self.cycle = self._new_cycle(added_edges, newly_reachable)
+        if self.cycle != previous_cycle:
+            # Nodes entering or leaving a cycle change status without being revalidated
+            for cycle in (previous_cycle, self.cycle):
+                for node_id in (cycle or [])[:-1]:
+                    if node_id in self.results and node_id not in revalidated:
+                        revalidated.append(node_id)
+
+        validation_map, errors = self._entries(revalidated)
+        response = self._response(validation_map, errors, revalidated, dropped, timings)
+        if restructured:
+            # The shape changed: the graph is compiled anyway for the estimate, so its plan is kept too.
+            # Config-only diffs stay O(change); /execute builds their plan (validators hit the cache).
+            nodes, edges = executable_projection(list(self.nodes.values()), list(self.edges.values()))
+            compiled = compile_graph(nodes, edges)
+            response["estimate"] = await estimate_runtime(compiled, self.workflow_id)
+            response["plan_hash"] = remember_plan(nodes, edges, compiled, *self._entries(self.results))
+        return response
+
+    def _new_cycle(self, added_edges: List[Dict[str, Any]], newly_reachable: Set[str]) -> Optional[List[str]]:
+        """
+        Cycle check in O(change) for an acyclic session: a new reachable cycle
+        either runs through an added edge u -> v (then v reaches u) or lies
+        entirely in the newly reachable part.
+        """
+        for edge in added_edges:
+            src, trg = edge.get('source'), edge.get('target')
+            if edge.get('sourceHandle') in CONFIG_HANDLES or src not in self.reachable or trg not in self.reachable:
+                continue
+            path = find_path(self.adj, trg, src, self.reachable)
+            if path:
+                return [src] + path
+        return find_cycle(self.adj, newly_reachable) if newly_reachable else None
+
+    def _entries(self, node_ids) -> Tuple[Dict[str, str], List[Dict[str, Any]]]:
+        """validation_map and errors for `node_ids`, with the cycle (if any) overlaid."""
+        on_cycle = set(self.cycle[:-1]) if self.cycle else set()
+        validation_map: Dict[str, str] = {}
+        errors: List[Dict[str, Any]] = []
+        for node_id in node_ids:
+            status, node_errors = self.results[node_id]
+            validation_map[node_id] = "VALIDATION_FAILED" if node_id in on_cycle else status
+            errors.extend(node_errors)
+        if on_cycle:
+            errors.extend(e for e in cycle_errors(self.cycle) if e["nodeId"] in validation_map)
+        return validation_map, errors
+
+    def _response(self, validation_map, errors, revalidated, dropped, timings) -> Dict[str, Any]:
+        return {
+            "status": "success",
+            "validation_map": validation_map,
+            "errors": errors,
+            "session_id": self.session_id,
+            "version": self.version,
+            "revalidated": revalidated,
+            "dropped": dropped,
+            "timings_ms": timings,
+        }
+
+
+class ValidationSessionRegistry:
+    """LRU of editor validation sessions (one per open canvas)."""
+
+    def __init__(self, max_sessions: int):
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[str, ValidationSession]" = OrderedDict()
+        self.full = 0
+        self.diffs = 0
+        self.stale = 0
+
+    async def validate(self, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]], session_id: Optional[str] = None,
+                       workflow_id: Optional[str] = None) -> Dict[str, Any]:
+        """Full validation; (re)opens the session the next diffs apply to."""
+        session_id = session_id or uuid.uuid4().hex
+        session = self.sessions.get(session_id) or ValidationSession(session_id)
+        self.sessions[session_id] = session
+        self.sessions.move_to_end(session_id)
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+        self.full += 1
+        try:
+            return await session.load(nodes, edges, workflow_id)
+        except HTTPException:
+            # No usable graph: do not keep a half-loaded session around
+            self.sessions.pop(session_id, None)
+            raise
+
+    async def apply_diff(
+        self,
+        session_id: str,
+        base_version: int,
+        upserted_nodes: List[Dict[str, Any]],
+        removed_nodes: List[str],
+        added_edges: List[Dict[str, Any]],
+        removed_edges: List[str],
+    ) -> Dict[str, Any]:
+        """
+        Applies an edit to the session graph. The response only carries the
+        revalidated nodes (`validation_map`/`errors`) and the ids that left the
+        reachable set (`dropped`); the client merges them into its previous map.
+        """
+        session = self.sessions.get(session_id)
+        if session is None or session.version != base_version:
+            self.stale += 1
+            raise HTTPException(status_code=409, detail="Validation session expired or out of date; send the full graph")
+        self.sessions.move_to_end(session_id)
+        self.diffs += 1
+        try:
+            return await session.apply(upserted_nodes, removed_nodes, added_edges, removed_edges)
+        except HTTPException:
+            # e.g. the diff removed the Start Node: the client has to resync with a full validate
+            self.sessions.pop(session_id, None)
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        return {"sessions": len(self.sessions), "full": self.full, "diffs": self.diffs, "stale": self.stale}
+
+
+validation_sessions = ValidationSessionRegistry(settings.VALIDATION_SESSIONS_MAX)
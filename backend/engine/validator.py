@@ -1,39 +1,174 @@
-from typing import List, Dict, Any, Set
-from collections import deque
+from typing import List, Dict, Any, Set, Tuple, Optional
+from collections import deque, OrderedDict
+import asyncio
+import hashlib
+import json
+import time
 from fastapi import HTTPException
 
+from config import settings
+
 # Registry & Protocol
 from .registry import NodeRegistry
+from .compiler import CompiledGraph, compile_graph, cycle_errors
 
 # All node registrations are now handled dynamically by NodeRegistry.load_plugins()
 
 # Config-only edge handles to exclude from execution graph
 CONFIG_HANDLES = {'api-handle', 'tool-handle'}
 
-def validate_graph(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> Dict[str, str]:
+# Canvas-only node keys: layout and selection never change what a node validates to
+UI_NODE_KEYS = {'position', 'positionAbsolute', 'measured', 'selected', 'dragging', 'width', 'height', 'zIndex', 'style', 'className'}
+# Runtime fields the frontend writes into node.data while showing a run
+RUNTIME_DATA_KEYS = {'status', 'execution_status', 'thread_id', 'logs', 'history'}
+
+
+def node_projection(node: Dict[str, Any]) -> Dict[str, Any]:
+    """The part of a canvas node that validation (and execution) depends on."""
+    projected = {k: v for k, v in node.items() if k not in UI_NODE_KEYS}
+    data = node.get('data')
+    if isinstance(data, dict):
+        projected['data'] = {k: v for k, v in data.items() if k not in RUNTIME_DATA_KEYS}
+    return projected
+
+
+def node_config_hash(node: Dict[str, Any]) -> str:
+    encoded = json.dumps(node_projection(node), sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(encoded.encode(), digest_size=16).hexdigest()
+
+
+def edge_key(edge: Dict[str, Any]) -> str:
+    """React Flow edges carry an id; hand-written ones may not."""
+    return edge.get('id') or f"{edge.get('source')}->{edge.get('target')}:{edge.get('sourceHandle')}:{edge.get('targetHandle')}"
+
+
+class ValidationCache:
     """
-    Tier 2 Graph Compiler:
-    1. Reachability Analysis (BFS from StartNode).
-    2. Parallel Validation of REACHABLE nodes only.
-    3. Output Aggregation (NodeID -> Status).
-    
-    Status: 'READY' | 'VALIDATION_FAILED'
+    LRU of per-node validation results keyed by (node id, config hash), shared
+    by every caller, so re-validating an edited graph only runs validate() for
+    the nodes whose configuration changed.
     """
-    validation_map: Dict[str, str] = {}
-    
-    # --- 1. Identify Start Node ---
-    start_nodes = [n for n in nodes if n.get('type') == 'startNode']
-    if not start_nodes:
-        raise HTTPException(status_code=400, detail=[{"nodeId": "global", "message": "No Start Node found", "level": "CRITICAL"}])
-    if len(start_nodes) > 1:
-        raise HTTPException(status_code=400, detail=[{"nodeId": "global", "message": "Multiple Start Nodes found", "level": "CRITICAL"}])
-    
-    start_node = start_nodes[0]
-    start_id = start_node['id']
-    
-    # --- 2. Reachability Analysis (BFS) ---
-    # Build Adjacency List
-    adj_list: Dict[str, List[str]] = {n['id']: [] for n in nodes}
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple[str, str], Tuple[str, List[Dict[str, Any]]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key: Tuple[str, str], result: Tuple[str, List[Dict[str, Any]]]):
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+validation_cache = ValidationCache(settings.VALIDATION_CACHE_MAX_ENTRIES)
+
+
+def _outcome(result) -> Tuple[str, List[Dict[str, Any]]]:
+    # Warnings (non-critical entries of a valid result) are kept for the editor
+    return ("READY" if result['valid'] else "VALIDATION_FAILED"), list(result['errors'])
+
+
+def _store(key, node_class, outcome):
+    # Validators that look outside the node config (filesystem, network) opt out
+    if getattr(node_class, 'validation_cacheable', True):
+        validation_cache.put(key, outcome)
+    return outcome
+
+
+def _failed(node_id: str, message: str) -> Tuple[str, List[Dict[str, Any]]]:
+    return "VALIDATION_FAILED", [{"nodeId": node_id, "message": message, "level": "CRITICAL"}]
+
+
+def validate_node(node: Dict[str, Any]) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Runs one node's validate() through the cache.
+    Returns (status, errors) with status 'READY' | 'VALIDATION_FAILED'.
+    """
+    node_id = node['id']
+    node_type = node.get('type')
+    key = (node_id, node_config_hash(node))
+    cached = validation_cache.get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        node_class = NodeRegistry.get_node(node_type)
+    except ValueError:
+        # Unknown node type - treat as failed or specialized state
+        return _failed(node_id, f"Unknown node type: {node_type}")
+    try:
+        result = node_class(node).validate(node)
+    except Exception as e:
+        return _failed(node_id, str(e))
+    return _store(key, node_class, _outcome(result))
+
+
+async def avalidate_node(node: Dict[str, Any]) -> Tuple[str, List[Dict[str, Any]], Optional[float]]:
+    """
+    Async variant of validate_node: awaits the plugin's avalidate() (which may
+    do I/O) under FLOWX_VALIDATION_NODE_TIMEOUT_S. Returns (status, errors,
+    duration_ms); duration_ms is None for cache hits.
+    """
+    node_id = node['id']
+    node_type = node.get('type')
+    key = (node_id, node_config_hash(node))
+    cached = validation_cache.get(key)
+    if cached is not None:
+        return (*cached, None)
+
+    started = time.perf_counter()
+    try:
+        node_class = NodeRegistry.get_node(node_type)
+    except ValueError:
+        return (*_failed(node_id, f"Unknown node type: {node_type}"), 0.0)
+    try:
+        result = await asyncio.wait_for(node_class(node).avalidate(node), settings.VALIDATION_NODE_TIMEOUT_S)
+        outcome = _store(key, node_class, _outcome(result))
+    except asyncio.TimeoutError:
+        outcome = _failed(node_id, f"Validation timed out after {settings.VALIDATION_NODE_TIMEOUT_S:g}s")
+    except Exception as e:
+        outcome = _failed(node_id, str(e))
+    return (*outcome, round((time.perf_counter() - started) * 1000, 2))
+
+
+async def avalidate_nodes(nodes) -> Dict[str, Tuple[str, List[Dict[str, Any]], Optional[float]]]:
+    """Validates `nodes` concurrently, at most FLOWX_VALIDATION_CONCURRENCY validators at a time."""
+    limit = asyncio.Semaphore(settings.VALIDATION_CONCURRENCY)
+
+    async def bounded(node):
+        async with limit:
+            return await avalidate_node(node)
+
+    nodes = list(nodes)
+    results = await asyncio.gather(*(bounded(node) for node in nodes))
+    return {node['id']: result for node, result in zip(nodes, results)}
+
+
+def build_adjacency(node_ids, edges: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    adj_list: Dict[str, List[str]] = {node_id: [] for node_id in node_ids}
     for edge in edges:
         # Skip config-only edges (api-handle, tool-handle)
         if edge.get('sourceHandle') in CONFIG_HANDLES:
@@ -42,48 +177,81 @@ def validate_graph(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) ->
         trg = edge.get('target')
         if src in adj_list and trg in adj_list:
             adj_list[src].append(trg)
-            
-    # BFS
-    reachable_ids: Set[str] = set()
-    queue = deque([start_id])
-    reachable_ids.add(start_id)
-    
+    return adj_list
+
+
+def reachable_from(start_ids, adj_list, visited: Optional[Set[str]] = None, known=None) -> Set[str]:
+    """
+    BFS from `start_ids`; returns the ids it reached. With `visited` (extended
+    in place) the search stops at nodes reached before and returns only the new
+    ones. With `known`, ids outside it (edges to nodes that do not exist) are ignored.
+    """
+    visited = set() if visited is None else visited
+    reached = {start_id for start_id in start_ids
+               if start_id not in visited and (known is None or start_id in known)}
+    visited.update(reached)
+    queue = deque(reached)
     while queue:
         curr = queue.popleft()
-        for neighbor in adj_list[curr]:
-            if neighbor not in reachable_ids:
-                reachable_ids.add(neighbor)
+        for neighbor in adj_list.get(curr, ()):
+            if neighbor not in visited and (known is None or neighbor in known):
+                visited.add(neighbor)
+                reached.add(neighbor)
                 queue.append(neighbor)
+    return reached
+
+
+def find_start_node(nodes) -> Dict[str, Any]:
+    start_nodes = [n for n in nodes if n.get('type') == 'startNode']
+    if not start_nodes:
+        raise HTTPException(status_code=400, detail=[{"nodeId": "global", "message": "No Start Node found", "level": "CRITICAL"}])
+    if len(start_nodes) > 1:
+        raise HTTPException(status_code=400, detail=[{"nodeId": "global", "message": "Multiple Start Nodes found", "level": "CRITICAL"}])
+    return start_nodes[0]
+
+
+def check_cycles(compiled: CompiledGraph, reachable_ids, validation_map: Dict[str, str], errors: List[Dict[str, Any]]):
+    """Marks the nodes of a reachable cycle VALIDATION_FAILED, with the cycle path in their errors."""
+    cycle = compiled.find_cycle(reachable_ids)
+    if cycle:
+        for node_id in cycle[:-1]:
+            validation_map[node_id] = "VALIDATION_FAILED"
+        errors.extend(cycle_errors(cycle))
+    return cycle
+
+def validate_graph(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Tier 2 Graph Compiler:
+    1. Reachability Analysis (BFS from StartNode).
+    2. Validation of REACHABLE nodes only (results cached by node config hash).
+    3. Compile step (engine/compiler.py): cycle detection.
+    4. Output Aggregation (NodeID -> Status).
+    
+    Status: 'READY' | 'VALIDATION_FAILED'
+    """
+    validation_map: Dict[str, str] = {}
+    
+    # --- 1. Identify Start Node ---
+    start_id = find_start_node(nodes)['id']
+    
+    # --- 2. Reachability Analysis (BFS) ---
+    adj_list = build_adjacency((n['id'] for n in nodes), edges)
+    reachable_ids = reachable_from([start_id], adj_list)
                 
-    # --- 3. Selective Validation ---
+    # --- 3. Selective Validation (cached per node config) ---
     node_map = {n['id']: n for n in nodes}
     errors = []
     
     for node_id in reachable_ids:
-        node = node_map[node_id]
-        node_type = node.get('type')
-        
-        try:
-            node_class = NodeRegistry.get_node(node_type)
-            strategy = node_class(node)
-            result = strategy.validate(node)
-            
-            if result['valid']:
-                validation_map[node_id] = "READY"
-            else:
-                validation_map[node_id] = "VALIDATION_FAILED"
-                # Collect errors for the legacy strict check or detailed feedback
-                errors.extend(result['errors'])
-                
-        except ValueError:
-            # Unknown node type - treat as failed or specialized state
-            validation_map[node_id] = "VALIDATION_FAILED"
-            errors.append({"nodeId": node_id, "message": f"Unknown node type: {node_type}", "level": "CRITICAL"})
-        except Exception as e:
-            validation_map[node_id] = "VALIDATION_FAILED"
-            errors.append({"nodeId": node_id, "message": str(e), "level": "CRITICAL"})
+        status, node_errors = validate_node(node_map[node_id])
+        validation_map[node_id] = status
+        # Collect errors for the legacy strict check or detailed feedback
+        errors.extend(node_errors)
+
+    # --- 4. Compile: cycles among reachable nodes never run ---
+    check_cycles(compile_graph(nodes, edges), reachable_ids, validation_map, errors)
 
-    # --- 4. Handle Aggregated Critical Errors (Gatekeeper) ---
+    # --- 5. Handle Aggregated Critical Errors (Gatekeeper) ---
     # If this function is called for strict validation (like /start), 
     # we might want to raise here. But for /validate endpoint, we want to return the map.
     # We will split this usage. 
@@ -105,3 +273,41 @@ def validate_workflow(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]])
         raise HTTPException(status_code=400, detail=critical_errors)
         
     return True
+
+
+async def avalidate_graph(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]):
+    """
+    validate_graph with the plugins' async validators run concurrently.
+    Returns (validation_map, errors, timings_ms, compiled): timings_ms has the
+    duration of every validator that ran (cache hits are left out), compiled is
+    the graph for AsyncGraphExecutor.
+    """
+    start_id = find_start_node(nodes)['id']
+    adj_list = build_adjacency((n['id'] for n in nodes), edges)
+    reachable_ids = reachable_from([start_id], adj_list)
+    node_map = {n['id']: n for n in nodes}
+
+    validation_map: Dict[str, str] = {}
+    errors = []
+    timings: Dict[str, float] = {}
+    for node_id, (status, node_errors, duration_ms) in (await avalidate_nodes(node_map[i] for i in reachable_ids)).items():
+        validation_map[node_id] = status
+        errors.extend(node_errors)
+        if duration_ms is not None:
+            timings[node_id] = duration_ms
+    compiled = compile_graph(nodes, edges)
+    check_cycles(compiled, reachable_ids, validation_map, errors)
+    return validation_map, errors, timings, compiled
+
+async def avalidate_workflow(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> CompiledGraph:
+    """
+    Async validate_workflow: raises HTTPException on any critical error in
+    reachable nodes, else returns the compiled graph to execute.
+    """
+    _, errors, _, compiled = await avalidate_graph(nodes, edges)
+
+    critical_errors = [e for e in errors if e.get('level') == 'CRITICAL']
+    if critical_errors:
+        raise HTTPException(status_code=400, detail=critical_errors)
+
+    return compiled
@@ -11,23 +11,38 @@ sys.path.append(str(Path(__file__).parent.parent))
 # Load root .env
 # load_dotenv(Path(__file__).parent.parent / ".env")
 from contextlib import asynccontextmanager
-from typing import List, Dict
+from typing import List, Dict, Any, Optional
 
 # [REMOVED] Hardcoded CommandNode imports
 # from plugins.CommandNode.backend.schema import GenerateCommandRequest, UIResponse, UIRender, ExecutionMetadata
 
-from app.core.session_manager import PtySession
-
-from engine.validator import validate_workflow
+from app.core.terminal_protocol import parse_binary_input, make_text_decoder, OP_INPUT, OP_RESIZE
+from app.core.terminal_sessions import terminal_sessions, TerminalLimitError
+from app.core.process import wait_for_pending as wait_for_process_teardown
+from app.core.shell_pool import shell_pool
+from app.core.executors import executors
+
+from engine.estimates import duration_history
+from engine.plans import apply_overrides, cached_plan, executable_document, plan_cache, prepare_plan, reuse_plan
+from engine.validator import validation_cache
+from engine.validation_sessions import validation_sessions
+from engine.event_codec import get_event_codec
+from engine.event_buffer import run_events
+from engine.event_bus import event_bus, LOSSY_EVENTS
+from engine.run_streams import run_streams
+from engine.session_shell import session_shells
+from engine.rusage import run_usage
+from engine.log_store import log_store
 from engine.registry import NodeRegistry # [NEW] Import Registry
 from langgraph.checkpoint.mongodb import MongoDBSaver
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument
 import asyncio
 import json
+import time
 import base64
 from config import settings
 
-from routers import bridge
+from routers import bridge, logs, events
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -37,11 +52,14 @@ async def lifespan(app: FastAPI):
         database = db.get_db()
         await database.agent_memories.create_index("last_updated", expireAfterSeconds=86400)
         print("✅ TTL Index verified for agent_memories")
+        # Runtime estimates aggregate a workflow's recent runs
+        await database.runs.create_index("workflow_id")
     except Exception as e:
         print(f"⚠️ Failed to init TTL index: {e}")
         
     from engine.watcher import file_watch_manager
     file_watch_manager.start()
+    shell_pool.start()
     
     yield
     # Shutdown: Cancel all active workflow tasks first so pending futures are cancelled
@@ -50,8 +68,14 @@ async def lifespan(app: FastAPI):
         task.cancel()
     if active_executions:
         await asyncio.gather(*active_executions.values(), return_exceptions=True)
+    await event_bus.stop()
+    terminal_sessions.shutdown()
+    shell_pool.shutdown()
+    session_shells.shutdown()
+    await wait_for_process_teardown()
     
     file_watch_manager.shutdown()
+    executors.shutdown()
     db.close()
 
 app = FastAPI(lifespan=lifespan)
@@ -69,6 +93,8 @@ app.add_middleware(
 )
 
 app.include_router(bridge.router, prefix="/workflow", tags=["Workflow Bridge"])
+app.include_router(logs.router, prefix="/api/v1/workflow", tags=["Run Logs"])
+app.include_router(events.router, prefix="/api/v1/workflow", tags=["Run Events"])
 
 # [NEW] Dynamic Plugin Router Registration
 routers = NodeRegistry.get_routers()
@@ -101,33 +127,159 @@ except ImportError:
     pass  # PyMongo not installed or not using MongoDB
 
 # Connection Manager (Tier 4)
+class WorkflowClient:
+    """
+    One /ws/workflow connection. Frames go through an ordered, bounded outbox
+    drained by a single sender task, so a replayed backlog can never interleave
+    with live events and a stalled client cannot grow server memory.
+    """
+    def __init__(self, websocket: WebSocket, codec, max_frames: int = settings.WS_CLIENT_OUTBOX_MAX):
+        self.websocket = websocket
+        self.codec = codec
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=max_frames)
+        # thread_id -> highest seq already queued (dedupes replay vs live)
+        self.last_seq: Dict[str, int] = {}
+        self.sender_task: Optional[asyncio.Task] = None
+        self.dropped = 0
+
+    def push(self, event: str, data: dict, json_frame: Optional[str] = None) -> bool:
+        """Queues a frame. False when the outbox is full and the frame cannot be dropped (client too slow)."""
+        thread_id = data.get("thread_id")
+        seq = data.get("seq")
+        if thread_id and seq is not None:
+            if seq <= self.last_seq.get(thread_id, 0):
+                return True
+            self.last_seq[thread_id] = seq
+        if self.outbox.full():
+            if event in LOSSY_EVENTS:
+                self.dropped += 1
+                return True
+            return False
+        # Compact codecs intern IDs, so frames must be encoded in delivery order
+        if self.codec.binary:
+            self.outbox.put_nowait(self.codec.encode(event, data))
+        else:
+            self.outbox.put_nowait(json_frame or self.codec.encode(event, data))
+        return True
+
+    async def run_sender(self):
+        try:
+            while True:
+                frame = await self.outbox.get()
+                if self.codec.binary:
+                    await self.websocket.send_bytes(frame)
+                else:
+                    await self.websocket.send_text(frame)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            pass # print(f"Broadcast error: {e}")
+
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.active_connections: Dict[WebSocket, WorkflowClient] = {}
+        # Overflow counters (dropped log frames of closed clients are kept here)
+        self.dropped_frames = 0
+        self.evicted = 0
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, encoding: Optional[str] = None) -> WorkflowClient:
         await websocket.accept()
-        self.active_connections.append(websocket)
+        client = WorkflowClient(websocket, get_event_codec(encoding))
+        self.active_connections[websocket] = client
+        # Only clients that asked for an encoding get the hello frame (legacy clients see no change)
+        if encoding:
+            client.outbox.put_nowait(client.codec.hello())
+        client.sender_task = asyncio.create_task(client.run_sender())
+        return client
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        client = self.active_connections.pop(websocket, None)
+        if client:
+            self.dropped_frames += client.dropped
+            if client.sender_task:
+                client.sender_task.cancel()
+
+    def evict(self, client: WorkflowClient):
+        """Disconnects a client whose outbox is full of control frames; it reconnects and resumes with `since`."""
+        self.evicted += 1
+        print(f"WebSocket client evicted: {client.outbox.qsize()} unsent frames")
+        self.disconnect(client.websocket)
+        asyncio.create_task(self._close(client.websocket))
+
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)  # Try again later
+        except Exception:
+            pass
 
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                pass # print(f"Broadcast error: {e}")
+    def replay(self, client: WorkflowClient, thread_id: str, since: int = 0):
+        """Queues the buffered backlog of a run (seq > since); live events follow in order."""
+        client.last_seq[thread_id] = since
+        for seq, event, data in run_events.replay(thread_id, since):
+            if not client.push(event, data):
+                self.evict(client)
+                return
+
+    async def broadcast(self, event: str, data: dict):
+        # JSON frames are stateless: encode once and share across JSON clients
+        json_frame = None
+        for client in list(self.active_connections.values()):
+            if not client.codec.binary and json_frame is None:
+                json_frame = client.codec.encode(event, data)
+            if not client.push(event, data, json_frame):
+                self.evict(client)
+
+    def stats(self) -> Dict[str, int]:
+        clients = list(self.active_connections.values())
+        return {
+            "clients": len(clients),
+            "queued_frames": sum(c.outbox.qsize() for c in clients),
+            "dropped_frames": self.dropped_frames + sum(c.dropped for c in clients),
+            "evicted": self.evicted,
+        }
 
 manager = ConnectionManager()
 
+# Event bus consumers: delivery and persistence drain their own queues,
+# so emitting from the engine never waits on websockets or disk.
+async def deliver_to_websockets(thread_id: str, event: str, data: dict):
+    await manager.broadcast(event, data)
+
+async def persist_node_logs(thread_id: str, event: str, data: dict):
+    if event == "node_log":
+        await log_store.append(thread_id, data.get("nodeId", "system"), str(data.get("log", "")))
+    elif event == "run_finished":
+        await log_store.close_run(thread_id)
+
+event_bus.subscribe("websocket", deliver_to_websockets)
+event_bus.subscribe("log_store", persist_node_logs, lossy=False)
+event_bus.subscribe("streams", run_streams.dispatch)
+
 @app.websocket("/ws/workflow")
-async def workflow_websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def workflow_websocket_endpoint(websocket: WebSocket, encoding: Optional[str] = None, thread_id: Optional[str] = None, since: int = 0):
+    # ?encoding=msgpack|cbor negotiates compact binary frames; default stays JSON text
+    # ?thread_id=...&since=N replays that run's buffered events before live ones
+    client = await manager.connect(websocket, encoding)
     try:
+        if thread_id:
+            manager.replay(client, thread_id, since)
         while True:
-            await websocket.receive_text() # Keep alive
+            message_text = await websocket.receive_text() # Keep alive / subscribe
+            try:
+                message = json.loads(message_text)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(message, dict) and message.get("type") == "subscribe" and message.get("thread_id"):
+                try:
+                    subscribe_since = int(message.get("since") or 0)
+                except (TypeError, ValueError):
+                    client.push("error", {"message": f"Invalid 'since': {message.get('since')!r}", "thread_id": message["thread_id"]})
+                    continue
+                manager.replay(client, message["thread_id"], subscribe_since)
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
 
 @app.websocket("/ws")
@@ -141,30 +293,57 @@ async def websocket_endpoint(websocket: WebSocket):
         pass
 
 @app.websocket("/ws/terminal")
-async def websocket_terminal_endpoint(websocket: WebSocket, sudo: bool = False):
+async def websocket_terminal_endpoint(websocket: WebSocket, sudo: bool = False, binary: bool = True,
+                                      session_id: Optional[str] = None, offset: Optional[int] = None):
     await websocket.accept()
     # print("WebSocket Terminal Connected")
     
-    # Create PTY Session (defaults to bash)
-    # If sudo is requested, run 'sudo -i' to drop into root shell (interactive password prompt)
-    cmd = "sudo -i" if sudo else "bash"
-    
-    session = PtySession(command=cmd)
-    session.start()
-    
-    loop = asyncio.get_event_loop()
+    # Reattach to a live session (no respawn, missed output comes from scrollback) or start a new one.
+    # If sudo is requested, the shell is 'sudo -i' (interactive password prompt)
+    owner = websocket.client.host if websocket.client else ""
+    try:
+        session, resumed = terminal_sessions.open(session_id, sudo, owner=owner)
+    except TerminalLimitError as e:
+        if binary:
+            await websocket.send_text(json.dumps({"type": "error", "message": str(e)}))
+        # 1013: try again later
+        await websocket.close(code=1013, reason=str(e))
+        return
+    viewer, replay_offset = session.add_viewer(since=offset)
+    if binary:
+        # Control frames are JSON text; PTY output is always binary
+        await websocket.send_text(json.dumps({
+            "type": "session", "session_id": session.id, "resumed": resumed, "offset": replay_offset,
+        }))
     
     async def pty_reader():
-        """Reads output from PTY and sends to WebSocket"""
+        """Forwards PTY output to the WebSocket"""
+        # Binary frames by default; text clients get an incremental decoder (split UTF-8 sequences stay intact)
+        decoder = None if binary else make_text_decoder()
         try:
-            while session.master_fd:
-                # Use run_in_executor to avoid blocking the event loop
-                data = await loop.run_in_executor(None, session.read, 1024)
-                if not data:
+            while True:
+                data = await viewer.batcher.next()
+                if isinstance(data, dict):
+                    # Command lifecycle control frame (text); text-mode clients only get raw output
+                    if binary:
+                        await websocket.send_text(json.dumps(data))
+                    continue
+                if data is None:
+                    if decoder:
+                        tail = decoder.decode(b"", final=True)
+                        if tail:
+                            await websocket.send_text(tail)
+                    # Shell exited: close so the client sees the session end
+                    await websocket.close()
                     break
-                # Send binary or text. xterm.js likes text/binary. 
-                # We'll send text.
-                await websocket.send_text(data.decode(errors="ignore"))
+                if decoder:
+                    text = decoder.decode(data)
+                    if text:
+                        await websocket.send_text(text)
+                else:
+                    await websocket.send_bytes(data)
+                # Flow control: the PTY is only read again once slow clients catch up
+                viewer.sent(len(data))
         except Exception as e:
             # print(f"PTY Reader Error: {e}")
             pass
@@ -175,8 +354,22 @@ async def websocket_terminal_endpoint(websocket: WebSocket, sudo: bool = False):
     try:
         while True:
             # Wait for message from frontend (Input or Resize)
-            message_text = await websocket.receive_text()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
             
+            frame = message.get("bytes")
+            if frame is not None:
+                # Binary opcode frames: no JSON parsing on the keystroke path
+                opcode, payload = parse_binary_input(frame)
+                if opcode == OP_INPUT:
+                    session.write(payload)
+                elif opcode == OP_RESIZE:
+                    cols, rows = payload
+                    session.resize(rows, cols)
+                continue
+            
+            message_text = message.get("text") or ""
             try:
                 # Attempt to parse as JSON (for Protocol Messages like RESIZE)
                 message = json.loads(message_text)
@@ -190,6 +383,9 @@ async def websocket_terminal_endpoint(websocket: WebSocket, sudo: bool = False):
                     # Structured input
                     data = message.get("data", "")
                     session.write(data.encode())
+                elif isinstance(message, dict) and message.get("type") == "close":
+                    # Explicit close: end the shell now instead of waiting for the detach grace period
+                    session.close()
                 else:
                     # Fallback or unknown JSON
                     pass
@@ -202,10 +398,10 @@ async def websocket_terminal_endpoint(websocket: WebSocket, sudo: bool = False):
     except Exception as e:
         print(f"WebSocket Error: {e}")
     finally:
-        # Cleanup
+        # Detach only: the session keeps running for other viewers or a reconnect
         if reader_task:
             reader_task.cancel()
-        session.terminate()
+        session.remove_viewer(viewer)
 
 @app.get("/")
 async def read_root():
@@ -214,17 +410,23 @@ async def read_root():
 @app.post("/workflows")
 async def receive_workflow(workflow: Workflow):
     database = db.get_db()
+    # The version is bumped on every save; execute-by-reference names the version it expects
+    workflow_dict = workflow.dict(exclude={"version"})
+    # Executable projection (no layout/UI fields) + plan hash, for /execute by {workflow_id, version}
+    workflow_dict["executable"] = executable_document(workflow_dict["data"]["nodes"], workflow_dict["data"]["edges"])
     # Use upsert to update if exists, otherwise insert
     if workflow.id:
-        result = await database.workflows.update_one(
+        saved = await database.workflows.find_one_and_update(
             {"id": workflow.id},
-            {"$set": workflow.dict()},
-            upsert=True
+            {"$set": workflow_dict, "$inc": {"version": 1}},
+            projection={"version": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
         )
-        return {"status": "success", "received": workflow.name, "id": workflow.id}
+        return {"status": "success", "received": workflow.name, "id": workflow.id, "version": saved["version"]}
     else:
         # Save first, then update with the stringified ID
-        workflow_dict = workflow.dict()
+        workflow_dict["version"] = 1
         result = await database.workflows.insert_one(workflow_dict)
         new_id = str(result.inserted_id)
         
@@ -233,7 +435,7 @@ async def receive_workflow(workflow: Workflow):
             {"$set": {"id": new_id}}
         )
         
-        return {"status": "success", "received": workflow.name, "id": new_id}
+        return {"status": "success", "received": workflow.name, "id": new_id, "version": 1}
 
 @app.get("/workflows", response_model=List[WorkflowSummary])
 async def get_workflows():
@@ -277,6 +479,26 @@ async def delete_workflow(workflow_id: str):
         
     return {"status": "success", "message": "Workflow deleted"}
 
+@app.get("/api/v1/metrics")
+async def get_metrics():
+    """Runtime health of the event pipeline (queue depths, drops, buffered runs, websocket outboxes), the shell pools, cancel latency, executor saturation and validation/plan cache hits."""
+    return {
+        "event_bus": event_bus.metrics(),
+        "websockets": manager.stats(),
+        "event_buffers": run_events.stats(),
+        "event_streams": run_streams.stats(),
+        "shell_pool": shell_pool.stats(),
+        "session_shells": session_shells.stats(),
+        "cancellations": cancel_stats,
+        "executors": executors.stats(),
+        "validation": {"cache": validation_cache.stats(), "sessions": validation_sessions.stats(), "plans": plan_cache.stats(), "history": duration_history.stats()},
+    }
+
+@app.get("/api/v1/terminals")
+async def list_terminals():
+    """Live terminal sessions: viewers, scrollback, unsent bytes, command timings, open fds and RSS."""
+    return {"limits": terminal_sessions.stats(), "sessions": terminal_sessions.list()}
+
 @app.get("/system-info")
 async def get_system_info():
     from app.core.system import get_system_fingerprint
@@ -289,23 +511,90 @@ async def get_system_info():
 # Global registry for active execution tasks
 # Maps thread_id -> asyncio.Task
 active_executions: Dict[str, asyncio.Task] = {}
+# Cancel endpoint: time from task.cancel() until the run finished unwinding
+cancel_stats: Dict[str, Any] = {"requests": 0, "stopped": 0, "timed_out": 0, "last_latency_ms": None, "max_latency_ms": 0.0}
+
+async def track_run_events(thread_id: str, emit, execution):
+    """
+    Awaits a run, then closes its event stream with `run_finished`
+    (compacts the replay buffer and flushes the run's durable logs).
+    Also sent when the run raises (FAILED) or is cancelled (CANCELLED).
+    """
+    finished = {"status": "FAILED"}
+    try:
+        result = await execution
+        finished["status"] = result.get("status")
+        return result
+    except asyncio.CancelledError:
+        finished["status"] = "CANCELLED"
+        raise
+    except Exception as e:
+        finished["error"] = str(e)
+        raise
+    finally:
+        await emit("run_finished", finished)
+
+async def load_executable(database, workflow_id: str):
+    """
+    Executable projection (nodes, edges) of a stored workflow. Workflows saved
+    before it was stored fall back to the full canvas graph under `data`.
+    """
+    document = await database.workflows.find_one({"id": workflow_id}, {"executable": 1, "data.nodes": 1, "data.edges": 1})
+    if not document:
+        raise HTTPException(status_code=404, detail="Workflow definition not found")
+    graph = document.get("executable") or document.get("data") or document
+    return graph.get("nodes", []), graph.get("edges", [])
+
+async def load_stored_plan(workflow_id: str, version: Optional[int] = None, overrides: Optional[dict] = None):
+    """
+    Execute by reference: the validated plan of a saved workflow. Answers 409
+    when `version` is not the stored one (the client has unsaved or stale data).
+    Without overrides a cached plan is found by the stored hash, so the graph
+    itself is only read from the database on a plan cache miss.
+    """
+    database = db.get_db()
+    meta = await database.workflows.find_one({"id": workflow_id}, {"version": 1, "executable.hash": 1})
+    if not meta:
+        raise HTTPException(status_code=404, detail="Workflow definition not found")
+    stored_version = meta.get("version", 0)
+    if version is not None and version != stored_version:
+        raise HTTPException(status_code=409, detail=f"Workflow {workflow_id} is at version {stored_version}, not {version}; send the graph or reload it")
+
+    plan_hash = (meta.get("executable") or {}).get("hash")
+    plan = await reuse_plan(plan_hash) if plan_hash and not overrides else None
+    if plan is None:
+        nodes, edges = await load_executable(database, workflow_id)
+        if overrides:
+            nodes = apply_overrides(nodes, overrides)
+        plan = await prepare_plan(nodes, edges)
+    return plan
 
 @app.post("/api/v1/workflow/execute")
 async def execute_workflow(workflow_data: dict, background_tasks: BackgroundTasks = None):
     """
     Compiles and starts a workflow execution.
+    The body is either the full graph ({id, nodes, edges}) or a reference to a
+    saved workflow ({workflow_id, version?, overrides?}), overrides being
+    {node_id: {field: value}} merged into node data for this run only.
     Returns the thread_id for tracking.
     """
+    workflow_id = workflow_data.get('workflow_id')
+    by_reference = workflow_id is not None and 'nodes' not in workflow_data
+
     # Debug: Print Workflow Structure
     print("\n" + "="*50)
-    print(f"🚀 Executing Workflow: {workflow_data.get('id', 'Unknown ID')}")
+    print(f"🚀 Executing Workflow: {workflow_id if by_reference else workflow_data.get('id', 'Unknown ID')}" + (" (by reference)" if by_reference else ""))
     print("="*50)
     
-    nodes_dict = workflow_data.get('nodes', [])
-    edges_list = workflow_data.get('edges', [])
-    
     # Tier 3 Validation: Prevent execution of invalid graphs
-    validate_workflow(nodes_dict, edges_list)
+    # A graph validated before (same executable projection) reuses its plan and skips validation;
+    # the compiled graph (adjacency, fan-in, levels) serves the executor and its restarts
+    if by_reference:
+        plan = await load_stored_plan(workflow_id, workflow_data.get('version'), workflow_data.get('overrides'))
+    else:
+        plan = await prepare_plan(workflow_data.get('nodes', []), workflow_data.get('edges', []))
+    compiled = plan.compiled
+    run_graph = {"id": workflow_id, "nodes": compiled.nodes, "edges": compiled.edges} if by_reference else workflow_data
 
     # --- ASYNC EXECUTOR REPLACEMENT ---
     from engine.async_runner import AsyncGraphExecutor
@@ -320,23 +609,15 @@ async def execute_workflow(workflow_data: dict, background_tasks: BackgroundTask
         "run_id": run_id
     }
     
-    # Tier 4: Inject WebSocket Emitter
-    async def emit_to_frontend(event: str, data: dict):
-        import json
-        # Wrap in expected format
-        try:
-            # Inject thread_id so frontend knows which run this belongs to immediately
-            data_with_context = {**data, "thread_id": thread_id}
-            payload = json.dumps({"type": event, "data": data_with_context})
-            await manager.broadcast(payload)
-        except Exception as e:
-            print(f"Emit error: {e}")
+    # Tier 4: Inject event emitter (non-blocking publish onto the event bus)
+    emit_to_frontend = event_bus.emitter(thread_id)
 
     executor = AsyncGraphExecutor(
-        workflow_data, 
+        run_graph,
         emit_event=emit_to_frontend,
         thread_id=thread_id,
-        global_context=global_context
+        global_context=global_context,
+        compiled=compiled
     )
 
     # Wrapper to run execution and handle registration
@@ -368,20 +649,24 @@ async def execute_workflow(workflow_data: dict, background_tasks: BackgroundTask
                     # Notify Frontend of Restart
                     await emit_to_frontend("node_status", {"nodeId": "system", "status": "restarting"})
                     
+                    # A restart starts from a clean shell too
+                    session_shells.close(thread_id)
+
                     # Reset Executor State (Manually re-init executor methods or just re-run execute?)
                     # The AsyncGraphExecutor is stateful (self.results, self.node_status). 
                     # We MUST re-instantiate it for a clean restart.
                     executor.__init__(
-                        workflow_data, 
+                        run_graph,
                         emit_event=emit_to_frontend,
                         thread_id=thread_id,
-                        global_context=global_context
+                        global_context=global_context,
+                        compiled=compiled
                     )
                     continue # Loop again
 
                 # Normal Completion or Failure
                 # Emit final status to ALL start nodes so StartNode UI shows workflow outcome
-                for sn in workflow_data.get('nodes', []):
+                for sn in run_graph.get('nodes', []):
                     if sn.get('type') == 'startNode':
                         final_ui_status = 'completed' if status == 'COMPLETED' else 'failed'
                         await emit_to_frontend('node_status', {'nodeId': sn['id'], 'status': final_ui_status})
@@ -390,7 +675,8 @@ async def execute_workflow(workflow_data: dict, background_tasks: BackgroundTask
                     "thread_id": thread_id, 
                     "status": status,
                     "logs": result_stats.get("errors", []),
-                    "results": result_stats.get("results", {})
+                    "results": result_stats.get("results", {}),
+                    "resource_usage": run_usage.get(thread_id),
                 }
 
         except asyncio.CancelledError:
@@ -407,9 +693,13 @@ async def execute_workflow(workflow_data: dict, background_tasks: BackgroundTask
             # Cleanup registry (memory cleanup handled by MongoDB TTL index)
             if thread_id in active_executions:
                 del active_executions[thread_id]
+            session_shells.close(thread_id)
+            run_usage.pop(thread_id)
 
     # Register Task
-    task = asyncio.create_task(run_execution())
+    # Known to /events before its first event (track_run_events always finishes it)
+    run_events.open(thread_id)
+    task = asyncio.create_task(track_run_events(thread_id, emit_to_frontend, run_execution()))
     active_executions[thread_id] = task
     
     # Wait for completion (or return early if we wanted async fire-and-forget, but user usually awaits result)
@@ -420,8 +710,24 @@ async def execute_workflow(workflow_data: dict, background_tasks: BackgroundTask
 async def cancel_workflow(thread_id: str):
     if thread_id in active_executions:
         task = active_executions[thread_id]
+        started = time.monotonic()
         task.cancel()
-        return {"status": "success", "message": "Cancellation signal sent"}
+        # Wait (capped) until the run has unwound: node processes killed, PTYs closed
+        done, _ = await asyncio.wait({task}, timeout=settings.CANCEL_TIMEOUT_S)
+        latency_ms = round((time.monotonic() - started) * 1000, 1)
+        stopped = bool(done)
+        cancel_stats["requests"] += 1
+        cancel_stats["stopped" if stopped else "timed_out"] += 1
+        cancel_stats["last_latency_ms"] = latency_ms
+        cancel_stats["max_latency_ms"] = max(cancel_stats["max_latency_ms"], latency_ms)
+        if not stopped:
+            print(f"Cancel {thread_id}: still unwinding after {settings.CANCEL_TIMEOUT_S}s")
+        return {
+            "status": "success",
+            "message": "Execution cancelled" if stopped else "Cancellation signal sent",
+            "stopped": stopped,
+            "latency_ms": latency_ms,
+        }
     else:
         # It might have already finished
         return {"status": "ignored", "message": "Execution not found or already completed"}
@@ -444,10 +750,9 @@ async def resume_workflow(thread_id: str, payload: dict):
     
     database = db.get_db()
     
-    # 2. FETCH WORKFLOW DEFINITION
-    workflow_data = await database.workflows.find_one({"id": workflow_id})
-    if not workflow_data:
-        raise HTTPException(status_code=404, detail="Workflow definition not found")
+    # 2. FETCH WORKFLOW DEFINITION (executable projection; saved graphs keep nodes/edges under `data`)
+    nodes, edges = await load_executable(database, workflow_id)
+    workflow_data = {"id": workflow_id, "nodes": nodes, "edges": edges}
         
     # 3. FETCH RUN STATE (For Crash Recovery)
     # We look for the document in 'runs' collection with this thread_id
@@ -469,25 +774,22 @@ async def resume_workflow(thread_id: str, payload: dict):
     from engine.async_runner import AsyncGraphExecutor
     
     # Re-inject Emitter
-    async def emit_to_frontend(event: str, data: dict):
-        import json
-        try:
-            data_with_context = {**data, "thread_id": thread_id}
-            payload = json.dumps({"type": event, "data": data_with_context})
-            await manager.broadcast(payload)
-        except Exception as e:
-            print(f"Emit error: {e}")
+    emit_to_frontend = event_bus.emitter(thread_id)
 
     global_context = {
         "sudo_password": sudo_password
     }
     
+    # Reuse the stored workflow's plan when it is cached (else the executor compiles it)
+    plan = cached_plan(nodes, edges)
+
     executor = AsyncGraphExecutor(
         workflow_data, 
         emit_event=emit_to_frontend,
         thread_id=thread_id,
         global_context=global_context,
-        initial_state=initial_results
+        initial_state=initial_results,
+        compiled=plan.compiled if plan else None
     )
     
     # We use the same run_execution logic, but we don't start it as a background task because
@@ -505,7 +807,8 @@ async def resume_workflow(thread_id: str, payload: dict):
                 "thread_id": thread_id, 
                 "status": result_stats.get("status", "COMPLETED"),
                 "logs": result_stats.get("errors", []),
-                "results": result_stats.get("results", {})
+                "results": result_stats.get("results", {}),
+                "resource_usage": run_usage.get(thread_id),
             }
         except asyncio.CancelledError:
              await emit_to_frontend("node_status", {"nodeId": "system", "status": "cancelled"}) 
@@ -516,8 +819,12 @@ async def resume_workflow(thread_id: str, payload: dict):
         finally:
             if thread_id in active_executions:
                 del active_executions[thread_id]
+            session_shells.close(thread_id)
+            run_usage.pop(thread_id)
 
-    task = asyncio.create_task(run_execution())
+    # Known to /events before its first event (track_run_events always finishes it)
+    run_events.open(thread_id)
+    task = asyncio.create_task(track_run_events(thread_id, emit_to_frontend, run_execution()))
     active_executions[thread_id] = task
     
     return await task
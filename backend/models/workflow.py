@@ -48,3 +48,5 @@ class Workflow(BaseModel):
     name: str
     data: WorkflowData
     id: Optional[str] = None
+    # Bumped by the server on every save (read-only for clients)
+    version: Optional[int] = None
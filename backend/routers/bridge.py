@@ -1,30 +1,60 @@
 from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 
-from engine.validator import validate_graph
+from engine.validation_sessions import validation_sessions
 
 router = APIRouter()
 
 class ValidateRequest(BaseModel):
     nodes: List[Dict[str, Any]]
     edges: List[Dict[str, Any]]
+    # Reuse the client's validation session (diffs apply to it); a new one is opened when missing
+    session_id: Optional[str] = None
+    # Saved workflow whose run history feeds the runtime estimate
+    workflow_id: Optional[str] = None
+
+class ValidateDiffRequest(BaseModel):
+    session_id: str
+    base_version: int
+    upserted_nodes: List[Dict[str, Any]] = []
+    removed_nodes: List[str] = []
+    added_edges: List[Dict[str, Any]] = []
+    removed_edges: List[str] = []  # edge ids
 
 @router.post("/validate")
 async def validate_workflow_endpoint(request: ValidateRequest):
     """
     Tier 2: Graph Compiler Pre-Flight Check.
-    Returns the validation status map for the graph.
+    Returns the validation status map for the graph, per-node validator timings,
+    the session id/version that `/validate/diff` requests build on and the
+    `plan_hash` of the execution plan kept for `/execute` (None if it cannot run)
+    and a runtime `estimate` (predicted run time, critical path, peak parallelism).
+    """
+    try:
+        return await validation_sessions.validate(request.nodes, request.edges, request.session_id, request.workflow_id)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/validate/diff")
+async def validate_diff_endpoint(request: ValidateDiffRequest):
+    """
+    Incremental pre-flight: only the changed nodes/edges since `base_version`.
+    Returns statuses of the revalidated nodes and the ids that dropped out of the
+    reachable set (plus a fresh `estimate` when nodes or edges were added or removed).
+    409 means the session is gone or out of date: resend the full graph.
     """
     try:
-        # validate_graph returns (validation_map, errors_list)
-        validation_map, errors = validate_graph(request.nodes, request.edges)
-        
-        return {
-            "status": "success",
-            "validation_map": validation_map,
-            "errors": errors
-        }
+        return await validation_sessions.apply_diff(
+            request.session_id,
+            request.base_version,
+            request.upserted_nodes,
+            request.removed_nodes,
+            request.added_edges,
+            request.removed_edges,
+        )
     except HTTPException as e:
         raise e
     except Exception as e:
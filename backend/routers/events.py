@@ -0,0 +1,60 @@
+import json
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request, Header
+from fastapi.responses import Response, StreamingResponse
+
+from engine.event_buffer import run_events
+from engine.run_streams import run_streams
+
+router = APIRouter()
+
+# Seconds without events before a keep-alive comment is sent
+KEEPALIVE_SECONDS = 15
+
+@router.get("/{thread_id}/events")
+async def stream_run_events(
+    thread_id: str,
+    request: Request,
+    types: Optional[str] = None,
+    since: int = 0,
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Server-Sent Events stream of a run, fed by the same event bus as /ws/workflow.
+    - Event IDs are the run `seq`; reconnecting with `Last-Event-ID` resumes after it.
+    - `?types=node_status,node_log` filters server-side (`run_finished` always ends the stream).
+    - A finished run with nothing after `since` answers 204, which stops EventSource reconnects.
+    """
+    buffer = run_events.get(thread_id)
+    if buffer is None:
+        raise HTTPException(status_code=404, detail="Run not found or expired")
+
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    if buffer.finished and since >= buffer.last_seq:
+        return Response(status_code=204)
+    type_filter = [t.strip() for t in types.split(",") if t.strip()] if types else None
+    stream = run_streams.open(thread_id, since, type_filter)
+
+    async def event_source():
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                if await request.is_disconnected():
+                    break
+                item = await stream.next(timeout=KEEPALIVE_SECONDS)
+                if item is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                seq, event, data = item
+                yield f"id: {seq}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+                if event == "run_finished":
+                    break
+        finally:
+            run_streams.close(stream)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
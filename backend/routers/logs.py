@@ -0,0 +1,36 @@
+import re
+from fastapi import APIRouter, HTTPException
+
+from engine.log_store import log_store
+
+router = APIRouter()
+
+@router.get("/{thread_id}/logs")
+async def list_run_logs(thread_id: str):
+    """Lists the nodes of a run that produced logs, with their total size in bytes."""
+    return {"thread_id": thread_id, "nodes": log_store.list_nodes(thread_id)}
+
+@router.get("/{thread_id}/logs/{node_id}")
+async def read_node_log(thread_id: str, node_id: str, offset: int = 0, length: int = 65536):
+    """Returns the byte range [offset, offset + length) of a node's log."""
+    try:
+        return await log_store.read(thread_id, node_id, offset, length)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="No logs for this node")
+
+@router.get("/{thread_id}/logs/{node_id}/tail")
+async def tail_node_log(thread_id: str, node_id: str, bytes: int = 65536):
+    try:
+        return await log_store.tail(thread_id, node_id, bytes)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="No logs for this node")
+
+@router.get("/{thread_id}/logs/{node_id}/grep")
+async def grep_node_log(thread_id: str, node_id: str, pattern: str, limit: int = 100, offset: int = 0, ignore_case: bool = False):
+    """Scans the log chunk by chunk and returns matching lines with their byte offsets."""
+    try:
+        return await log_store.grep(thread_id, node_id, pattern, limit, offset, ignore_case)
+    except re.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid pattern: {e}")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="No logs for this node")
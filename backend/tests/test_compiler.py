@@ -0,0 +1,67 @@
+import asyncio
+import os
+import sys
+
+# Add backend dir to path to find app/engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.compiler import compile_graph
+from engine.validation_sessions import ValidationSessionRegistry
+from engine.validator import validate_graph
+
+
+def node(node_id, node_type="commandNode"):
+    return {"id": node_id, "type": node_type, "data": {"command": "true"}}
+
+
+def edge(src, trg, **extra):
+    return {"id": f"{src}-{trg}", "source": src, "target": trg, **extra}
+
+
+def test_levels_fan_in_and_critical_path():
+    #   start -> a -> c -> d
+    #   start -> b ---^
+    nodes = [node("start", "startNode"), node("a"), node("b"), node("c"), node("d"), node("vault", "vaultNode")]
+    edges = [edge("start", "a"), edge("start", "b"), edge("a", "c"), edge("b", "c"), edge("c", "d"),
+             # parallel edge (other handle) counts once for the AND-join; config edges are dropped
+             edge("b", "c", id="b-c-2", sourceHandle="fallback"), edge("vault", "a", sourceHandle="api-handle")]
+    graph = compile_graph(nodes, edges)
+    assert graph.entry_ids == ["start"]
+    assert graph.levels == {"start": 0, "a": 1, "b": 1, "c": 2, "d": 3}
+    assert graph.fan_in["c"] == 2 and "vault" not in graph.node_map
+    assert graph.behaviors[("b", "c")] == "conditional"
+    assert graph.critical_path() == (4, ["start", "a", "c", "d"])
+    assert graph.critical_path({"start": 0, "a": 1, "b": 5, "c": 1, "d": 1}) == (7, ["start", "b", "c", "d"])
+    summary = graph.summary()
+    assert (summary["depth"], summary["max_level_width"], summary["max_fan_in"]) == (4, 2, 2)
+    assert graph.find_cycle() is None
+
+
+def test_reachable_cycle_is_reported_with_its_path():
+    nodes = [node("start", "startNode"), node("a"), node("b"), node("c"), node("x"), node("y")]
+    edges = [edge("start", "a"), edge("a", "b"), edge("b", "c"), edge("c", "a"),
+             # unreachable cycle: never runs, not an error
+             edge("x", "y"), edge("y", "x")]
+    validation_map, errors = validate_graph(nodes, edges)
+    assert validation_map["start"] == "READY"
+    assert {validation_map[n] for n in "abc"} == {"VALIDATION_FAILED"}
+    cycle = errors[0]["path"]
+    assert cycle[0] == cycle[-1] and sorted(cycle[:-1]) == ["a", "b", "c"]
+    assert {e["nodeId"] for e in errors} == {"a", "b", "c"} and "x" not in validation_map
+
+
+def test_sessions_track_cycles_incrementally():
+    async def run():
+        sessions = ValidationSessionRegistry(max_sessions=2)
+        full = await sessions.validate([node("start", "startNode"), node("a"), node("b")],
+                                       [edge("start", "a"), edge("a", "b")])
+        assert full["graph"]["critical_path"] == ["start", "a", "b"]
+
+        diff = await sessions.apply_diff(full["session_id"], full["version"], [], [], [edge("b", "a")], [])
+        assert diff["validation_map"] == {"a": "VALIDATION_FAILED", "b": "VALIDATION_FAILED"}
+        assert diff["errors"][0]["path"] in (["b", "a", "b"], ["a", "b", "a"])
+
+        diff = await sessions.apply_diff(full["session_id"], diff["version"], [], [], [], ["b-a"])
+        assert diff["validation_map"] == {"a": "READY", "b": "READY"} and diff["errors"] == []
+
+    asyncio.run(run())
@@ -0,0 +1,109 @@
+import asyncio
+import os
+import sys
+import time
+
+# Add backend dir to path to find app/engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from engine.compiler import compile_graph
+from engine.estimates import duration_history, estimate_runtime, schedule
+
+
+def node(node_id, node_type="commandNode"):
+    return {"id": node_id, "type": node_type, "data": {"command": "true"}}
+
+
+def edge(src, trg, **data):
+    return {"id": f"{src}-{trg}", "source": src, "target": trg, "data": data}
+
+
+def with_history(workflow_id, by_node, by_type=None):
+    duration_history.entries[workflow_id] = (time.monotonic(), {"by_node": by_node, "by_type": by_type or {}})
+    duration_history.entries[None] = (time.monotonic(), {"by_type": {}})
+
+
+def test_estimate_follows_the_engine_schedule():
+    #   start -> a (60s) -> join
+    #   start -> b (10s) -> c (20s) -> join;  b -failure-> cleanup (never on the happy path)
+    nodes = [node("start", "startNode"), node("a"), node("b"), node("c"), node("join"), node("cleanup")]
+    edges = [edge("start", "a"), edge("start", "b"), edge("b", "c"), edge("a", "join"), edge("c", "join"),
+             edge("b", "cleanup", behavior="failure")]
+    with_history("wf", {"a": 60000, "b": 10000, "c": 20000, "join": 1000, "cleanup": 99999})
+    estimate = asyncio.run(estimate_runtime(compile_graph(nodes, edges), "wf"))
+    assert estimate["predicted_runtime_ms"] == 61000
+    assert estimate["critical_path"] == ["start", "a", "join"]
+    assert estimate["peak_parallelism"] == 2
+    assert estimate["unknown"] == ["start"] and "cleanup" not in estimate["node_estimates_ms"]
+
+    # Slowing c down moves the critical path
+    with_history("wf", {"a": 60000, "b": 10000, "c": 600000, "join": 1000})
+    estimate = asyncio.run(estimate_runtime(compile_graph(nodes, edges), "wf"))
+    assert estimate["predicted_runtime_ms"] == 611000
+    assert estimate["critical_path"] == ["start", "b", "c", "join"]
+
+
+def test_type_averages_fill_in_and_any_joins_start_on_the_first_parent():
+    nodes = [node("start", "startNode"), node("fast", "llmNode"), node("slow"), node("merge", "mergeAny")]
+    edges = [edge("start", "fast"), edge("start", "slow"), edge("fast", "merge"), edge("slow", "merge")]
+    compiled = compile_graph(nodes, edges)
+    compiled.wait_strategies["merge"] = "ANY"
+    plan = schedule(compiled, {"fast": 5.0, "slow": 50.0, "merge": 1.0})
+    assert plan["merge"][:3] == (5.0, 6.0, True) and plan["merge"][3] == "fast"
+
+    with_history("other", {}, {"commandNode": 2000})
+    duration_history.entries[None] = (time.monotonic(), {"by_type": {"llmNode": 3000}})
+    estimate = asyncio.run(estimate_runtime(compiled, "other"))
+    assert estimate["node_estimates_ms"]["slow"] == 2000 and estimate["node_estimates_ms"]["fast"] == 3000
+    # With these averages "slow" (2s) releases the merge first; the run ends with "fast" (3s)
+    assert estimate["predicted_runtime_ms"] == 3000 and estimate["critical_path"] == ["start", "fast"]
+    assert estimate["unknown"] == ["start", "merge"]
+    duration_history.clear()
+
+
+def test_sessions_refresh_the_estimate_on_structural_diffs():
+    from engine.validation_sessions import ValidationSessionRegistry
+
+    async def run():
+        with_history("wf", {"a": 1000, "b": 4000})
+        sessions = ValidationSessionRegistry(max_sessions=2)
+        full = await sessions.validate([node("start", "startNode"), node("a"), node("b")], [edge("start", "a")], workflow_id="wf")
+        assert full["estimate"]["predicted_runtime_ms"] == 1000
+        diff = await sessions.apply_diff(full["session_id"], full["version"], [], [], [edge("a", "b")], [])
+        assert diff["estimate"]["predicted_runtime_ms"] == 5000
+        # Editing a node's config keeps the graph's shape: no new estimate
+        diff = await sessions.apply_diff(full["session_id"], diff["version"], [node("b")], [], [], [])
+        assert "estimate" not in diff
+
+    asyncio.run(run())
+    duration_history.clear()
+
+
+def test_slow_or_missing_history_gives_no_estimate_without_blocking(monkeypatch):
+    compiled = compile_graph([node("start", "startNode"), node("a")], [edge("start", "a")])
+    monkeypatch.setattr(settings, "ESTIMATE_TIMEOUT_S", 0.05)
+
+    async def slow_load(workflow_id):
+        await asyncio.sleep(0.3)
+        return {"by_node": {"a": 1500}, "by_type": {}} if workflow_id else {"by_type": {}}
+
+    async def run():
+        started = time.monotonic()
+        assert await estimate_runtime(compiled, "slow") is None
+        assert time.monotonic() - started < 0.25
+        # The load went on in the background: the next validate has its estimate
+        await asyncio.gather(*duration_history.loading.values())
+        return await estimate_runtime(compiled, "slow")
+
+    duration_history.clear()
+    monkeypatch.setattr(duration_history, "_load", slow_load)
+    assert asyncio.run(run())["predicted_runtime_ms"] == 1500
+
+    async def failing_load(workflow_id):
+        raise ConnectionError("no database")
+
+    duration_history.clear()
+    monkeypatch.setattr(duration_history, "_load", failing_load)
+    assert asyncio.run(estimate_runtime(compiled, "down")) is None
+    duration_history.clear()
@@ -0,0 +1,63 @@
+import os
+import sys
+
+# Add backend dir to path to find engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.event_buffer import RunEventBufferRegistry
+
+
+def _status(node_id, status):
+    return {"nodeId": node_id, "status": status, "thread_id": "t1"}
+
+
+def test_replay_since_returns_only_newer_events():
+    registry = RunEventBufferRegistry(capacity=10, max_finished=4)
+    registry.append("t1", "node_status", _status("a", "running"))
+    registry.append("t1", "node_log", {"nodeId": "a", "log": "hi", "thread_id": "t1"})
+    registry.append("t1", "node_status", _status("a", "completed"))
+
+    replay = registry.replay("t1", since=1)
+    assert [seq for seq, _, _ in replay] == [2, 3]
+    assert registry.replay("t1", since=3) == []
+    assert registry.replay("unknown", since=0) == []
+
+
+def test_evicted_events_are_summarised_by_status_snapshot():
+    registry = RunEventBufferRegistry(capacity=2, max_finished=4)
+    registry.append("t1", "node_status", _status("a", "completed"))  # seq 1
+    registry.append("t1", "node_status", _status("b", "running"))    # seq 2
+    registry.append("t1", "node_log", {"nodeId": "b", "log": "x", "thread_id": "t1"})  # seq 3
+    registry.append("t1", "node_log", {"nodeId": "b", "log": "y", "thread_id": "t1"})  # seq 4
+
+    replay = registry.replay("t1", since=0)
+    assert [(seq, event) for seq, event, _ in replay] == [
+        (1, "node_status"), (2, "node_status"), (3, "node_log"), (4, "node_log"),
+    ]
+    # Replaying from inside the retained window needs no snapshot entries
+    assert [seq for seq, _, _ in registry.replay("t1", since=2)] == [3, 4]
+
+
+def test_finished_run_is_compacted_to_snapshot():
+    registry = RunEventBufferRegistry(capacity=10, max_finished=1)
+    registry.append("t1", "node_status", _status("a", "running"))
+    registry.append("t1", "node_log", {"nodeId": "a", "log": "hi", "thread_id": "t1"})
+    registry.append("t1", "node_status", _status("a", "completed"))
+    registry.append("t1", "run_finished", {"status": "COMPLETED", "thread_id": "t1"})
+    registry.finish("t1")
+
+    replay = registry.replay("t1", since=0)
+    assert [(seq, event) for seq, event, _ in replay] == [(3, "node_status"), (4, "run_finished")]
+
+    # Only the newest finished snapshot is kept
+    registry.append("t2", "node_status", {"nodeId": "b", "status": "running", "thread_id": "t2"})
+    registry.finish("t2")
+    assert registry.replay("t1", since=0) == []
+
+
+def test_resume_reopens_buffer_and_continues_numbering():
+    registry = RunEventBufferRegistry(capacity=10, max_finished=4)
+    registry.append("t1", "node_status", _status("a", "failed"))
+    registry.finish("t1")
+    assert registry.append("t1", "node_status", _status("a", "running")) == 2
+    assert registry.stats()["active_runs"] == 1
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import sys
+
+# Add backend dir to path to find engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.event_bus import EventBus
+from engine.event_buffer import run_events
+
+
+def test_publish_does_not_wait_for_slow_consumers():
+    bus = EventBus(max_depth=100)
+    delivered = []
+
+    async def slow_consumer(thread_id, event, data):
+        await asyncio.sleep(0.05)
+        delivered.append((event, data["seq"]))
+
+    bus.subscribe("slow", slow_consumer)
+
+    async def run():
+        emit = bus.emitter("bus-run-1")
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for i in range(5):
+            await emit("node_status", {"nodeId": f"n{i}", "status": "running"})
+        emit_elapsed = loop.time() - started
+        await bus.drain()
+        return emit_elapsed
+
+    emit_elapsed = asyncio.run(run())
+    assert emit_elapsed < 0.05
+    assert [seq for _, seq in delivered] == [1, 2, 3, 4, 5]
+
+
+def test_full_queue_drops_logs_but_keeps_status_events():
+    bus = EventBus(max_depth=2)
+    seen = []
+
+    async def consumer(thread_id, event, data):
+        seen.append(event)
+
+    bus.subscribe("tiny", consumer)
+
+    async def run():
+        for _ in range(5):
+            bus.publish("bus-run-2", "node_log", {"nodeId": "a", "log": "x"})
+        bus.publish("bus-run-2", "node_status", {"nodeId": "a", "status": "completed"})
+        await bus.drain()
+
+    asyncio.run(run())
+    metrics = bus.metrics()["consumers"]["tiny"]
+    assert seen == ["node_log", "node_log", "node_status"]
+    assert metrics["dropped"] == 3
+    assert metrics["high_watermark"] == 3
+
+
+def test_durable_consumer_gets_every_log_line_within_its_bound():
+    bus = EventBus(max_depth=2)
+    ui, persisted, depths = [], [], []
+
+    async def ui_consumer(thread_id, event, data):
+        ui.append(event)
+
+    async def log_store(thread_id, event, data):
+        depths.append(len(bus._consumers["log_store"].queue))
+        await asyncio.sleep(0.005)  # a slow disk
+        persisted.append(data.get("log"))
+
+    bus.subscribe("websocket", ui_consumer)
+    bus.subscribe("log_store", log_store, lossy=False)
+
+    async def run():
+        emit = bus.emitter("bus-run-4")
+        for i in range(20):
+            await emit("node_log", {"nodeId": "a", "log": f"line {i}"})
+            assert all(len(c.queue) <= c.max_depth for c in bus._consumers.values())
+        await emit("node_status", {"nodeId": "a", "status": "completed"})
+        await bus.drain()
+
+    asyncio.run(run())
+    metrics = bus.metrics()["consumers"]
+    assert persisted == [f"line {i}" for i in range(20)] + [None]
+    assert max(depths) < 2 and metrics["log_store"]["high_watermark"] <= 2
+    assert metrics["log_store"]["dropped"] == 0 and metrics["log_store"]["overflowed"] == 0
+    assert metrics["log_store"]["backpressure_waits"] > 0
+    assert ui[-1] == "node_status"
+
+
+def test_run_finished_compacts_replay_buffer():
+    bus = EventBus(max_depth=10)
+
+    async def run():
+        bus.publish("bus-run-3", "node_log", {"nodeId": "a", "log": "x"})
+        bus.publish("bus-run-3", "run_finished", {"status": "COMPLETED"})
+
+    asyncio.run(run())
+    assert [event for _, event, _ in run_events.replay("bus-run-3")] == ["run_finished"]
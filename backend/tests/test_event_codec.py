@@ -0,0 +1,58 @@
+import os
+import sys
+import json
+
+# Add backend dir to path to find engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import msgpack
+from engine.event_codec import get_event_codec, EVENT_CODES, STATUS_CODES, STREAM_CODES
+
+THREAD_ID = "6f1c2a9e-3b7d-4c59-9a51-0d2e8f4b7c13"
+
+
+def test_json_codec_is_legacy_format():
+    codec = get_event_codec(None)
+    frame = codec.encode("node_status", {"nodeId": "cmd1", "status": "running", "thread_id": THREAD_ID})
+    assert codec.binary is False
+    assert json.loads(frame) == {
+        "type": "node_status",
+        "data": {"nodeId": "cmd1", "status": "running", "thread_id": THREAD_ID},
+    }
+
+
+def test_unknown_encoding_falls_back_to_json():
+    assert get_event_codec("protobuf").name == "json"
+
+
+def test_msgpack_interns_ids_once():
+    codec = get_event_codec("msgpack")
+    first = msgpack.unpackb(codec.encode("node_log", {
+        "nodeId": "cmd1", "log": "hello\n", "type": "stderr", "thread_id": THREAD_ID,
+    }), strict_map_key=False)
+    assert first["e"] == EVENT_CODES["node_log"]
+    assert first["k"] == STREAM_CODES["stderr"]
+    assert first["l"] == "hello\n"
+    assert first["x"] == {first["t"]: THREAD_ID, first["n"]: "cmd1"}
+
+    second = msgpack.unpackb(codec.encode("node_status", {
+        "nodeId": "cmd1", "status": "completed", "thread_id": THREAD_ID,
+    }), strict_map_key=False)
+    assert "x" not in second
+    assert second["t"] == first["t"] and second["n"] == first["n"]
+    assert second["s"] == STATUS_CODES["completed"]
+
+
+def test_msgpack_keeps_unknown_fields():
+    codec = get_event_codec("msgpack")
+    frame = msgpack.unpackb(codec.encode("interrupt", {"nodeId": "n", "prompt": "sudo"}), strict_map_key=False)
+    assert frame["d"] == {"prompt": "sudo"}
+
+
+def test_compact_frames_are_smaller_for_logs():
+    json_codec = get_event_codec("json")
+    compact = get_event_codec("msgpack")
+    event = {"nodeId": "cmd1", "log": "line\n", "type": "stdout", "thread_id": THREAD_ID}
+    json_bytes = sum(len(json_codec.encode("node_log", event).encode()) for _ in range(100))
+    compact_bytes = sum(len(compact.encode("node_log", event)) for _ in range(100))
+    assert compact_bytes * 3 < json_bytes
@@ -0,0 +1,55 @@
+import asyncio
+import contextvars
+import os
+import sys
+import threading
+import time
+
+# Add backend dir to path to find app/engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.executors import ExecutorRegistry
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def test_pools_are_isolated_and_report_saturation():
+    executors = ExecutorRegistry({"llm": 2, "io": 1})
+
+    async def run():
+        # Three slow "LLM calls" on two workers: one waits in the queue...
+        slow = [asyncio.create_task(executors.get("llm").run(time.sleep, 0.3)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        assert executors.stats()["llm"]["queued"] == 1
+        # ...while the io pool still answers straight away
+        started = time.monotonic()
+        name = await executors.get("io").run(lambda: threading.current_thread().name)
+        assert name.startswith("flowx-io") and time.monotonic() - started < 0.2
+        await asyncio.gather(*slow)
+
+    asyncio.run(run())
+    stats = executors.stats()["llm"]
+    assert (stats["submitted"], stats["completed"], stats["active"], stats["queued"]) == (3, 3, 0, 0)
+    assert stats["saturated"] == 1 and stats["max_queue_depth"] >= 1
+    assert stats["max_wait_ms"] >= 200
+    executors.shutdown()
+
+
+def test_context_and_errors_propagate():
+    executors = ExecutorRegistry({"io": 1})
+
+    def fail():
+        raise ValueError(request_id.get())
+
+    async def run():
+        request_id.set("abc")
+        try:
+            await executors.get("io").run(fail)
+        except ValueError as e:
+            assert str(e) == "abc"
+        else:
+            raise AssertionError("expected ValueError")
+
+    asyncio.run(run())
+    assert executors.stats()["io"]["failed"] == 1
+    executors.shutdown()
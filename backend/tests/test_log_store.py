@@ -0,0 +1,108 @@
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add backend dir to path to find engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from engine.log_store import LogStore
+
+
+def _fill(store: LogStore, lines: int):
+    async def run():
+        for i in range(lines):
+            await store.append("run-1", "cmd1", f"line {i:04d}\n")
+    asyncio.run(run())
+
+
+def test_range_reads_span_chunks_and_pending(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(settings, "LOG_CHUNK_BYTES", 64)
+    store = LogStore(tmp_path)
+    _fill(store, 50)  # 50 * 10 bytes, several flushed chunks + an in-memory tail
+
+    expected = "".join(f"line {i:04d}\n" for i in range(50))
+    page = asyncio.run(store.read("run-1", "cmd1", offset=55, length=100))
+    assert page["data"] == expected[55:155]
+    assert page["next_offset"] == 155
+    assert page["total_bytes"] == len(expected)
+
+    tail = asyncio.run(store.tail("run-1", "cmd1", 20))
+    assert tail["data"] == expected[-20:]
+
+
+def test_logs_survive_writer_close(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(settings, "LOG_CHUNK_BYTES", 64)
+    store = LogStore(tmp_path)
+    _fill(store, 30)
+    asyncio.run(store.close_run("run-1"))
+
+    reopened = LogStore(tmp_path)
+    assert reopened.list_nodes("run-1") == {"cmd1": 300}
+    page = asyncio.run(reopened.read("run-1", "cmd1", offset=0, length=1000))
+    assert page["data"].count("\n") == 30
+
+
+def test_grep_reports_line_offsets(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(settings, "LOG_CHUNK_BYTES", 64)
+    store = LogStore(tmp_path)
+    _fill(store, 40)
+
+    result = asyncio.run(store.grep("run-1", "cmd1", r"line 00[13]7"))
+    assert [m["line"] for m in result["matches"]] == ["line 0017", "line 0037"]
+    assert [m["offset"] for m in result["matches"]] == [170, 370]
+
+    limited = asyncio.run(store.grep("run-1", "cmd1", "line", limit=3))
+    assert limited["truncated"] is True and len(limited["matches"]) == 3
+
+
+def test_ids_cannot_escape_log_dir(tmp_path: Path):
+    store = LogStore(tmp_path / "logs")
+    asyncio.run(store.append("../../etc", "../passwd", "x"))
+    asyncio.run(store.close_run("../../etc"))
+    written = [p for p in tmp_path.rglob("*") if p.is_file()]
+    assert written and all((tmp_path / "logs") in p.parents for p in written)
+
+
+def test_similar_ids_get_their_own_files(tmp_path: Path):
+    store = LogStore(tmp_path)
+
+    async def run():
+        await store.append("run-1", "a/b", "slash\n")
+        await store.append("run-1", "a_b", "underscore\n")
+        await store.close_run("run-1")
+
+    asyncio.run(run())
+    reopened = LogStore(tmp_path)
+    assert reopened.list_nodes("run-1") == {"a/b": 6, "a_b": 11}
+    assert asyncio.run(reopened.read("run-1", "a/b"))["data"] == "slash\n"
+    assert asyncio.run(reopened.read("run-1", "a_b"))["data"] == "underscore\n"
+
+
+def test_prune_drops_old_runs_then_the_oldest_past_the_size_cap(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(settings, "LOG_RETENTION_S", 3600)
+    monkeypatch.setattr(settings, "LOG_DIR_MAX_BYTES", 0)
+    store = LogStore(tmp_path)
+    store._last_prune = time.monotonic()  # no background pass racing the explicit ones
+
+    async def write(thread_id):
+        await store.append(thread_id, "cmd", "x" * 100)
+        await store.close_run(thread_id)
+
+    for thread_id, age in (("expired", 7200), ("older", 60), ("newer", 0)):
+        asyncio.run(write(thread_id))
+        for f in store._run_dir(thread_id).iterdir():
+            os.utime(f, (time.time() - age, time.time() - age))
+    asyncio.run(store.append("live", "cmd", "still running"))
+
+    assert store.prune() == 1
+    assert store.list_nodes("expired") == {} and store.list_nodes("older") == {"cmd": 100}
+
+    # Room for one of the two finished runs
+    run_bytes = sum(f.stat().st_size for f in store._run_dir("newer").iterdir())
+    monkeypatch.setattr(settings, "LOG_DIR_MAX_BYTES", run_bytes + 1)
+    assert store.prune() == 1
+    assert store.list_nodes("older") == {} and store.list_nodes("newer") == {"cmd": 100}
+    assert store.list_nodes("live") == {"cmd": 13}
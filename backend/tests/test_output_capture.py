@@ -0,0 +1,136 @@
+import asyncio
+import gzip
+import os
+import sys
+import time
+
+# Add backend dir to path to find app/engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from engine import output_capture
+from engine.output_capture import OutputCapture
+from app.core.shell_pool import ShellPool
+import engine.pty_runner as pty_runner
+
+
+def test_small_output_is_kept_whole(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CAPTURE_DIR", str(tmp_path))
+    capture = OutputCapture(head_bytes=8, tail_bytes=8)
+    for chunk in (b"abc\n", b"def\n", b"gh"):
+        capture.feed(chunk)
+    capture.close()
+    assert capture.text() == "abc\ndef\ngh"
+    assert capture.summary() == {
+        "total_bytes": 10, "total_lines": 3, "truncated": False,
+        "omitted_bytes": 0, "spill_path": None, "spill_truncated": False, "spill_dropped_bytes": 0,
+    }
+    assert not list(tmp_path.iterdir())
+
+
+def test_overflow_keeps_head_and_tail_and_spills_everything(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CAPTURE_DIR", str(tmp_path))
+    stream = b"".join(b"line %05d\n" % i for i in range(5000))
+    capture = OutputCapture(head_bytes=100, tail_bytes=200, spill_name="run/../node")
+    for pos in range(0, len(stream), 777):
+        capture.feed(stream[pos:pos + 777])
+    capture.close()
+    assert capture.wait_spilled(5)
+
+    assert len(capture.head) == 100 and len(capture.tail) == 200
+    assert capture.head == stream[:100] and capture.tail == stream[-200:]
+    summary = capture.summary()
+    assert summary["total_bytes"] == len(stream)
+    assert summary["total_lines"] == 5000
+    assert summary["truncated"] and summary["omitted_bytes"] == len(stream) - 300
+    assert os.path.dirname(summary["spill_path"]) == str(tmp_path)
+    with gzip.open(summary["spill_path"]) as f:
+        assert f.read() == stream
+    assert f"{len(stream) - 300} bytes omitted" in capture.text()
+
+
+def test_spills_of_similar_or_repeated_names_never_share_a_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CAPTURE_DIR", str(tmp_path))
+    paths = []
+    for name in ("run-a/b", "run-a_b", "run-a_b"):
+        capture = OutputCapture(head_bytes=1, tail_bytes=1, spill_name=name)
+        capture.feed(name.encode())
+        capture.close()
+        assert capture.wait_spilled(5)
+        paths.append(capture.spill_path)
+    assert len(set(paths)) == 3
+    with gzip.open(paths[0]) as f:
+        assert f.read() == b"run-a/b"
+
+
+def test_spill_stops_at_its_cap(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CAPTURE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "CAPTURE_SPILL_MAX_BYTES", 1000)
+    capture = OutputCapture(head_bytes=10, tail_bytes=10)
+    for _ in range(100):
+        capture.feed(b"x" * 100)
+    capture.close()
+    assert capture.wait_spilled(5)
+    assert capture.spill_truncated and capture.total_bytes == 10000
+    with gzip.open(capture.spill_path) as f:
+        assert len(f.read()) == 1000
+
+
+def test_a_stalled_spill_writer_never_blocks_feed(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CAPTURE_DIR", str(tmp_path))
+    monkeypatch.setattr(output_capture, "_SPILL_MAX_BACKLOG", 1000)
+    capture = OutputCapture(head_bytes=10, tail_bytes=10)
+    monkeypatch.setattr(capture, "_start_writer", lambda: None)  # the writer never gets a worker
+
+    started = time.monotonic()
+    for _ in range(100):
+        capture.feed(b"x" * 100)
+    assert time.monotonic() - started < 1
+    assert capture.spill_truncated and capture.spilled_bytes == 1000
+    assert capture.summary()["spill_dropped_bytes"] == 9000
+
+    del capture._start_writer  # the worker shows up: what was queued is written and the file closed
+    with capture._spill_cond:
+        capture._start_writer()
+    assert capture.wait_spilled(5)
+    with gzip.open(capture.spill_path) as f:
+        assert f.read() == b"x" * 1000
+
+
+def test_old_spills_are_pruned_when_a_new_one_opens(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CAPTURE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "CAPTURE_RETENTION_S", 3600)
+    monkeypatch.setattr(settings, "CAPTURE_DIR_MAX_BYTES", 0)
+    stale, recent = tmp_path / "stale.out.gz", tmp_path / "recent.out.gz"
+    for path in (stale, recent):
+        path.write_bytes(b"x")
+    os.utime(stale, (time.time() - 7200, time.time() - 7200))
+
+    capture = OutputCapture(head_bytes=10, tail_bytes=10, spill_name="new")
+    capture.feed(b"y" * 100)
+    capture.close()
+    assert capture.wait_spilled(5)
+    deadline = time.monotonic() + 5  # pruning runs on the io pool
+    while stale.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sorted(tmp_path.iterdir()) == sorted([capture.spill_path, recent])
+
+
+def test_pty_output_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CAPTURE_DIR", str(tmp_path))
+    monkeypatch.setattr(pty_runner, "shell_pool", ShellPool(terminals=0, exec_workers=0))
+
+    async def run():
+        capture = OutputCapture(head_bytes=1024, tail_bytes=1024)
+        exit_code, stdout, _ = await pty_runner.execute_in_pty(
+            "seq 1 200000; echo END", capture=capture)
+        assert exit_code == 0
+        assert stdout.startswith("1\r\n2\r\n") and stdout.endswith("END\r\n")
+        assert len(stdout) < 2200
+        summary = capture.summary()
+        assert summary["total_lines"] == 200001 and summary["truncated"]
+        assert capture.wait_spilled(5)
+        with gzip.open(summary["spill_path"]) as f:
+            assert f.read().count(b"\n") == 200001
+
+    asyncio.run(run())
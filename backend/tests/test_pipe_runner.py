@@ -0,0 +1,67 @@
+import asyncio
+import os
+import sys
+import time
+
+# Add backend dir (app/engine) and the repo root (plugins) to the path
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.dirname(BACKEND_DIR))
+
+from config import settings
+from engine.pipe_runner import execute_in_pipe
+from plugins.CommandNode.backend.node import needs_pty, needs_tty
+
+
+def test_streams_stay_separate():
+    async def run():
+        streamed = []
+
+        async def on_output(chunk, stream):
+            streamed.append((stream, chunk))
+
+        result = await execute_in_pipe("echo out; echo err >&2; [ -t 1 ] || echo notty; exit 3", on_output)
+        assert result == (3, "out\nnotty\n", "err\n")
+        assert ("stderr", "err\n") in streamed
+        assert "".join(c for s, c in streamed if s == "stdout") == "out\nnotty\n"
+
+    asyncio.run(run())
+
+
+def test_background_child_does_not_hold_the_node():
+    async def run():
+        started = time.monotonic()
+        exit_code, stdout, _ = await execute_in_pipe("sleep 5 & echo done")
+        assert (exit_code, stdout) == (0, "done\n")
+        assert time.monotonic() - started < 1.0
+
+    asyncio.run(run())
+
+
+def test_cancel_kills_the_group():
+    async def run():
+        task = asyncio.create_task(execute_in_pipe("trap '' HUP TERM; sleep 30"))
+        await asyncio.sleep(0.2)
+        started = time.monotonic()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        assert time.monotonic() - started < settings.PROCESS_KILL_GRACE_S + 1
+
+    asyncio.run(run())
+
+
+def test_pty_only_when_needed(monkeypatch):
+    assert not needs_pty("jq .name data.json", {})
+    assert needs_pty("jq .name data.json", {"sudoLock": True})
+    assert needs_pty("ls", {"interactive": True})
+    assert needs_pty("/usr/bin/vim notes.txt", {})
+    assert needs_pty("apt update && sudo apt upgrade", {})
+    assert not needs_pty("echo pseudo-terminal", {})
+    monkeypatch.setattr(settings, "COMMAND_PIPE_FAST_PATH", False)
+    assert needs_pty("echo hi", {})
+    # Prompting and full-screen programs leave the session shell whatever the fast path says
+    assert not needs_tty("echo hi", {})
+    assert needs_tty("/usr/bin/vim notes.txt", {"sessionShell": True})
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import sys
+
+import pytest
+from fastapi import HTTPException
+
+# Add backend dir to path to find app/engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.plans import PlanCache, apply_overrides, cached_plan, executable_document, prepare_plan, reuse_plan
+from engine.protocol import FlowXNode
+from engine.registry import NodeRegistry
+from engine.validation_sessions import ValidationSessionRegistry
+from engine.validator import validation_cache
+
+calls = []
+
+
+class ProbeNode(FlowXNode):
+    validation_cacheable = False
+
+    def validate(self, data):
+        calls.append(data["id"])
+        ok = os.path.exists(data["data"]["path"])
+        return {"valid": ok, "errors": [] if ok else [{"nodeId": data["id"], "message": "missing", "level": "CRITICAL"}]}
+
+    async def execute(self, ctx, payload): return {}
+    def get_execution_mode(self): return {}
+
+
+NodeRegistry.register("probeNode", ProbeNode)
+
+
+def graph(path="/"):
+    nodes = [
+        {"id": "start", "type": "startNode", "position": {"x": 0, "y": 0}, "data": {}},
+        {"id": "cmd", "type": "commandNode", "position": {"x": 0, "y": 80}, "data": {"command": "ls"}},
+        {"id": "probe", "type": "probeNode", "position": {"x": 0, "y": 160}, "data": {"path": path}},
+    ]
+    edges = [{"id": "e1", "source": "start", "target": "cmd"}, {"id": "e2", "source": "cmd", "target": "probe"}]
+    return nodes, edges
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    monkeypatch.setattr("engine.plans.plan_cache", PlanCache(8))
+    validation_cache.clear()
+    calls.clear()
+
+
+def test_execute_reuses_the_plan_of_an_unchanged_graph():
+    import engine.plans as plans
+    nodes, edges = graph()
+    first = asyncio.run(prepare_plan(nodes, edges))
+    assert first.volatile_ids == ["probe"] and calls == ["probe"]
+
+    # Layout, selection and run state do not change the plan
+    nodes[1] = {**nodes[1], "position": {"x": 40, "y": 0}, "selected": True, "data": {**nodes[1]["data"], "status": "completed"}}
+    edges[0] = {**edges[0], "animated": True}
+    second = asyncio.run(prepare_plan(nodes, edges))
+    assert second is first and plans.plan_cache.stats()["hits"] == 1
+    # ...but the validator that looks outside the config runs again
+    assert calls == ["probe", "probe"]
+
+    nodes[1]["data"]["command"] = "ls -l"
+    assert asyncio.run(prepare_plan(nodes, edges)) is not first
+
+
+def test_hits_still_fail_on_volatile_errors_and_invalid_graphs_are_not_stored():
+    import engine.plans as plans
+    nodes, edges = graph()
+    asyncio.run(prepare_plan(nodes, edges))
+    nodes[2]["data"]["path"] = "/does/not/exist"
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(prepare_plan(nodes, edges))
+    assert e.value.status_code == 400 and e.value.detail[0]["nodeId"] == "probe"
+    assert plans.plan_cache.stats()["entries"] == 1
+
+
+def test_validate_stores_the_plan_execute_and_resume_use():
+    async def run():
+        nodes, edges = graph()
+        response = await ValidationSessionRegistry(max_sessions=2).validate(nodes, edges)
+        assert response["plan_hash"] is not None
+        plan = cached_plan(nodes, edges)
+        assert plan is not None and plan.plan_hash == response["plan_hash"]
+        assert await prepare_plan(nodes, edges) is plan
+
+        broken, _ = graph("/does/not/exist")
+        response = await ValidationSessionRegistry(max_sessions=2).validate(broken, edges)
+        assert response["plan_hash"] is None
+
+    asyncio.run(run())
+
+
+def test_structural_diffs_store_the_plan_and_config_diffs_stay_incremental(monkeypatch):
+    import engine.validation_sessions as validation_sessions
+    compiles = []
+    real_compile = validation_sessions.compile_graph
+    monkeypatch.setattr(validation_sessions, "compile_graph", lambda *a: compiles.append(1) or real_compile(*a))
+
+    async def run():
+        sessions = ValidationSessionRegistry(max_sessions=2)
+        nodes, edges = graph()
+        loaded = await sessions.validate(nodes, edges)
+
+        # A new edge changes the shape: the diff compiles the graph and keeps its plan
+        edges.append({"id": "e3", "source": "start", "target": "probe"})
+        response = await sessions.apply_diff(loaded["session_id"], loaded["version"], [], [], [edges[2]], [])
+        plan = cached_plan(nodes, edges)
+        assert response["plan_hash"] is not None and plan.plan_hash == response["plan_hash"]
+        assert response["plan_hash"] != loaded["plan_hash"]
+
+        # A config edit does not touch the whole graph...
+        compiles.clear()
+        nodes[1] = {**nodes[1], "data": {"command": "ls -l"}}
+        response = await sessions.apply_diff(loaded["session_id"], response["version"], [nodes[1]], [], [], [])
+        assert compiles == [] and "plan_hash" not in response
+        # ...and /execute builds the plan from cached results (only the volatile validator runs)
+        calls.clear()
+        plan = await prepare_plan(nodes, edges)
+        assert calls == ["probe"] and cached_plan(nodes, edges) is plan
+
+        nodes[2] = {**nodes[2], "data": {"path": "/does/not/exist"}}
+        response = await sessions.apply_diff(loaded["session_id"], response["version"], [nodes[2]], [], [], ["e3"])
+        assert response["plan_hash"] is None
+
+    asyncio.run(run())
+
+
+def test_saved_projection_finds_the_plan_by_its_hash():
+    async def run():
+        nodes, edges = graph()
+        stored = executable_document(nodes, edges)
+        assert "position" not in stored["nodes"][0]
+        assert await reuse_plan(stored["hash"]) is None
+        plan = await prepare_plan(stored["nodes"], stored["edges"])
+        # The canvas graph and its stored projection share one plan
+        assert plan.plan_hash == stored["hash"] and await reuse_plan(stored["hash"]) is plan
+        assert await prepare_plan(nodes, edges) is plan
+
+        overridden = apply_overrides(stored["nodes"], {"cmd": {"command": "ls -a"}})
+        assert overridden[1]["data"]["command"] == "ls -a" and stored["nodes"][1]["data"]["command"] == "ls"
+        assert (await prepare_plan(overridden, stored["edges"])) is not plan
+        with pytest.raises(HTTPException) as e:
+            apply_overrides(stored["nodes"], {"nope": {}})
+        assert e.value.status_code == 400
+
+    asyncio.run(run())
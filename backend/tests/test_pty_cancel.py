@@ -0,0 +1,74 @@
+import asyncio
+import os
+import sys
+import time
+
+# Add backend dir to path to find app/engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psutil
+
+from config import settings
+import engine.pty_runner as pty_runner
+from app.core.shell_pool import ShellPool
+
+
+def _pid_gone(pid, timeout=1.0):
+    """True once the pid is dead (reaped or zombie). A SIGKILL takes a moment to be delivered."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if psutil.Process(pid).status() == psutil.STATUS_ZOMBIE:
+                return True
+        except psutil.NoSuchProcess:
+            return True
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+
+
+async def _cancel_after_start(command, started_marker, monkeypatch):
+    """Runs `command`, cancels it once it printed `started_marker`. Returns (pids, cancel latency)."""
+    monkeypatch.setattr(pty_runner, "shell_pool", ShellPool(terminals=0, exec_workers=0))
+    seen = asyncio.Event()
+    output = []
+
+    async def on_output(chunk, _stream):
+        output.append(chunk)
+        if started_marker in "".join(output):
+            seen.set()
+
+    task = asyncio.create_task(pty_runner.execute_in_pty(command, on_output=on_output))
+    await asyncio.wait_for(seen.wait(), 10)
+    pids = [int(p) for p in "".join(output).split(started_marker)[1].split()[:2]]
+
+    started = time.monotonic()
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    return pids, time.monotonic() - started
+
+
+def test_cancel_terminates_the_process_group(monkeypatch):
+    async def run():
+        # A background child in the same group must go too, not just bash
+        pids, latency = await _cancel_after_start(
+            "sleep 60 & echo STARTED $$ $!; wait", "STARTED", monkeypatch)
+        assert latency < 1.0
+        assert all(_pid_gone(pid) for pid in pids)
+
+    asyncio.run(run())
+
+
+def test_cancel_escalates_to_sigkill_after_grace(monkeypatch):
+    monkeypatch.setattr(settings, "PROCESS_KILL_GRACE_S", 0.3)
+
+    async def run():
+        pids, latency = await _cancel_after_start(
+            "trap '' HUP TERM; sleep 60 & echo STARTED $$ $!; wait; wait", "STARTED", monkeypatch)
+        assert 0.3 <= latency < 1.5
+        assert all(_pid_gone(pid) for pid in pids)
+
+    asyncio.run(run())
@@ -0,0 +1,29 @@
+import asyncio
+import os
+import sys
+import threading
+
+# Add backend dir to path to find app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.session_manager import PtySession
+
+
+def test_attach_streams_output_without_threads():
+    async def run():
+        session = PtySession(command="bash")
+        session.start()
+        chunks = []
+        done = asyncio.Event()
+        threads_before = threading.active_count()
+
+        session.attach(asyncio.get_running_loop(), chunks.append, done.set)
+        session.write(b"seq 1 5000; exit\n")
+        await asyncio.wait_for(done.wait(), timeout=10)
+
+        assert threading.active_count() == threads_before
+        output = b"".join(chunks)
+        assert b"5000" in output
+        session.terminate()
+
+    asyncio.run(run())
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import sys
+
+# Add backend dir to path to find engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.event_buffer import run_events
+from engine.event_bus import EventBus
+from engine.run_streams import RunStreamHub
+from routers.events import stream_run_events
+
+
+def test_stream_replays_backlog_then_live_events_without_duplicates():
+    bus = EventBus(max_depth=100)
+    hub = RunStreamHub(max_depth=100)
+    bus.subscribe("streams", hub.dispatch)
+
+    async def run():
+        bus.publish("sse-1", "node_status", {"nodeId": "a", "status": "running"})
+        bus.publish("sse-1", "node_log", {"nodeId": "a", "log": "x"})
+        # Opened before the bus consumer fanned out seq 1-2: they must arrive once
+        stream = hub.open("sse-1", since=0)
+        bus.publish("sse-1", "node_log", {"nodeId": "a", "log": "y"})
+        bus.publish("sse-1", "run_finished", {"status": "COMPLETED"})
+        received = []
+        while True:
+            item = await stream.next(timeout=1)
+            received.append(item[:2])
+            if item[1] == "run_finished":
+                break
+        hub.close(stream)
+        return received
+
+    assert asyncio.run(run()) == [(1, "node_status"), (2, "node_log"), (3, "node_log"), (4, "run_finished")]
+    assert hub.stats()["open_streams"] == 0
+
+
+def test_stream_resumes_after_last_event_id_and_filters_types():
+    bus = EventBus(max_depth=100)
+    hub = RunStreamHub(max_depth=100)
+
+    async def run():
+        for i in range(4):
+            bus.publish("sse-2", "node_log", {"nodeId": "a", "log": str(i)})
+        bus.publish("sse-2", "node_status", {"nodeId": "a", "status": "completed"})
+        bus.publish("sse-2", "run_finished", {"status": "COMPLETED"})
+        stream = hub.open("sse-2", since=2, types=["node_status"])
+        return [(await stream.next(timeout=1))[:2] for _ in range(2)]
+
+    assert asyncio.run(run()) == [(5, "node_status"), (6, "run_finished")]
+
+
+def test_finished_run_stream_ends_when_nothing_is_left():
+    bus = EventBus(max_depth=100)
+
+    async def run():
+        bus.publish("sse-3", "node_status", {"nodeId": "a", "status": "completed"})
+        bus.publish("sse-3", "run_finished", {"status": "COMPLETED"})
+        caught_up = await stream_run_events("sse-3", request=None, since=0, last_event_id="2")
+        behind = await stream_run_events("sse-3", request=None, since=1, last_event_id=None)
+        return caught_up, behind
+
+    caught_up, behind = asyncio.run(run())
+    assert caught_up.status_code == 204
+    assert behind.media_type == "text/event-stream"
+
+
+def test_registered_run_streams_before_its_first_event():
+    bus = EventBus(max_depth=100)
+
+    async def run():
+        run_events.open("sse-4")
+        early = await stream_run_events("sse-4", request=None, since=0, last_event_id=None)
+        # Resume reopens a finished run: streams wait for its new events
+        bus.publish("sse-5", "run_finished", {"status": "FAILED"})
+        run_events.open("sse-5")
+        resumed = await stream_run_events("sse-5", request=None, since=1, last_event_id=None)
+        return early, resumed
+
+    early, resumed = asyncio.run(run())
+    assert early.media_type == "text/event-stream" and resumed.media_type == "text/event-stream"
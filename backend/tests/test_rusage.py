@@ -0,0 +1,77 @@
+import asyncio
+import os
+import sys
+
+# Add backend dir (app/engine) and the repo root (plugins) to the path
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.dirname(BACKEND_DIR))
+
+from app.core.shell_pool import ShellPool
+from engine.pipe_runner import execute_in_pipe
+from engine.async_runner import AsyncGraphExecutor
+from engine.protocol import FlowXNode
+from engine.registry import NodeRegistry
+from engine.rusage import RunUsageRegistry, run_usage, with_cpu_ratio
+import engine.pty_runner as pty_runner
+from plugins.ShellTool.backend.node import ShellToolNode
+
+# Burns ~0.2 s of CPU in a grandchild: wait4 must account for the whole tree
+BUSY = "bash -c 'i=0; while [ $i -lt 40000 ]; do i=$((i+1)); done'; sleep 0.2"
+
+
+def test_runners_report_rusage_of_the_process_tree(monkeypatch):
+    monkeypatch.setattr(pty_runner, "shell_pool", ShellPool(terminals=0, exec_workers=0))
+
+    async def run():
+        for execute in (execute_in_pipe, pty_runner.execute_in_pty):
+            usage = {}
+            exit_code, _, _ = await execute(BUSY, usage=usage)
+            assert exit_code == 0
+            assert usage["user_cpu_s"] + usage["sys_cpu_s"] > 0.05
+            assert usage["max_rss_kb"] > 0
+            assert set(usage) >= {"block_in", "block_out", "voluntary_ctx_switches", "involuntary_ctx_switches"}
+
+    asyncio.run(run())
+
+
+def test_run_totals():
+    registry = RunUsageRegistry()
+    registry.record("run", with_cpu_ratio({"user_cpu_s": 0.5, "sys_cpu_s": 0.1, "max_rss_kb": 100, "block_in": 8}, 1000), 1000)
+    registry.record("run", {"user_cpu_s": 0.25, "sys_cpu_s": 0.0, "max_rss_kb": 300, "block_out": 16}, 500)
+    totals = registry.get("run")
+    assert totals["commands"] == 2 and totals["wall_ms"] == 1500
+    assert totals["user_cpu_s"] == 0.75 and totals["sys_cpu_s"] == 0.1
+    assert totals["max_rss_kb"] == 300
+    assert (totals["block_in"], totals["block_out"]) == (8, 16)
+    assert registry.pop("run") and registry.get("run") is None
+
+
+class ToolCallerNode(FlowXNode):
+    """Stands in for the agent: calls the ShellTool it receives once."""
+
+    async def execute(self, ctx, payload):
+        tool = next(iter(payload["inputs"].values()))["output"]
+        output = await tool["implementation"]("echo hi")
+        return {"status": "success", "output": output}
+
+    def validate(self, data): return {"valid": True, "errors": []}
+    def get_execution_mode(self): return {}
+
+
+def test_shell_tool_usage_lands_in_the_run_totals():
+    NodeRegistry.register("shellTool", ShellToolNode)
+    NodeRegistry.register("toolCaller", ToolCallerNode)
+    workflow = {
+        "id": "wf",
+        "nodes": [{"id": "tool", "type": "shellTool", "data": {"capability_profile": "read_only"}},
+                  {"id": "agent", "type": "toolCaller", "data": {}}],
+        "edges": [{"id": "e", "source": "tool", "target": "agent"}],
+    }
+    # The per-run uuid (audit) differs from the thread_id the executor reads usage by
+    executor = AsyncGraphExecutor(workflow, thread_id="thread-1", global_context={"run_id": "run-uuid"})
+    result = asyncio.run(executor.execute())
+    assert result["results"]["agent"]["output"] == "hi"
+    assert result["resource_usage"]["commands"] == 1
+    assert run_usage.get("run-uuid") is None
+    assert run_usage.pop("thread-1") is not None
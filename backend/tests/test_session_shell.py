@@ -0,0 +1,98 @@
+import asyncio
+import collections
+import os
+import sys
+
+# Add backend dir to path to find app/engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.process import wait_for_pending
+from app.core.terminal_protocol import MarkerParser
+from engine.output_capture import OutputCapture
+from engine.session_shell import SessionShell, SessionShellRegistry
+
+
+def test_state_carries_over_between_commands(tmp_path):
+    async def run():
+        shells = SessionShellRegistry()
+        assert await shells.execute("run-1", f"cd {tmp_path}; export GREETING=hi") == (0, "", "")
+        exit_code, stdout, _ = await shells.execute("run-1", "pwd; echo $GREETING; (exit 7)")
+        assert exit_code == 7
+        assert stdout.splitlines() == [str(tmp_path), "hi"]
+        # Other runs get their own shell
+        _, stdout, _ = await shells.execute("run-2", "echo ${GREETING:-unset}")
+        assert stdout.strip() == "unset"
+        assert shells.stats()["active"] == 2
+        shells.shutdown()
+        await wait_for_pending()
+
+    asyncio.run(run())
+
+
+def test_exit_ends_the_session_and_the_next_command_starts_fresh():
+    async def run():
+        shells = SessionShellRegistry()
+        await shells.execute("run", "export X=1")
+        assert (await shells.execute("run", "exit 3"))[0] == 3
+        exit_code, stdout, _ = await shells.execute("run", "echo ${X:-fresh}")
+        assert (exit_code, stdout.strip()) == (0, "fresh")
+        assert shells.stats()["started"] == 2
+        shells.shutdown()
+        await wait_for_pending()
+
+    asyncio.run(run())
+
+
+def test_commands_read_eof_instead_of_waiting_for_input():
+    async def run():
+        shells = SessionShellRegistry()
+        exit_code, stdout, _ = await asyncio.wait_for(shells.execute("run", 'read answer; echo "got:[$answer]"'), 5)
+        assert (exit_code, stdout.strip()) == (0, "got:[]")
+        shells.shutdown()
+        await wait_for_pending()
+
+    asyncio.run(run())
+
+
+def test_output_after_done_in_the_same_read_goes_to_the_next_command():
+    reads = [
+        b"\x1b]1337;START\x07one\n\x1b]1337;DONE:0\x07late\n",
+        b"\x1b]1337;START\x07two\n\x1b]1337;DONE:3\x07",
+    ]
+
+    async def send(command):
+        shell.chunks.put_nowait(reads.pop(0))
+
+    # A shell without a process: reads are scripted per command
+    shell = SessionShell.__new__(SessionShell)
+    shell.parser = MarkerParser()
+    shell.pending = collections.deque()
+    shell.commands = 0
+    shell._send = send
+
+    async def run():
+        shell.chunks = asyncio.Queue()
+        shell.lock = asyncio.Lock()
+        first, second = OutputCapture(), OutputCapture()
+        assert await shell.run("first", None, first) == 0
+        assert await shell.run("second", None, second) == 3
+        return first.text(), second.text()
+
+    assert asyncio.run(run()) == ("one\n", "late\ntwo\n")
+
+
+def test_cancel_closes_the_shell():
+    async def run():
+        shells = SessionShellRegistry()
+        task = asyncio.create_task(shells.execute("run", "sleep 30"))
+        await asyncio.sleep(0.2)
+        shell = shells.shells["run"]
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        assert not shell.alive() and shell.process.returncode is not None
+        shells.shutdown()
+
+    asyncio.run(run())
@@ -0,0 +1,42 @@
+import asyncio
+import os
+import sys
+
+# Add backend dir to path to find app/engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.shell_pool import ShellPool
+import engine.pty_runner as pty_runner
+
+
+def test_exec_workers_are_handed_out_and_replenished(monkeypatch):
+    async def run():
+        pool = ShellPool(terminals=0, exec_workers=2)
+        monkeypatch.setattr(pty_runner, "shell_pool", pool)
+        pool.start()
+        await asyncio.sleep(0.2)
+        assert pool.stats()["exec"]["idle"] == 2
+
+        exit_code, stdout, _ = await pty_runner.execute_in_pty("printf 'a b\\n'; [ -t 1 ] && echo tty; exit 4")
+        assert exit_code == 4
+        assert stdout.splitlines() == ["a b", "tty"]
+
+        await asyncio.sleep(0.2)
+        stats = pool.stats()["exec"]
+        assert stats["hits"] == 1 and stats["hit_rate"] == 1.0
+        assert stats["idle"] == 2  # refilled in the background
+        pool.shutdown()
+        assert pool.stats()["exec"]["idle"] == 0
+
+    asyncio.run(run())
+
+
+def test_empty_pool_falls_back_to_direct_spawn(monkeypatch):
+    async def run():
+        pool = ShellPool(terminals=0, exec_workers=0)
+        monkeypatch.setattr(pty_runner, "shell_pool", pool)
+        exit_code, stdout, _ = await pty_runner.execute_in_pty("echo direct")
+        assert (exit_code, stdout.strip()) == (0, "direct")
+        assert pool.stats()["exec"]["misses"] == 0
+
+    asyncio.run(run())
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import struct
+import sys
+
+# Add backend dir to path to find app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.terminal_protocol import (
+    MarkerParser, OutputBatcher, parse_binary_input, make_text_decoder, OP_INPUT, OP_RESIZE,
+)
+
+
+def test_parse_binary_input():
+    assert parse_binary_input(b"\x00ls\r") == (OP_INPUT, b"ls\r")
+    assert parse_binary_input(b"\x01" + struct.pack("!HH", 120, 40)) == (OP_RESIZE, (120, 40))
+    assert parse_binary_input(b"\x01\x00") == (None, None)
+    assert parse_binary_input(b"") == (None, None)
+
+
+def test_incremental_decoder_keeps_split_characters():
+    decoder = make_text_decoder()
+    encoded = "héllo".encode()
+    assert decoder.decode(encoded[:2]) + decoder.decode(encoded[2:]) == "héllo"
+
+
+def test_marker_parser_strips_markers_in_stream_order():
+    parser = MarkerParser()
+    assert parser.feed(b"$ ls\r\n\x1b]1337;START\x07a b\r\n\x1b]13") == [
+        b"$ ls\r\n", ("start", None), b"a b\r\n",
+    ]
+    # Marker split across reads is reassembled
+    assert parser.feed(b"37;DONE:2\x07$ ") == [("done", 2), b"$ "]
+    # Other OSC 1337 sequences pass through untouched
+    other = b"\x1b]1337;SetMark\x07x"
+    assert parser.feed(other) == [other]
+
+
+def test_batcher_keeps_control_events_in_order():
+    async def run():
+        queue: asyncio.Queue = asyncio.Queue()
+        batcher = OutputBatcher(queue, window=0, max_bytes=1024)
+        for item in (b"out", {"type": "command_finished"}, b"prompt", None):
+            queue.put_nowait(item)
+        assert await batcher.next() == b"out"
+        assert await batcher.next() == {"type": "command_finished"}
+        assert await batcher.next() == b"prompt"
+        assert await batcher.next() is None
+
+    asyncio.run(run())
+
+
+def test_batcher_coalesces_streaming_output():
+    async def run():
+        queue: asyncio.Queue = asyncio.Queue()
+        batcher = OutputBatcher(queue, window=0.01, max_bytes=64 * 1024)
+
+        # Interactive echo goes out alone, immediately
+        queue.put_nowait(b"a")
+        assert await batcher.next() == b"a"
+
+        # Bulk output: chunks arriving within the window share one frame
+        queue.put_nowait(b"x" * 4096)
+        asyncio.get_running_loop().call_later(0.002, queue.put_nowait, b"y" * 4096)
+        frame = await batcher.next()
+        assert frame == b"x" * 4096 + b"y" * 4096
+
+        queue.put_nowait(b"tail")
+        queue.put_nowait(None)
+        assert await batcher.next() == b"tail"
+        assert await batcher.next() is None
+
+    asyncio.run(run())
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+# Add backend dir to path to find app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from app.core.process import terminate_group, wait_for_pending
+from app.core.terminal_sessions import ScrollbackBuffer, TerminalSessionRegistry, TerminalLimitError
+
+
+def test_scrollback_is_bounded_and_offset_addressed():
+    buffer = ScrollbackBuffer(capacity=10)
+    for chunk in (b"aaaa", b"bbbb", b"cccc"):
+        buffer.append(chunk)
+
+    assert buffer.end_offset == 12
+    assert buffer.start_offset == 4  # first chunk evicted
+    assert buffer.since(0) == (4, b"bbbbcccc")
+    assert buffer.since(6) == (6, b"bbcccc")
+    assert buffer.since(12) == (12, b"")
+
+
+def test_detached_session_survives_until_grace_expires():
+    async def run():
+        registry = TerminalSessionRegistry(grace_seconds=0.2, reap_interval=60)
+        session, resumed = registry.open(None, sudo=False)
+        assert not resumed
+        viewer, _ = session.add_viewer()
+        session.remove_viewer(viewer)
+
+        again, resumed = registry.open(session.id, sudo=False)
+        assert resumed and again is session
+        assert registry.reap() == 0
+
+        await asyncio.sleep(0.3)
+        assert registry.reap() == 1
+        assert session.closed and registry.get(session.id) is None
+        registry.shutdown()
+
+    asyncio.run(run())
+
+
+def test_slow_viewer_pauses_pty_reads_until_drained(monkeypatch):
+    monkeypatch.setattr(settings, "TERMINAL_HIGH_WATER_BYTES", 1000)
+    monkeypatch.setattr(settings, "TERMINAL_LOW_WATER_BYTES", 200)
+
+    async def run():
+        registry = TerminalSessionRegistry(grace_seconds=60, reap_interval=60)
+        session, _ = registry.open(None, sudo=False)
+        fast, _ = session.add_viewer()
+        slow, _ = session.add_viewer()
+
+        session._on_output(b"x" * 1200)
+        fast.sent(fast.buffered)
+        assert session.pty.paused and session.pauses == 1
+        assert session.info()["buffered_bytes"] == 1200
+
+        slow.sent(900)  # 300 left: still above low water
+        assert session.pty.paused
+        slow.sent(300)
+        assert not session.pty.paused
+        registry.shutdown()
+
+    asyncio.run(run())
+
+
+def test_session_caps_and_idle_reaping():
+    async def run():
+        registry = TerminalSessionRegistry(grace_seconds=60, reap_interval=60, idle_timeout=0.2,
+                                           max_sessions=3, max_per_client=2)
+        a, _ = registry.open(None, sudo=False, owner="10.0.0.1")
+        registry.open(None, sudo=False, owner="10.0.0.1")
+        try:
+            registry.open(None, sudo=False, owner="10.0.0.1")
+            assert False, "per-client cap not enforced"
+        except TerminalLimitError:
+            pass
+        # Reattaching never counts against the cap
+        assert registry.open(a.id, sudo=False, owner="10.0.0.1") == (a, True)
+        registry.open(None, sudo=False, owner="10.0.0.2")
+        try:
+            registry.open(None, sudo=False, owner="10.0.0.3")
+            assert False, "global cap not enforced"
+        except TerminalLimitError:
+            pass
+
+        for session in registry._sessions.values():
+            session.add_viewer()
+            session.last_activity -= 1
+        a.running_since = time.monotonic()  # a command is running: not idle
+        assert registry.reap() == 2
+        assert registry.stats()["reaped"]["idle"] == 2 and registry.get(a.id) is a
+        registry.shutdown()
+        await wait_for_pending()
+
+    asyncio.run(run())
+
+
+def test_teardown_escalates_to_sigkill_and_reaps():
+    async def run():
+        process = subprocess.Popen(
+            ["/bin/bash", "-c", "trap '' TERM HUP; while :; do sleep 0.05; done"],
+            start_new_session=True,
+        )
+        await asyncio.sleep(0.2)
+        started = time.monotonic()
+        returncode = await terminate_group(process, grace=0.3)
+        assert returncode == -signal.SIGKILL
+        assert 0.3 <= time.monotonic() - started < 2
+        # Reaped: no zombie left for the pid
+        assert not os.path.exists(f"/proc/{process.pid}") or open(f"/proc/{process.pid}/stat").read().split()[2] != "Z"
+
+    asyncio.run(run())
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+from fastapi import HTTPException
+
+# Add backend dir to path to find app/engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from engine.protocol import FlowXNode
+from engine.registry import NodeRegistry
+from engine.validation_sessions import ValidationSessionRegistry
+from engine.validator import avalidate_graph, node_config_hash, validate_graph, validation_cache
+
+calls = []
+
+
+class CountingNode(FlowXNode):
+    def validate(self, data):
+        calls.append(data["id"])
+        ok = bool(data.get("data", {}).get("ok", True))
+        return {"valid": ok, "errors": [] if ok else [{"nodeId": data["id"], "message": "bad", "level": "CRITICAL"}]}
+
+    async def execute(self, ctx, payload): return {}
+    def get_execution_mode(self): return {}
+
+
+NodeRegistry.register("countingNode", CountingNode)
+
+
+def node(node_id, node_type="countingNode", **data):
+    return {"id": node_id, "type": node_type, "position": {"x": 0, "y": 0}, "data": data}
+
+
+def edge(src, trg):
+    return {"id": f"{src}-{trg}", "source": src, "target": trg}
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    validation_cache.clear()
+    calls.clear()
+
+
+def test_config_hash_ignores_layout_and_run_state():
+    base = node("a", command="ls")
+    moved = {**base, "position": {"x": 50, "y": 9}, "selected": True, "data": {**base["data"], "status": "running", "logs": ["x"]}}
+    assert node_config_hash(base) == node_config_hash(moved)
+    assert node_config_hash(base) != node_config_hash(node("a", command="ls -l"))
+
+
+def test_validate_graph_reuses_cached_results():
+    nodes = [node("start", "startNode"), node("a"), node("b")]
+    edges = [edge("start", "a"), edge("a", "b")]
+    validate_graph(nodes, edges)
+    assert sorted(calls) == ["a", "b"]
+    calls.clear()
+    nodes[1] = {**nodes[1], "position": {"x": 99, "y": 1}}
+    nodes[2] = node("b", ok=False)
+    validation_map, errors = validate_graph(nodes, edges)
+    assert calls == ["b"]
+    assert validation_map == {"start": "READY", "a": "READY", "b": "VALIDATION_FAILED"}
+    assert [e["nodeId"] for e in errors] == ["b"]
+
+
+def test_diffs_only_touch_changed_and_newly_reachable_nodes():
+    async def run():
+        sessions = ValidationSessionRegistry(max_sessions=4)
+        full = await sessions.validate([node("start", "startNode"), node("a"), node("b"), node("c")],
+                                       [edge("start", "a"), edge("b", "c")])
+        assert set(full["validation_map"]) == {"start", "a"}
+        session_id, version = full["session_id"], full["version"]
+        calls.clear()
+
+        # Connecting a -> b makes b and c reachable: only they are validated
+        diff = await sessions.apply_diff(session_id, version, [], [], [edge("a", "b")], [])
+        assert sorted(diff["revalidated"]) == ["b", "c"] and sorted(calls) == ["b", "c"]
+        assert diff["validation_map"] == {"b": "READY", "c": "READY"}
+        assert set(diff["timings_ms"]) == {"b", "c"}
+
+        # Editing an unreachable node costs nothing; editing c revalidates c only
+        calls.clear()
+        diff = await sessions.apply_diff(session_id, diff["version"], [node("orphan"), node("c", ok=False)], [], [], [])
+        assert calls == ["c"] and diff["validation_map"] == {"c": "VALIDATION_FAILED"}
+        assert diff["errors"][0]["nodeId"] == "c"
+
+        # Cutting a -> b drops b and c
+        diff = await sessions.apply_diff(session_id, diff["version"], [], [], [], ["a-b"])
+        assert sorted(diff["dropped"]) == ["b", "c"] and diff["validation_map"] == {}
+
+        # An edge can arrive before its target node
+        diff = await sessions.apply_diff(session_id, diff["version"], [], [], [edge("a", "late")], [])
+        diff = await sessions.apply_diff(session_id, diff["version"], [node("late")], [], [], [])
+        assert diff["validation_map"] == {"late": "READY"}
+
+        # Stale version: the client has to resend the full graph
+        with pytest.raises(HTTPException) as e:
+            await sessions.apply_diff(session_id, version, [], [], [], [])
+        assert e.value.status_code == 409
+
+    asyncio.run(run())
+
+
+class SlowNode(CountingNode):
+    validation_cacheable = False
+    running = 0
+    peak = 0
+
+    async def avalidate(self, data):
+        SlowNode.running += 1
+        SlowNode.peak = max(SlowNode.peak, SlowNode.running)
+        await asyncio.sleep(10 if data["data"].get("hang") else 0.1)
+        SlowNode.running -= 1
+        return {"valid": True, "errors": [{"nodeId": data["id"], "message": "slow", "level": "WARNING"}]}
+
+
+NodeRegistry.register("slowNode", SlowNode)
+
+
+def test_async_validators_run_concurrently_with_a_bound(monkeypatch):
+    monkeypatch.setattr(settings, "VALIDATION_CONCURRENCY", 4)
+    monkeypatch.setattr(settings, "VALIDATION_NODE_TIMEOUT_S", 0.5)
+    nodes = [node("start", "startNode")] + [node(f"n{i}", "slowNode") for i in range(8)] + [node("stuck", "slowNode", hang=True)]
+    edges = [edge("start", n["id"]) for n in nodes[1:]]
+
+    started = time.monotonic()
+    validation_map, errors, timings, _ = asyncio.run(avalidate_graph(nodes, edges))
+    # 9 validators of >= 0.1 s, 4 at a time; the stuck one fails at the timeout
+    assert time.monotonic() - started < 1.5
+    assert SlowNode.peak == 4
+    assert validation_map["n0"] == "READY" and validation_map["stuck"] == "VALIDATION_FAILED"
+    assert "timed out" in [e for e in errors if e["nodeId"] == "stuck"][0]["message"]
+    assert sum(e["level"] == "WARNING" for e in errors) == 8
+    assert timings["n0"] >= 100 and set(timings) == {n["id"] for n in nodes}
@@ -22,6 +22,28 @@ interface TerminalComponentProps {
     sudo?: boolean;
 }
 
+// Binary terminal protocol (see backend app/core/terminal_protocol.py)
+const OP_INPUT = 0x00;
+const OP_RESIZE = 0x01;
+const textEncoder = new TextEncoder();
+
+const encodeInput = (data: string): Uint8Array => {
+    const payload = textEncoder.encode(data);
+    const frame = new Uint8Array(payload.length + 1);
+    frame[0] = OP_INPUT;
+    frame.set(payload, 1);
+    return frame;
+};
+
+const encodeResize = (cols: number, rows: number): ArrayBuffer => {
+    const frame = new ArrayBuffer(5);
+    const view = new DataView(frame);
+    view.setUint8(0, OP_RESIZE);
+    view.setUint16(1, cols);
+    view.setUint16(3, rows);
+    return frame;
+};
+
 const TerminalComponent = forwardRef<TerminalRef, TerminalComponentProps>(({
     mode = 'interactive',
     onCommandComplete,
@@ -37,7 +59,8 @@ const TerminalComponent = forwardRef<TerminalRef, TerminalComponentProps>(({
     const wsRef = useRef<WebSocket | null>(null);
     const xtermRef = useRef<Terminal | null>(null);
     const fitAddonRef = useRef<FitAddon | null>(null);
-    const bufferRef = useRef("");
+    // Detachable PTY sessions: reattach to the same shell after a reload / remount
+    const sessionKey = `flowx-terminal:${nodeId ?? 'main'}:${sudo ? 'sudo' : 'user'}`;
 
     // FIX: Add state to track when XTerm is actually created
     const [isReady, setIsReady] = useState(false);
@@ -58,19 +81,14 @@ const TerminalComponent = forwardRef<TerminalRef, TerminalComponentProps>(({
                 return;
             }
             if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
-                const sentinel = `\nprintf "\\x1b]1337;DONE:%d\\x07" $?\r`;
-                const fullCommand = cmd + sentinel;
-
-                wsRef.current.send(JSON.stringify({
-                    type: 'input',
-                    data: fullCommand
-                }));
+                // Completion is reported by the server as a command_finished control frame
+                wsRef.current.send(encodeInput(cmd + '\r'));
             }
         },
         stop: () => {
             if (mode === 'stream') return;
             if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
-                wsRef.current.send(JSON.stringify({ type: 'input', data: '\x03' }));
+                wsRef.current.send(encodeInput('\x03'));
             }
         },
         clear: () => {
@@ -133,9 +151,12 @@ const TerminalComponent = forwardRef<TerminalRef, TerminalComponentProps>(({
                 const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
                 const host = window.location.hostname;
                 const port = '8000';
-                const wsUrl = `${protocol}//${host}:${port}/ws/terminal?sudo=${sudo ? 'true' : 'false'}`;
+                const baseUrl = `${protocol}//${host}:${port}/ws/terminal?sudo=${sudo ? 'true' : 'false'}&binary=true`;
+                const savedSession = sessionStorage.getItem(sessionKey);
+                const wsUrl = savedSession ? `${baseUrl}&session_id=${encodeURIComponent(savedSession)}` : baseUrl;
 
                 ws = new WebSocket(wsUrl);
+                ws.binaryType = 'arraybuffer';
                 wsRef.current = ws;
 
                 ws.onopen = () => {
@@ -143,27 +164,33 @@ const TerminalComponent = forwardRef<TerminalRef, TerminalComponentProps>(({
                     term?.write('\x1b[32m\r\n[Connected to PTY Session]\x1b[0m\r\n');
                     if (fitAddon) {
                         const dims = fitAddon.proposeDimensions();
-                        if (dims) ws?.send(JSON.stringify({ type: 'resize', cols: dims.cols, rows: dims.rows }));
+                        if (dims) ws?.send(encodeResize(dims.cols, dims.rows));
                     }
                 };
 
                 ws.onmessage = (event) => {
                     if (!term) return;
-                    term.write(event.data);
-
-                    if (onExecuteRef.current) {
-                        const chunk = event.data as string;
-                        bufferRef.current += chunk;
-                        if (bufferRef.current.length > 2000) bufferRef.current = bufferRef.current.slice(-2000);
-                        const match = bufferRef.current.match(/\x1b]1337;DONE:(\d+)\x07/);
-                        if (match) {
-                            onExecuteRef.current(parseInt(match[1], 10));
-                            bufferRef.current = "";
+                    if (typeof event.data === 'string') {
+                        // Control frame (PTY output is always binary)
+                        const control = JSON.parse(event.data);
+                        if (control.type === 'session') {
+                            sessionStorage.setItem(sessionKey, control.session_id);
+                            if (control.resumed) term.write('\x1b[33m[Reattached to running session]\x1b[0m\r\n');
+                        } else if (control.type === 'command_finished') {
+                            onExecuteRef.current?.(control.exit_code);
+                        } else if (control.type === 'error') {
+                            term.write(`\r\n\x1b[31m[${control.message}]\x1b[0m\r\n`);
                         }
+                        return;
                     }
+                    term.write(new Uint8Array(event.data));
                 };
 
-                ws.onclose = () => setStatus('disconnected');
+                ws.onclose = (event) => {
+                    setStatus('disconnected');
+                    // Server closes cleanly when the shell itself exited: don't try to reattach to it
+                    if (event.code === 1000) sessionStorage.removeItem(sessionKey);
+                };
                 ws.onerror = () => {
                     setStatus('disconnected');
                     term?.write('\r\n\x1b[31m[WebSocket Error]\x1b[0m\r\n');
@@ -171,7 +198,7 @@ const TerminalComponent = forwardRef<TerminalRef, TerminalComponentProps>(({
 
                 term.onData((data) => {
                     if (ws?.readyState === WebSocket.OPEN) {
-                        ws.send(JSON.stringify({ type: 'input', data: data }));
+                        ws.send(encodeInput(data));
                     }
                 });
 
@@ -200,7 +227,7 @@ const TerminalComponent = forwardRef<TerminalRef, TerminalComponentProps>(({
                                 fitAddonRef.current.fit();
                                 if (mode === 'interactive' && wsRef.current?.readyState === WebSocket.OPEN) {
                                     const dims = fitAddonRef.current.proposeDimensions();
-                                    if (dims) wsRef.current.send(JSON.stringify({ type: 'resize', cols: dims.cols, rows: dims.rows }));
+                                    if (dims) wsRef.current.send(encodeResize(dims.cols, dims.rows));
                                 }
                             } catch (e) {
                                 // Ignore fit errors during fast resizes
@@ -227,6 +254,15 @@ const TerminalComponent = forwardRef<TerminalRef, TerminalComponentProps>(({
 
     const hasHydratedRef = useRef(false);
 
+    // Closing the panel ends the shell; unmounting or losing the socket only detaches from it
+    const handleClose = () => {
+        if (wsRef.current?.readyState === WebSocket.OPEN) {
+            wsRef.current.send(JSON.stringify({ type: 'close' }));
+        }
+        sessionStorage.removeItem(sessionKey);
+        onClose();
+    };
+
     // --- 2. LOG LISTENER & SYNC EFFECT ---
     const lastSyncedLengthRef = useRef(0);
 
@@ -333,7 +369,7 @@ const TerminalComponent = forwardRef<TerminalRef, TerminalComponentProps>(({
                             {mode} :: {status}
                         </span>
                     </div>
-                    <button onClick={onClose} className="text-gray-400 hover:text-white"><X size={14} /></button>
+                    <button onClick={handleClose} className="text-gray-400 hover:text-white"><X size={14} /></button>
                 </div>
             )}
             <div className="relative flex-1 w-full h-full min-h-[100px] p-1">
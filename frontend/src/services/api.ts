@@ -56,7 +56,8 @@ export const fetchWorkflowDetails = async (id: string): Promise<Workflow> => {
             id: data.id,
             name: data.name,
             nodes: data.data?.nodes || [],
-            edges: data.data?.edges || []
+            edges: data.data?.edges || [],
+            version: data.version ?? undefined
         };
     } catch (error) {
         console.error('Error fetching workflow details:', error);
@@ -138,14 +139,15 @@ export const generateCommand = async (prompt: string, nodeId: string, systemCont
     }
 };
 
-export const validateWorkflow = async (nodes: any[], edges: any[]) => {
+// `workflowId`: whose run history the runtime estimate (`estimate` in the response) is based on
+export const validateWorkflow = async (nodes: any[], edges: any[], sessionId?: string, workflowId?: string | null) => {
     try {
         const response = await fetch(`${API_URL}/workflow/validate`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ nodes, edges }),
+            body: JSON.stringify({ nodes, edges, session_id: sessionId, workflow_id: workflowId }),
         });
 
         if (!response.ok) {
@@ -160,6 +162,38 @@ export const validateWorkflow = async (nodes: any[], edges: any[]) => {
     }
 };
 
+export interface ValidationDiff {
+    session_id: string;
+    base_version: number;
+    upserted_nodes: any[];
+    removed_nodes: string[];
+    added_edges: any[];
+    removed_edges: string[];
+}
+
+// Incremental validation against the session opened by validateWorkflow.
+// Resolves to null when the session expired or is out of date (409): resend the full graph.
+export const validateWorkflowDiff = async (diff: ValidationDiff) => {
+    try {
+        const response = await fetch(`${API_URL}/workflow/validate/diff`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(diff),
+        });
+
+        if (response.status === 409) return null;
+        if (!response.ok) {
+            const errorData = await response.json().catch(() => ({}));
+            throw new Error(errorData.detail || 'Validation request failed');
+        }
+
+        return await response.json();
+    } catch (error) {
+        console.error('Error validating workflow diff:', error);
+        throw error;
+    }
+};
+
 export interface ExecutionResponse {
     thread_id: string;
     status: "RUNNING" | "PAUSED" | "COMPLETED" | "FAILED" | "ATTENTION_REQUIRED";
@@ -168,6 +202,7 @@ export interface ExecutionResponse {
     results?: Record<string, any>;
 }
 
+// `workflow` is the full graph ({ id, nodes, edges }) or a saved one by reference ({ workflow_id, version }).
 export const executeWorkflow = async (workflow: any, sudoPassword?: string): Promise<ExecutionResponse> => {
     try {
         const payload = { ...workflow, sudo_password: sudoPassword };
@@ -179,8 +214,8 @@ export const executeWorkflow = async (workflow: any, sudoPassword?: string): Pro
 
         if (!response.ok) {
             const err = await response.json();
-            // Throw the full error object so the store can parse 'detail'
-            throw err;
+            // Throw the full error object so the store can parse 'detail' (409: stale workflow version)
+            throw { ...err, status: response.status };
         }
         return await response.json();
     } catch (error) {
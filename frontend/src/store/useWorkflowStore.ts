@@ -11,7 +11,7 @@ import {
 } from '@xyflow/react';
 import { v4 as uuidv4 } from 'uuid';
 import type { Workflow, WorkflowSummary } from '../types';
-import { fetchWorkflowDetails, deleteWorkflow as apiDeleteWorkflow, saveWorkflow as apiSaveWorkflow, validateWorkflow, executeWorkflow, cancelWorkflow } from '../services/api';
+import { fetchWorkflowDetails, deleteWorkflow as apiDeleteWorkflow, saveWorkflow as apiSaveWorkflow, validateWorkflow, validateWorkflowDiff, executeWorkflow, cancelWorkflow } from '../services/api';
 import { loadPlugins } from '../registry/pluginLoader';
 
 export class SudoRequiredError extends Error {
@@ -81,6 +81,44 @@ interface WorkflowState {
 // Singleton to prevent double-connections in Strict Mode
 let globalSocket: WebSocket | null = null;
 
+// Highest event seq seen per run, used to replay missed events after a reconnect
+const lastSeqByThread: Record<string, number> = {};
+
+// Graph the backend last validated (its validation session); later validations only send what changed
+let validationBase: {
+    workflowId: string | null;
+    sessionId: string;
+    version: number;
+    nodes: Map<string, Node>;
+    edges: Map<string, Edge>;
+} | null = null;
+
+const groupErrors = (errorList: any[], into: Record<string, string[]> = {}) =>
+    errorList.reduce((acc: Record<string, string[]>, err: any) => {
+        if (err.nodeId) {
+            if (!acc[err.nodeId]) acc[err.nodeId] = [];
+            acc[err.nodeId].push(err.message);
+        }
+        return acc;
+    }, into);
+
+// Position/selection changes keep node.data's identity, so only real edits are resent
+const diffAgainstBase = (base: NonNullable<typeof validationBase>, nodes: Node[], edges: Edge[]) => {
+    const nodeIds = new Set(nodes.map(n => n.id));
+    const edgeIds = new Set(edges.map(e => e.id));
+    return {
+        session_id: base.sessionId,
+        base_version: base.version,
+        upserted_nodes: nodes.filter(n => {
+            const prev = base.nodes.get(n.id);
+            return !prev || prev.data !== n.data || prev.type !== n.type;
+        }),
+        removed_nodes: [...base.nodes.keys()].filter(id => !nodeIds.has(id)),
+        added_edges: edges.filter(e => base.edges.get(e.id) !== e),
+        removed_edges: [...base.edges.keys()].filter(id => !edgeIds.has(id)),
+    };
+};
+
 export const useWorkflowStore = create<WorkflowState>((set, get) => ({
     workflows: [],
     activeId: null,
@@ -121,7 +159,10 @@ export const useWorkflowStore = create<WorkflowState>((set, get) => ({
         }));
 
         try {
-            await apiSaveWorkflow(newWorkflow);
+            const saved = await apiSaveWorkflow(newWorkflow);
+            set((state) => ({
+                workflows: state.workflows.map(w => w.id === newId ? { ...w, version: saved?.version } : w)
+            }));
         } catch (error) {
             console.error('Failed to auto-save new workflow', error);
         }
@@ -326,11 +367,11 @@ export const useWorkflowStore = create<WorkflowState>((set, get) => ({
         const workflowToSave: Workflow = { ...currentMeta, nodes: cleanNodes, edges };
 
         try {
-            await apiSaveWorkflow(workflowToSave);
+            const saved = await apiSaveWorkflow(workflowToSave);
             set(state => {
                 // Immutable update of just the specific workflow
                 const newWorkflows = [...state.workflows];
-                newWorkflows[workflowIndex] = workflowToSave;
+                newWorkflows[workflowIndex] = { ...workflowToSave, version: saved?.version };
                 return {
                     isDirty: false,
                     workflows: newWorkflows
@@ -343,21 +384,42 @@ export const useWorkflowStore = create<WorkflowState>((set, get) => ({
     },
 
     validateGraph: async () => {
-        const { nodes, edges } = get();
+        const { activeId, nodes, edges } = get();
+        const rememberBase = (result: any) => {
+            validationBase = {
+                workflowId: activeId,
+                sessionId: result.session_id,
+                version: result.version,
+                nodes: new Map(nodes.map(n => [n.id, n])),
+                edges: new Map(edges.map(e => [e.id, e])),
+            };
+        };
         try {
-            const result = await validateWorkflow(nodes, edges);
+            // Incremental: only changed nodes/edges, merged into the current maps
+            if (validationBase && validationBase.workflowId === activeId) {
+                const result = await validateWorkflowDiff(diffAgainstBase(validationBase, nodes, edges));
+                if (result && result.status === 'success') {
+                    const { validationStatus, validationErrors } = get();
+                    const statusMap = { ...validationStatus };
+                    const errorMap = { ...validationErrors };
+                    for (const id of [...result.revalidated, ...result.dropped]) {
+                        delete statusMap[id];
+                        delete errorMap[id];
+                    }
+                    Object.assign(statusMap, result.validation_map);
+                    groupErrors(result.errors || [], errorMap);
+                    rememberBase(result);
+                    set({ validationStatus: statusMap, validationErrors: errorMap });
+                    return;
+                }
+                // Session expired or out of date: fall through to a full validation
+            }
+
+            const result = await validateWorkflow(nodes, edges, validationBase?.sessionId, activeId);
             if (result.status === 'success') {
                 const statusMap = result.validation_map || {};
-                const errorList = result.errors || [];
-
-                // OPTIMIZATION: Single pass reduce instead of multiple array operations
-                const errorMap = errorList.reduce((acc: Record<string, string[]>, err: any) => {
-                    if (err.nodeId) {
-                        if (!acc[err.nodeId]) acc[err.nodeId] = [];
-                        acc[err.nodeId].push(err.message);
-                    }
-                    return acc;
-                }, {} as Record<string, string[]>);
+                const errorMap = groupErrors(result.errors || []);
+                rememberBase(result);
 
                 set({
                     validationStatus: statusMap,
@@ -366,12 +428,13 @@ export const useWorkflowStore = create<WorkflowState>((set, get) => ({
             }
         } catch (error) {
             console.error("Validation failed", error);
+            validationBase = null;
             set({ validationStatus: {} });
         }
     },
 
     executeGraph: async (sudoPassword?: string) => {
-        const { activeId, nodes, edges } = get();
+        const { activeId, nodes, edges, isDirty, workflows } = get();
 
         // --- NEW: SUDO VALIDATION ---
         const sudoNodes = nodes.filter(n => n.data?.sudoLock);
@@ -414,9 +477,21 @@ export const useWorkflowStore = create<WorkflowState>((set, get) => ({
             nodes: resetNodes, // Send clean state
             edges
         };
+        // Saved and unchanged: the server runs its stored copy, no need to upload the graph
+        const savedVersion = workflows.find(w => w.id === activeId)?.version;
+        const byReference = !isDirty && activeId && savedVersion !== undefined
+            ? { workflow_id: activeId, version: savedVersion }
+            : null;
 
         try {
-            const response = await executeWorkflow(workflowData, sudoPassword);
+            let response;
+            try {
+                response = await executeWorkflow(byReference || workflowData, sudoPassword);
+            } catch (error: any) {
+                // 409: the stored version moved on (saved elsewhere); send the graph instead
+                if (!byReference || error?.status !== 409) throw error;
+                response = await executeWorkflow(workflowData, sudoPassword);
+            }
 
             // 3. Update Nodes based on initial response
             // If response is RUNNING/PAUSED, we might have logs or state
@@ -496,6 +571,8 @@ export const useWorkflowStore = create<WorkflowState>((set, get) => ({
                     return acc;
                 }, {} as Record<string, string>);
 
+                // The maps no longer match the validation session: next validation is a full one
+                validationBase = null;
                 set({
                     validationErrors: errorMap,
                     validationStatus: statusMap
@@ -567,6 +644,10 @@ export const useWorkflowStore = create<WorkflowState>((set, get) => ({
                 const msg = JSON.parse(event.data);
                 console.log("[FRONTEND] WS Message:", msg.type, msg.data);
 
+                if (msg.data?.thread_id && typeof msg.data.seq === 'number') {
+                    lastSeqByThread[msg.data.thread_id] = Math.max(lastSeqByThread[msg.data.thread_id] || 0, msg.data.seq);
+                }
+
                 // REACTIVE STATE UPDATES
                 if (msg.type === "node_status") {
                     const { nodeId, status, thread_id } = msg.data;
@@ -659,7 +740,24 @@ export const useWorkflowStore = create<WorkflowState>((set, get) => ({
             }
         };
 
-        ws.onopen = () => console.log("Global Socket Connected");
+        ws.onopen = () => {
+            console.log("Global Socket Connected");
+            // Catch up on anything the active run emitted while we were disconnected
+            const { activeThreadId } = get();
+            if (activeThreadId) {
+                ws.send(JSON.stringify({
+                    type: 'subscribe',
+                    thread_id: activeThreadId,
+                    since: lastSeqByThread[activeThreadId] || 0
+                }));
+            }
+        };
+        ws.onclose = () => {
+            if (globalSocket === ws) {
+                globalSocket = null;
+                setTimeout(() => get().connectGlobalSocket(), 1000);
+            }
+        };
         ws.onerror = (e) => console.error("Global Socket Error", e);
     }
 }));
\ No newline at end of file
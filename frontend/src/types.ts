@@ -7,6 +7,7 @@ export interface Workflow {
     edges: Edge[];
     detailsLoaded?: boolean;
     isDirty?: boolean;
+    version?: number; // Server-side save counter (execute by reference)
 }
 
 export interface WorkflowSummary {
@@ -3,6 +3,33 @@ import re
 import time
 from engine.protocol import FlowXNode, ValidationResult, RuntimeContext
 from engine.pty_runner import execute_in_pty
+from engine.pipe_runner import execute_in_pipe
+from engine.session_shell import session_shells
+from engine.output_capture import OutputCapture
+from engine.rusage import run_usage, with_cpu_ratio
+from config import settings
+
+# Programs that need a terminal (full-screen, prompts, job control): always run on the PTY
+PTY_PROGRAMS = {
+    "sudo", "su", "ssh", "vim", "vi", "nano", "emacs", "less", "more", "top", "htop",
+    "watch", "man", "mysql", "psql", "sqlite3", "ftp", "sftp", "telnet", "passwd",
+}
+_SUDO_WORD = re.compile(r"(^|[\s;&|(`])sudo\b")
+
+
+def needs_tty(command: str, node_data: Dict[str, Any]) -> bool:
+    """Sudo-locked, flagged interactive, or a command that expects a terminal."""
+    if node_data.get("sudoLock") or node_data.get("interactive"):
+        return True
+    first = command.strip().split(None, 1)[0] if command.strip() else ""
+    # sudo anywhere keeps the PTY: its prompt handling (and fail-fast message) lives in the PTY runner
+    return first.rsplit("/", 1)[-1] in PTY_PROGRAMS or bool(_SUDO_WORD.search(command))
+
+
+def needs_pty(command: str, node_data: Dict[str, Any]) -> bool:
+    """PTY unless the pipe fast path is on and the node is neither sudo-locked nor interactive."""
+    return not settings.COMMAND_PIPE_FAST_PATH or needs_tty(command, node_data)
+
 
 class CommandNode(FlowXNode):
     def validate(self, data: Dict[str, Any]) -> ValidationResult:
@@ -131,14 +158,48 @@ class CommandNode(FlowXNode):
                     "type": "stdout"
                 })
 
-            # Fire the Hybrid PTY Runner
+            # Bounded capture: head + tail in memory, full stream spilled to disk when it overflows
+            spill_name = f"{runtime_ctx.get('thread_id') or 'run'}-{node_id}"
+            capture = OutputCapture(spill_name=spill_name)
+            stderr_capture = None
+            usage: Dict[str, Any] = {}  # wait4 rusage of the command's process tree
+            # Opt-in: share the run's long-lived bash (cd / exports persist). Sudo-locked and
+            # interactive commands (nothing answers prompts in the shared bash) keep the PTY runner.
+            use_session = bool(self.data.get("sessionShell")) and not use_sudo_lock and not needs_tty(command, self.data)
+            use_pty = not use_session and needs_pty(command, self.data)
+            runner = "session" if use_session else ("pty" if use_pty else "pipe")
             start_time = time.time()
-            exit_code, stdout, stderr = await execute_in_pty(
-                command=command,
-                sudo_password=password_to_inject,
-                on_output=stream_logger
-            )
+            if use_session:
+                exit_code, stdout, stderr = await session_shells.execute(
+                    runtime_ctx.get("thread_id") or node_id,
+                    command,
+                    on_output=stream_logger,
+                    capture=capture,
+                )
+            elif use_pty:
+                # Fire the Hybrid PTY Runner (sudo / interactive)
+                exit_code, stdout, stderr = await execute_in_pty(
+                    command=command,
+                    sudo_password=password_to_inject,
+                    on_output=stream_logger,
+                    capture=capture,
+                    usage=usage,
+                )
+            else:
+                # Pipe fast path: no TTY, separate stdout / stderr
+                stderr_capture = OutputCapture(spill_name=f"{spill_name}-stderr")
+                exit_code, stdout, stderr = await execute_in_pipe(
+                    command,
+                    on_output=stream_logger,
+                    stdout_capture=capture,
+                    stderr_capture=stderr_capture,
+                    usage=usage,
+                )
             duration_ms = int((time.time() - start_time) * 1000)
+            # Session shell commands run inside the shared bash: no per-command wait4
+            if usage:
+                with_cpu_ratio(usage, duration_ms)
+                run_usage.record(runtime_ctx.get("thread_id") or node_id, usage, duration_ms)
 
             status = "success" if exit_code == 0 else "failed"
             final_output = stdout if status == "success" else (stderr or stdout)
@@ -151,7 +212,11 @@ class CommandNode(FlowXNode):
                     "stdout": stdout.strip(),
                     "stderr": stderr.strip() if stderr else "",
                     "exit_code": exit_code,
-                    "duration_ms": duration_ms
+                    "duration_ms": duration_ms,
+                    "rusage": usage or None,
+                    "runner": runner,
+                    "output_stats": capture.summary(),
+                    **({"stderr_stats": stderr_capture.summary()} if stderr_capture else {}),
                 }
             }
 
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException
+from app.core.executors import run_in
 from .schema import GenerateCommandRequest, UIResponse, UIRender, ExecutionMetadata
 from .service import generate_command
 
@@ -10,9 +11,10 @@ async def generate_command_endpoint(request: GenerateCommandRequest):
         from app.core.system import get_system_fingerprint
         
         # Use provided context or fall back to live detection
-        fingerprint = request.system_context if request.system_context else get_system_fingerprint()
+        fingerprint = request.system_context if request.system_context else await run_in("io", get_system_fingerprint)
         
-        cmd_output = generate_command(request.prompt, fingerprint)
+        # Blocking SDK call: keep it off the event loop
+        cmd_output = await run_in("llm", generate_command, request.prompt, fingerprint)
         
         # Map to UI Contract
         badge_color = "green"
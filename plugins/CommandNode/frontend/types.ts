@@ -6,6 +6,8 @@ export type CommandNodeData = Node<{
     prompt?: string;
     locked?: boolean;
     sudoLock?: boolean; // Explicit Sudo Lock
+    interactive?: boolean; // Needs a TTY: skip the pipe fast path
+    sessionShell?: boolean; // Run in the run's shared bash (cd / exports persist across nodes)
     system_context?: any;
     ui_render?: {
         title: string;
@@ -1,12 +1,19 @@
 from typing import Dict, Any
 import asyncio
 import re
+from pathlib import Path
 from engine.protocol import FlowXNode, ValidationResult
 from engine.watcher import file_watch_manager
+from app.core.executors import run_in
 
 # Basic variable interpolation matching {{inputs.node_id.field}}
 VARIABLE_PATTERN = re.compile(r"\{\{([^}]+)\}\}")
 
+def _watch_dir_exists(path: str) -> bool:
+    """Same rule as FileWatchManager.register_watch: the path is a directory or sits in one."""
+    path_obj = Path(path).resolve()
+    return path_obj.is_dir() or path_obj.parent.is_dir()
+
 class FileChangeDetectorNode(FlowXNode):
     def validate(self, data: Dict[str, Any]) -> ValidationResult:
         errors = []
@@ -35,6 +42,23 @@ class FileChangeDetectorNode(FlowXNode):
             "errors": errors
         }
 
+    # avalidate() looks at the filesystem: results must not be cached by config
+    validation_cacheable = False
+
+    async def avalidate(self, data: Dict[str, Any]) -> ValidationResult:
+        result = self.validate(data)
+        watch_path = data.get("data", {}).get("watch_path", "")
+        # Interpolated paths are only known at run time
+        if result["valid"] and not VARIABLE_PATTERN.search(watch_path):
+            if not await run_in("io", _watch_dir_exists, watch_path):
+                # Warning only: an upstream node may create it before this node runs
+                result["errors"].append({
+                    "nodeId": data.get("id"),
+                    "message": f"Watch path is not inside an existing directory (yet): {watch_path}",
+                    "level": "WARNING"
+                })
+        return result
+
     def get_wait_strategy(self) -> str:
         # Crucial: Wait for ALL parents so variables from upstream are fully resolved
         return "ALL"
@@ -7,6 +7,7 @@ import traceback
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 from engine.protocol import FlowXNode, ValidationResult
+from app.core.executors import run_in
 from google import genai
 from database.connection import db
 
@@ -208,7 +209,8 @@ class ReActAgentNodeV2(FlowXNode):
                 for msg in messages:
                     prompt_text += f"{msg['role'].upper()}:\n{msg['content']}\n\n"
                     
-                chat = await asyncio.to_thread(
+                chat = await run_in(
+                    "llm",
                     client.models.generate_content,
                     model=os.getenv("GOOGLE_MODEL", "gemini-2.5-flash"),
                     contents=prompt_text,
@@ -251,13 +253,13 @@ class ReActAgentNodeV2(FlowXNode):
                     if isinstance(args, dict):
                         tool_output = await asyncio.wait_for(
                             allowed_tools[action](**args) if asyncio.iscoroutinefunction(allowed_tools[action])
-                            else asyncio.to_thread(allowed_tools[action], **args),
+                            else run_in("io", allowed_tools[action], **args),
                             timeout=30
                         )
                     else:
                         tool_output = await asyncio.wait_for(
                             allowed_tools[action](args) if asyncio.iscoroutinefunction(allowed_tools[action])
-                            else asyncio.to_thread(allowed_tools[action], args),
+                            else run_in("io", allowed_tools[action], args),
                             timeout=30
                         )
                     
@@ -22,10 +22,13 @@ import os
 import re
 import shlex
 import shutil
+import time
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
 
 from database.connection import db
+from engine.pipe_runner import run_argv
+from engine.rusage import run_usage, with_cpu_ratio
 from engine.protocol import FlowXNode, ValidationResult
 from pathlib import Path
 
@@ -370,9 +373,12 @@ async def _run_with_profile(
     command: str,
     profile: Dict[str, Any],
     run_id: str,
+    thread_id: Optional[str] = None,
 ) -> str:
     """
     Central broker. Applies all 8 security layers in order.
+    `run_id` names the run in the audit log; resource usage is summed under
+    `thread_id`, the key the executor reads (and drops) the run's totals by.
     This function is the only path to host execution — never call
     asyncio.create_subprocess_* directly from agent code.
     """
@@ -421,26 +427,33 @@ async def _run_with_profile(
     status = "completed"
     output = ""
 
-    try:
-        proc = await asyncio.create_subprocess_exec(
-            *full_cmd,
-            stdin=asyncio.subprocess.DEVNULL,   # Layer 8: no TTY, interactive cmds crash fast
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            env=SAFE_ENV,                        # Layer 8: stripped, non-interactive environment
-            cwd=HOST_WORKSPACE_DIR if not use_bwrap else None # Force fallback to correct dir
-        )
+    usage: Dict[str, Any] = {}
+    started = time.monotonic()
 
+    try:
         wall_timeout = profile.get("wall_seconds", profile["cpu_seconds"] + 5)
 
         try:
-            stdout_b, stderr_b = await asyncio.wait_for(
-                proc.communicate(),
+            # Pipe runner: stdin=/dev/null (Layer 8: interactive cmds crash fast), own process
+            # group torn down on timeout or cancel, reaped with wait4 for the rusage
+            exit_code, stdout_str, stderr_str = await asyncio.wait_for(
+                run_argv(
+                    full_cmd,
+                    usage=usage,
+                    env=SAFE_ENV,                        # Layer 8: stripped, non-interactive environment
+                    cwd=HOST_WORKSPACE_DIR if not use_bwrap else None, # Force fallback to correct dir
+                ),
                 timeout=wall_timeout,
             )
+        except asyncio.CancelledError:
+            print(f"[BROKER 🟠] run_id={run_id} cancelled, process group terminated")
+            asyncio.create_task(_write_audit(
+                audit_key,
+                {"status": "cancelled", "output_bytes": 0, "completed_at": datetime.utcnow()},
+                is_update=True,
+            ))
+            raise
         except asyncio.TimeoutError:
-            proc.kill()
-            await proc.communicate()
             status = "timeout"
             output = (
                 f"Error: Command exceeded wall-clock timeout of {wall_timeout}s. "
@@ -448,16 +461,16 @@ async def _run_with_profile(
                 f"Consider splitting into smaller operations."
             )
         else:
-            stdout_str = stdout_b.decode(errors="replace").strip()
-            stderr_str = stderr_b.decode(errors="replace").strip()
+            stdout_str = stdout_str.strip()
+            stderr_str = stderr_str.strip()
 
-            if proc.returncode != 0:
+            if exit_code != 0:
                 status = "failed"
                 # Return stderr preferentially — it has the useful error message.
                 # Fall back to stdout if stderr is empty (some tools do this).
                 raw = stderr_str or stdout_str
-                output = f"Error (exit {proc.returncode}): {raw}"
-                print(f"[BROKER 🔴] exit={proc.returncode} stderr={stderr_str[:120]!r}")
+                output = f"Error (exit {exit_code}): {raw}"
+                print(f"[BROKER 🔴] exit={exit_code} stderr={stderr_str[:120]!r}")
             else:
                 status = "completed"
                 output = stdout_str if stdout_str else "(No output)"
@@ -481,6 +494,11 @@ async def _run_with_profile(
         output = f"Error: Unexpected broker failure: {e}"
         print(f"[BROKER 💀] Unhandled: {e}")
 
+    # ── Resource accounting: per call (audit) and per run ─────────────────────
+    if usage and thread_id:
+        duration_ms = int((time.monotonic() - started) * 1000)
+        run_usage.record(thread_id, with_cpu_ratio(usage, duration_ms), duration_ms)
+
     # ── Update audit record with outcome ──────────────────────────────────────
     asyncio.create_task(_write_audit(
         audit_key,
@@ -488,6 +506,7 @@ async def _run_with_profile(
             "status":       status,
             "output_bytes": len(output),
             "completed_at": datetime.utcnow(),
+            "rusage":       usage or None,
         },
         is_update=True,
     ))
@@ -565,6 +584,28 @@ class ShellToolNode(FlowXNode):
             }
         return {"valid": True, "errors": []}
 
+    # avalidate() probes the host sandbox: results must not be cached by config
+    validation_cacheable = False
+
+    async def avalidate(self, data: Dict[str, Any]) -> ValidationResult:
+        result = self.validate(data)
+        if not result["valid"]:
+            return result
+        node_id = data.get("id")
+        if shutil.which("prlimit") is None:
+            result["errors"].append({
+                "nodeId": node_id,
+                "message": "'prlimit' not found on PATH: sandboxed commands cannot run.",
+                "level": "WARNING",
+            })
+        elif not await _is_bwrap_functional():
+            result["errors"].append({
+                "nodeId": node_id,
+                "message": "bwrap unavailable: commands run without namespace isolation (prlimit quotas only).",
+                "level": "WARNING",
+            })
+        return result
+
     async def execute(
         self,
         ctx: Dict[str, Any],
@@ -572,13 +613,15 @@ class ShellToolNode(FlowXNode):
     ) -> Dict[str, Any]:
         profile_name = self.data.get("capability_profile", "read_only")
         profile      = {**CAPABILITY_PROFILES[profile_name], "name": profile_name}
-        run_id       = ctx.get("context", {}).get("run_id", "unknown")
+        runtime      = ctx.get("context", {})
+        run_id       = runtime.get("run_id") or runtime.get("thread_id") or "unknown"
+        thread_id    = runtime.get("thread_id")
 
         # Bake profile and run_id into the closure.
         # The agent receives a plain async callable — it has no access to the
         # profile dict, the run_id, or the broker internals.
         async def _sandboxed_run(command: str) -> str:
-            return await _run_with_profile(command, profile, run_id)
+            return await _run_with_profile(command, profile, run_id, thread_id)
 
         return {
             "status": "success",